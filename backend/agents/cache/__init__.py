@@ -0,0 +1,14 @@
+from .embedding_cache import EmbeddingCache, normalize_query
+from .llm_cache import LLMCache, fingerprint, llm_cache
+from .semantic_cache import SemanticCache, scope_key, semantic_cache
+
+__all__ = [
+    "EmbeddingCache",
+    "normalize_query",
+    "LLMCache",
+    "fingerprint",
+    "llm_cache",
+    "SemanticCache",
+    "scope_key",
+    "semantic_cache",
+]
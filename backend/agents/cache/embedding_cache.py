@@ -0,0 +1,267 @@
+"""
+LRU cache of query embeddings, optionally backed by a memory-mapped file
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.logger import log_tool
+
+try:
+    import fcntl
+except ImportError:  # Windows: cache files are not locked
+    fcntl = None
+
+# Processes sharing a persist_path each claim one numbered file (path, path.1, path.2, ...)
+MAX_CACHE_FILES = 16
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: collapsed whitespace, case-folded"""
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Maps normalized query text to a float32 embedding
+
+    Vectors live in a fixed-size (max_entries, dim) matrix allocated on the
+    first insert; evicted slots are reused. With persist_path the matrix is
+    an np.memmap and the key index is written to a JSON sidecar by flush()
+    (and every flush_every inserts), so the cache survives restarts. A
+    stored cache is discarded if it was built by a different model.
+
+    Vectors reach the file as soon as they are cached but the index only at
+    flush, so each slot also records a hash of its key. On load an index
+    entry whose slot has since been reused for another query is dropped
+    instead of serving that query's vector. Each process locks the file it
+    uses; another process given the same path takes the next free numbered
+    file, or keeps its cache in memory if all are taken.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        persist_path: Optional[str] = None,
+        model_name: str = "",
+        flush_every: int = 100
+    ):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.model_name = model_name
+        self.flush_every = flush_every
+
+        self._lock = threading.Lock()
+        # normalized text -> slot in self._vectors, least recently used first
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+        # Hash of the key stored in each slot, written before the vector
+        self._key_hashes: Optional[np.ndarray] = None
+        self._dirty = 0
+        self._lock_file = None
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if persist_path:
+            self.persist_path = self._claim(persist_path)
+        if self.persist_path:
+            self._load()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return a copy of the cached embedding for text, or None"""
+        key = normalize_query(text)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                self._misses += 1
+                return None
+            self._slots.move_to_end(key)
+            self._hits += 1
+            return np.array(self._vectors[slot])
+
+    def put(self, text: str, vector: np.ndarray):
+        with self._lock:
+            self._put(normalize_query(text), np.asarray(vector, dtype=np.float32))
+            self._maybe_flush()
+
+    def get_or_compute(self, texts: Sequence[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings for texts, encoding only the cache misses in one call
+
+        Args:
+            texts: Query texts
+            encode: Function mapping a list of texts to a (n, dim) matrix
+
+        Returns:
+            (len(texts), dim) float32 matrix
+        """
+        keys = [normalize_query(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found:
+                    continue
+                slot = self._slots.get(key)
+                if slot is None:
+                    if key not in missing:
+                        self._misses += 1
+                        missing.append(key)
+                    continue
+                self._slots.move_to_end(key)
+                self._hits += 1
+                found[key] = np.array(self._vectors[slot])
+
+        if missing:
+            # Encode outside the lock: the forward pass is the slow part
+            computed = np.asarray(encode(missing), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, computed):
+                    self._put(key, vector)
+                    found[key] = vector
+                self._maybe_flush()
+
+        return np.stack([found[key] for key in keys])
+
+    def flush(self):
+        """Persist the key index and vectors (no-op without persist_path)"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and release the cache file to other processes"""
+        with self._lock:
+            self._flush()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def clear(self):
+        with self._lock:
+            self._free_slots.extend(self._slots.values())
+            self._slots.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._slots),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "max_entries": self.max_entries,
+                "persistent": bool(self.persist_path),
+                "path": self.persist_path,
+            }
+
+    def _put(self, key: str, vector: np.ndarray):
+        if self._vectors is None:
+            self._allocate(vector.shape[0])
+
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self._evictions += 1
+        if self._key_hashes is not None:
+            self._key_hashes[slot] = _key_hash(key)
+        self._vectors[slot] = vector
+        self._slots[key] = slot
+        self._slots.move_to_end(key)
+        self._dirty += 1
+
+    def _allocate(self, dim: int, mode: str = "w+"):
+        if self.persist_path:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._vectors = np.memmap(self.persist_path, dtype=np.float32, mode=mode, shape=(self.max_entries, dim))
+            self._key_hashes = np.memmap(
+                self.persist_path + ".hashes", dtype=np.uint64, mode=mode, shape=(self.max_entries,)
+            )
+        else:
+            self._vectors = np.empty((self.max_entries, dim), dtype=np.float32)
+        if mode == "w+":
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def _maybe_flush(self):
+        if self.persist_path and self._dirty >= self.flush_every:
+            self._flush()
+
+    def _flush(self):
+        if not self.persist_path or self._vectors is None:
+            return
+        self._vectors.flush()
+        self._key_hashes.flush()
+        index = {
+            "model_name": self.model_name,
+            "dim": int(self._vectors.shape[1]),
+            "max_entries": self.max_entries,
+            "keys": list(self._slots.items()),
+        }
+        tmp_path = self.persist_path + ".keys.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.persist_path + ".keys.json")
+        self._dirty = 0
+
+    def _load(self):
+        index_path = self.persist_path + ".keys.json"
+        if not (os.path.exists(index_path) and os.path.exists(self.persist_path)):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index["model_name"] != self.model_name or index["max_entries"] != self.max_entries:
+                log_tool("EMBED_CACHE", "Stored query embedding cache does not match settings, starting empty")
+                return
+            self._allocate(index["dim"], mode="r+")
+            # Slots reused after the last flush hold another key's vector
+            self._slots = OrderedDict(
+                (key, slot) for key, slot in index["keys"] if self._key_hashes[slot] == _key_hash(key)
+            )
+            used = set(self._slots.values())
+            self._free_slots = [slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used]
+            stale = len(index["keys"]) - len(self._slots)
+            log_tool("EMBED_CACHE", f"Loaded {len(self._slots)} cached query embeddings ({stale} stale)")
+        except (OSError, ValueError, KeyError) as e:
+            log_tool("EMBED_CACHE", f"Could not load query embedding cache: {e}", level="warning")
+            self._slots = OrderedDict()
+            self._vectors = None
+            self._key_hashes = None
+
+    def _claim(self, path: str) -> Optional[str]:
+        """Lock the first cache file no other process holds; None if all are taken"""
+        if fcntl is None:
+            return path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        for i in range(MAX_CACHE_FILES):
+            candidate = path if i == 0 else f"{path}.{i}"
+            lock_file = open(candidate + ".lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self._lock_file = lock_file
+            return candidate
+        log_tool("EMBED_CACHE", f"All {MAX_CACHE_FILES} query embedding cache files are in use, keeping it in memory", level="warning")
+        return None
+
+
+def _key_hash(key: str) -> np.uint64:
+    return np.uint64(int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little"))
@@ -0,0 +1,377 @@
+"""
+Exact-match cache for LLM calls, keyed by a fingerprint of the rendered prompt
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, InvalidStateError
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+
+from utils import config
+from utils.concurrency import cancel_requested
+from utils.logger import logger
+
+
+def fingerprint(llm: BaseChatModel, messages: Sequence[BaseMessage]) -> str:
+    """
+    Hash of the rendered message list and the model parameters
+
+    Two calls with the same fingerprint send byte-identical requests to the model.
+    """
+    payload = {
+        "model": type(llm).__name__,
+        "params": _model_params(llm),
+        "messages": [[m.type, m.content] for m in messages],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _model_params(llm: BaseChatModel) -> Dict[str, Any]:
+    """Model name and generation parameters (temperature, top_p, token limits...) of a chat model"""
+    # asdict() replaced dict() in newer langchain-core releases
+    return llm.asdict() if hasattr(llm, "asdict") else llm.dict()
+
+
+class _DiskStore:
+    """SQLite table of cached responses, trimmed to max_entries by last access"""
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        row = self._conn().execute(
+            "SELECT content, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._conn().execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return row
+
+    def put(self, key: str, content: str, created_at: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, content, created_at, time.time())
+        )
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM llm_cache")
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache:
+    """
+    Bounded LRU of model responses with single-flight deduplication
+
+    Responses are keyed by fingerprint() and expire after ttl_seconds. When
+    disk_path is set, entries are also written to SQLite so they survive
+    restarts and are shared between worker processes. Concurrent identical
+    calls share one model request: the first caller runs it and the others
+    wait up to wait_seconds for its result before calling the model
+    themselves. If the first caller is cancelled, a waiting caller takes
+    over the request. Failed calls are never cached.
+
+    The lock only guards the in-memory LRU and the in-flight map. SQLite
+    reads and writes happen outside it (in the executor under ainvoke), so
+    a slow disk never serializes unrelated calls or blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        disk_path: Optional[str] = None,
+        enabled: bool = True,
+        wait_seconds: float = 60.0
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        # fingerprint -> (response content, created_at wall-clock time)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._disk = _DiskStore(disk_path, max_entries * 4) if disk_path else None
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._deduplicated = 0
+        self._evictions = 0
+
+    def invoke(self, llm: BaseChatModel, messages: List[BaseMessage], use_cache: bool = True) -> AIMessage:
+        """
+        Call llm.invoke(messages) unless an identical call was answered recently
+
+        Args:
+            llm: Chat model
+            messages: Fully rendered prompt
+            use_cache: Set to False to bypass the cache for this call
+
+        Returns:
+            Model response
+        """
+        if not (self.enabled and use_cache):
+            return llm.invoke(messages)
+
+        key = fingerprint(llm, messages)
+        while True:
+            cached, future, leader = self._begin(key)
+            if cached is not None:
+                return AIMessage(content=cached)
+            if leader:
+                break
+            try:
+                return AIMessage(content=future.result(timeout=self.wait_seconds))
+            except FuturesTimeoutError:
+                logger.warning(f"LLM cache: identical call still running after {self.wait_seconds}s, calling the model")
+                return llm.invoke(messages)
+            except CancelledError:
+                # The caller running it was cancelled; take over
+                continue
+
+        try:
+            stored = self._load(key)
+            if stored is not None:
+                self._finish(key, future, stored[0], stored[1])
+                return AIMessage(content=stored[0])
+
+            response = llm.invoke(messages)
+            self._finish(key, future, response.content)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        return response
+
+    async def ainvoke(self, llm: BaseChatModel, messages: List[BaseMessage], use_cache: bool = True) -> AIMessage:
+        """Async version of invoke; waiting callers do not block the event loop"""
+        if not (self.enabled and use_cache):
+            return await llm.ainvoke(messages)
+
+        key = fingerprint(llm, messages)
+        while True:
+            cached, future, leader = self._begin(key)
+            if cached is not None:
+                return AIMessage(content=cached)
+            if leader:
+                break
+            # Shielded: a waiter that times out or is cancelled must not cancel the shared call
+            wrapped = asyncio.wrap_future(future)
+            try:
+                return AIMessage(content=await asyncio.wait_for(asyncio.shield(wrapped), self.wait_seconds))
+            except asyncio.TimeoutError:
+                wrapped.add_done_callback(lambda done: done.cancelled() or done.exception())
+                logger.warning(f"LLM cache: identical call still running after {self.wait_seconds}s, calling the model")
+                return await llm.ainvoke(messages)
+            except asyncio.CancelledError:
+                if future.cancelled() and not cancel_requested():
+                    # The caller running it was cancelled; take over
+                    continue
+                wrapped.add_done_callback(lambda done: done.cancelled() or done.exception())
+                raise
+
+        loop = asyncio.get_running_loop()
+        try:
+            if self._disk is not None:
+                stored = await loop.run_in_executor(None, self._load, key)
+            else:
+                stored = self._load(key)
+            if stored is not None:
+                self._finish(key, future, stored[0], stored[1])
+                return AIMessage(content=stored[0])
+
+            response = await llm.ainvoke(messages)
+            if self._disk is not None:
+                await loop.run_in_executor(None, self._finish, key, future, response.content)
+            else:
+                self._finish(key, future, response.content)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = self._hits + self._disk_hits + self._deduplicated
+            lookups = served + self._misses
+            stats = {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "deduplicated": self._deduplicated,
+                "hit_rate": served / lookups if lookups else 0.0,
+                "in_flight": len(self._in_flight),
+                "evictions": self._evictions,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+        if self._disk is not None:
+            stats["disk_entries"] = self._disk.count()
+        return stats
+
+    def _begin(self, key: str) -> Tuple[Optional[str], Optional[Future], bool]:
+        """
+        Look up a key in memory and join or start the in-flight call for it
+
+        The caller that starts the call checks the disk store with _load()
+        before running the model.
+
+        Returns:
+            Tuple of (cached content, in-flight future, whether this caller runs the call)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.time() - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[0], None, False
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._deduplicated += 1
+                return None, future, False
+
+            future = Future()
+            self._in_flight[key] = future
+            return None, future, True
+
+    def _load(self, key: str) -> Optional[Tuple[str, float]]:
+        """Unexpired (content, created_at) from the disk store, counting the lookup as a disk hit or a miss"""
+        row = None
+        if self._disk is not None:
+            try:
+                row = self._disk.get(key)
+                if row is not None and time.time() - row[1] > self.ttl_seconds:
+                    self._disk.delete(key)
+                    row = None
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk read failed: {e}")
+                row = None
+        with self._lock:
+            if row is not None:
+                self._disk_hits += 1
+            else:
+                self._misses += 1
+        return row
+
+    def _put(self, key: str, content: str, created_at: float):
+        self._entries[key] = (content, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _finish(self, key: str, future: Future, content: Any, created_at: Optional[float] = None):
+        """
+        Store a result and hand it to the waiting callers
+
+        Args:
+            created_at: Original creation time of an entry loaded from disk (not written back)
+        """
+        # Multimodal (list) or empty content is passed through but not cached
+        cacheable = isinstance(content, str) and bool(content)
+        write_to_disk = cacheable and created_at is None and self._disk is not None
+        if created_at is None:
+            created_at = time.time()
+        with self._lock:
+            self._release(key, future)
+            if cacheable:
+                self._put(key, content, created_at)
+        if write_to_disk:
+            try:
+                self._disk.put(key, content, created_at)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk write failed: {e}")
+        try:
+            future.set_result(content)
+        except InvalidStateError:
+            # The caller was cancelled while this ran in the executor; waiters already moved on
+            pass
+
+    def _fail(self, key: str, future: Future, error: BaseException):
+        """
+        Hand a failure to the waiting callers
+
+        An error is raised to them. Cancellation (or an interrupt) of the
+        caller running the request cancels the future instead, so a waiter
+        retries the call rather than failing with someone else's cancellation.
+        """
+        with self._lock:
+            self._release(key, future)
+        if isinstance(error, Exception):
+            try:
+                future.set_exception(error)
+            except InvalidStateError:
+                pass
+        else:
+            future.cancel()
+
+    def _release(self, key: str, future: Future):
+        # A retry may already have started a new call for the key
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+
+# Singleton instance shared by both agents
+llm_cache = LLMCache(
+    max_entries=config.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+    disk_path=config.LLM_CACHE_PATH or None,
+    enabled=config.LLM_CACHE_ENABLED,
+    wait_seconds=config.LLM_CACHE_WAIT_SECONDS
+)
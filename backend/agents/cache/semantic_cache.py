@@ -0,0 +1,169 @@
+"""
+Semantic response cache for clinical answers
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import config
+
+
+def scope_key(patient_data: Optional[Dict[str, Any]]) -> str:
+    """
+    Cache scope for a patient: answers are only shared between identical patient records
+
+    Clinical answers are generated from a prompt holding the whole record
+    (name, discharge date, follow-up, instructions...), so any difference
+    in it must keep their answers apart.
+    """
+    if not patient_data:
+        return ""
+    canonical = json.dumps(patient_data, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _CacheEntry:
+    __slots__ = ("scope", "vector", "query", "response", "created_at")
+
+    def __init__(self, scope: str, vector: np.ndarray, query: str, response: str):
+        self.scope = scope
+        self.vector = vector
+        self.query = query
+        self.response = response
+        self.created_at = time.monotonic()
+
+
+class SemanticCache:
+    """
+    Serves a stored answer when a new query is close enough to a previous one
+
+    Queries are compared by cosine similarity of their normalized embeddings,
+    only against entries in the same scope. Entries expire after ttl_seconds
+    and the least recently used are evicted beyond max_entries.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 3600, max_entries: int = 2000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._scope_ids: Dict[str, Dict[int, None]] = {}
+        # scope -> (entry ids, stacked vectors), rebuilt when the scope changes
+        self._scope_matrix: Dict[str, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def lookup(self, embedding: np.ndarray, scope: str) -> Optional[str]:
+        """
+        Find a cached answer for a query embedding
+
+        Args:
+            embedding: L2-normalized query embedding
+            scope: Cache scope from scope_key()
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        with self._lock:
+            # Expired entries go first, so an expired best match cannot hide a valid runner-up
+            self._expire(scope)
+            ids, matrix = self._matrix_for(scope)
+            if not ids:
+                self._misses += 1
+                return None
+
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            entry_id = ids[best]
+            entry = self._entries[entry_id]
+
+            if similarities[best] < self.threshold:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self._hits += 1
+            return entry.response
+
+    def store(self, embedding: np.ndarray, scope: str, query: str, response: str):
+        """Add an answer to the cache"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _CacheEntry(scope, np.asarray(embedding, dtype=np.float32), query, response)
+            self._scope_ids.setdefault(scope, {})[entry_id] = None
+            self._scope_matrix.pop(scope, None)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scope_ids.clear()
+            self._scope_matrix.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
+
+    def _matrix_for(self, scope: str) -> Tuple[List[int], np.ndarray]:
+        cached = self._scope_matrix.get(scope)
+        if cached is None:
+            ids = list(self._scope_ids.get(scope, {}))
+            matrix = np.vstack([self._entries[i].vector for i in ids]) if ids else np.empty((0, 0), dtype=np.float32)
+            cached = (ids, matrix)
+            self._scope_matrix[scope] = cached
+        return cached
+
+    def _expire(self, scope: str):
+        now = time.monotonic()
+        expired = [
+            entry_id for entry_id in self._scope_ids.get(scope, {})
+            if now - self._entries[entry_id].created_at > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+        self._expirations += len(expired)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        scope_ids = self._scope_ids.get(entry.scope)
+        if scope_ids is not None:
+            scope_ids.pop(entry_id, None)
+            if not scope_ids:
+                del self._scope_ids[entry.scope]
+        self._scope_matrix.pop(entry.scope, None)
+
+
+# Singleton instance
+semantic_cache = SemanticCache(
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=config.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES
+)
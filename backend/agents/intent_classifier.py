@@ -0,0 +1,293 @@
+"""
+Embedding-based intent classification for routing, with a keyword fallback
+
+Messages are classified as general (the receptionist answers), rag (the
+clinical agent with the knowledge base) or web_search (the clinical agent
+with current information) by their nearest intent centroids in the RAG
+embedding space. The message embedding is the same cached vector the
+semantic cache and retrieval use, so classifying adds a few dozen dot
+products.
+"""
+
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from utils import config
+from utils.logger import log_tool
+from .routing_rules import RoutingRules, routing_rules
+
+INTENTS = ("general", "rag", "web_search")
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def expected_calibration_error(probabilities: np.ndarray, labels: np.ndarray, bins: int = 10) -> float:
+    """Gap between confidence and accuracy, averaged over equal-width confidence bins"""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    error = 0.0
+    for low in np.linspace(0, 1, bins, endpoint=False):
+        in_bin = (confidence > low) & (confidence <= low + 1 / bins)
+        if in_bin.any():
+            error += in_bin.mean() * abs(confidence[in_bin].mean() - correct[in_bin].mean())
+    return float(error)
+
+
+class IntentPrediction(NamedTuple):
+    intent: str
+    confidence: float
+    probabilities: Dict[str, float]
+
+
+class NearestCentroidClassifier:
+    """
+    Assigns the intent with the most similar centroid
+
+    Each intent keeps a few centroids (spherical k-means over its examples),
+    since an intent such as "general" covers unrelated phrasings whose mean
+    would sit near none of them. An intent scores its best centroid's cosine
+    similarity. Confidence is a softmax over those scores divided by a
+    temperature, fitted on held-out examples to minimize their negative
+    log-likelihood (temperature scaling), so a confidence of 0.8 is right
+    about 80% of the time on data like the training set.
+    """
+
+    def __init__(self, intents: Sequence[str] = INTENTS, centroids_per_intent: int = 8):
+        self.intents = list(intents)
+        self.centroids_per_intent = centroids_per_intent
+        self.centroids: Optional[np.ndarray] = None
+        self.centroid_intents: Optional[np.ndarray] = None
+        self.temperature = 1.0
+        self.calibration: Dict[str, float] = {}
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.centroids is not None
+
+    def fit(self, embeddings: np.ndarray, labels: Sequence[str], holdout: float = 0.25, seed: int = 0):
+        """
+        Fit centroids on unit-length embeddings and calibrate the temperature on a held-out split
+
+        The centroids are refitted on all examples once the temperature is chosen.
+        """
+        y = np.array([self.intents.index(label) for label in labels])
+        order = np.random.default_rng(seed).permutation(len(y))
+        heldout, train = order[:int(len(y) * holdout)], order[int(len(y) * holdout):]
+
+        self._fit_centroids(embeddings[train], y[train], seed)
+        similarities = self.scores(embeddings[heldout])
+        temperatures = np.geomspace(0.001, 1.0, 80)
+        losses = [
+            -np.log(softmax(similarities / t)[np.arange(len(heldout)), y[heldout]] + 1e-12).mean()
+            for t in temperatures
+        ]
+        self.temperature = float(temperatures[int(np.argmin(losses))])
+        self.calibration = {
+            "temperature": self.temperature,
+            "heldout_accuracy": float((similarities.argmax(axis=1) == y[heldout]).mean()),
+            "heldout_ece": expected_calibration_error(softmax(similarities / self.temperature), y[heldout]),
+        }
+
+        self._fit_centroids(embeddings, y, seed)
+        return self
+
+    def _fit_centroids(self, embeddings: np.ndarray, y: np.ndarray, seed: int, iterations: int = 10):
+        rng = np.random.default_rng(seed)
+        centroids, owners = [], []
+        for i in range(len(self.intents)):
+            examples = embeddings[y == i]
+            k = min(self.centroids_per_intent, len(examples))
+            centers = examples[rng.choice(len(examples), k, replace=False)]
+            for _ in range(iterations):
+                assignment = (examples @ centers.T).argmax(axis=1)
+                centers = np.stack([
+                    examples[assignment == c].mean(axis=0) if (assignment == c).any() else centers[c]
+                    for c in range(k)
+                ])
+                centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+            centroids.append(centers)
+            owners += [i] * k
+        self.centroids = np.concatenate(centroids).astype(np.float32)
+        self.centroid_intents = np.array(owners)
+
+    def scores(self, embeddings: np.ndarray) -> np.ndarray:
+        """Best centroid similarity per intent"""
+        similarities = np.atleast_2d(embeddings) @ self.centroids.T
+        return np.stack([
+            similarities[:, self.centroid_intents == i].max(axis=1) for i in range(len(self.intents))
+        ], axis=1)
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        return softmax(self.scores(embeddings) / self.temperature)
+
+    def predict(self, embedding: np.ndarray) -> IntentPrediction:
+        probabilities = self.predict_proba(embedding)[0]
+        best = int(probabilities.argmax())
+        return IntentPrediction(
+            self.intents[best],
+            float(probabilities[best]),
+            {intent: float(p) for intent, p in zip(self.intents, probabilities)}
+        )
+
+
+class RoutingDecision(NamedTuple):
+    needs_routing: bool  # hand over to the clinical agent
+    needs_rag: bool
+    needs_web_search: bool
+    source: str  # "classifier" or "keywords"
+    intent: Optional[str] = None
+    confidence: Optional[float] = None
+
+
+class IntentRouter:
+    """
+    Routing decisions from the intent classifier, or keyword rules when it is unsure
+
+    The classifier is trained in warmup() from generated examples embedded
+    with the RAG model. Until then, when disabled, or when its confidence is
+    below threshold, the keyword rules decide.
+    """
+
+    def __init__(
+        self,
+        rules: RoutingRules,
+        enabled: bool = False,
+        threshold: float = 0.7,
+        examples_per_intent: int = 150
+    ):
+        self.rules = rules
+        self.enabled = enabled
+        self.threshold = threshold
+        self.examples_per_intent = examples_per_intent
+        self.classifier = NearestCentroidClassifier()
+        self._embed: Optional[Callable[[str], Optional[np.ndarray]]] = None
+
+        self._stats_lock = threading.Lock()
+        self._sources: Counter = Counter()
+        self._intents: Counter = Counter()
+        self._classify_ms = deque(maxlen=2000)
+
+    def train(self, encode: Callable[[List[str]], np.ndarray], embed: Callable[[str], Optional[np.ndarray]]):
+        """
+        Fit the classifier on generated examples
+
+        Args:
+            encode: Embeds a list of texts into unit vectors
+            embed: Embeds one message at routing time (normally cached)
+        """
+        # Imported here: the generator pulls in Faker, which routing alone does not need
+        from utils.patient_data_generation import MedicalDataGenerator
+
+        state = random.getstate()
+        random.seed(0)
+        try:
+            examples = MedicalDataGenerator().generate_intent_examples(self.examples_per_intent)
+        finally:
+            random.setstate(state)
+
+        started = time.perf_counter()
+        embeddings = encode([example["query"] for example in examples])
+        self.classifier.fit(embeddings, [example["intent"] for example in examples])
+        self._embed = embed
+        log_tool(
+            "ROUTING",
+            f"Intent classifier trained on {len(examples)} examples in {time.perf_counter() - started:.1f}s "
+            f"(held-out accuracy {self.classifier.calibration['heldout_accuracy']:.3f}, "
+            f"ECE {self.classifier.calibration['heldout_ece']:.3f})"
+        )
+
+    def warmup(self) -> bool:
+        """Train with the resident RAG embedding model; False if it is not available"""
+        if not self.enabled:
+            return False
+        from agents.rag_setup.rag_service import rag_service
+
+        vector_store = rag_service.get_vector_store()
+        if vector_store is None:
+            log_tool("ROUTING", "No embedding model available, routing with keywords", level="warning")
+            return False
+        self.train(vector_store.embed_texts, rag_service.embed_query)
+        return True
+
+    def classify(self, text: str) -> Optional[IntentPrediction]:
+        """Predicted intent, or None if the classifier is not in use"""
+        if not (self.enabled and self.classifier.is_fitted and self._embed is not None):
+            return None
+        started = time.perf_counter()
+        embedding = self._embed(text)
+        if embedding is None:
+            return None
+        prediction = self.classifier.predict(embedding)
+        with self._stats_lock:
+            self._classify_ms.append((time.perf_counter() - started) * 1000)
+        return prediction
+
+    def route(self, text: str, allow_both: bool = False) -> RoutingDecision:
+        """
+        Decide where a message goes
+
+        Args:
+            text: The patient's message
+            allow_both: Allow RAG alongside web search (parallel retrieval mode)
+
+        Returns:
+            Routing decision with the source that made it
+        """
+        categories = self.rules.categories(text)
+        prediction = self.classify(text)
+
+        if prediction is not None and prediction.confidence >= self.threshold:
+            needs_web = prediction.intent == "web_search"
+            # One intent per message; keywords can still add RAG to a web search in fan-out mode
+            needs_rag = prediction.intent == "rag" or (allow_both and needs_web and "rag" in categories)
+            decision = RoutingDecision(
+                prediction.intent != "general", needs_rag, needs_web,
+                "classifier", prediction.intent, prediction.confidence
+            )
+        else:
+            needs_web = "web_search" in categories
+            decision = RoutingDecision(
+                "clinical" in categories,
+                "rag" in categories and (allow_both or not needs_web),
+                needs_web,
+                "keywords",
+                confidence=prediction.confidence if prediction is not None else None
+            )
+
+        with self._stats_lock:
+            self._sources[decision.source] += 1
+            if decision.intent is not None:
+                self._intents[decision.intent] += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            classify_ms = np.asarray(self._classify_ms or [0.0])
+            return {
+                "enabled": self.enabled,
+                "trained": self.classifier.is_fitted,
+                "threshold": self.threshold,
+                "decisions": dict(self._sources),
+                "classifier_intents": dict(self._intents),
+                "calibration": dict(self.classifier.calibration),
+                # Includes the message embedding, which is usually a cache hit
+                "classify_p50_ms": float(np.percentile(classify_ms, 50)),
+                "classify_p99_ms": float(np.percentile(classify_ms, 99)),
+            }
+
+
+# Singleton instance
+intent_router = IntentRouter(
+    routing_rules,
+    enabled=config.INTENT_CLASSIFIER_ENABLED,
+    threshold=config.INTENT_CONFIDENCE_THRESHOLD,
+    examples_per_intent=config.INTENT_TRAINING_EXAMPLES
+)
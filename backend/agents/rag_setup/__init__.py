@@ -2,6 +2,7 @@ from .data_loader import DataLoader
 from .create_chunks import ChunkCreator
 from .create_embeddings import Embeddings
 from .create_vector_store import VectorStore
+from .rag_service import RAGService, rag_service
 from .query_rag import setup_rag, load_existing_vector_store, check_vector_store_exists, query_rag
 
 __all__ = [
@@ -9,6 +10,8 @@ __all__ = [
     "ChunkCreator",
     "Embeddings",
     "VectorStore",
+    "RAGService",
+    "rag_service",
     "setup_rag",
     "load_existing_vector_store",
     "check_vector_store_exists",
@@ -0,0 +1,180 @@
+"""
+Keyword retrieval over the RAG chunks and rank fusion with dense results
+
+Dense MiniLM embeddings blur exact clinical terms: a query for
+"Furosemide" or "eGFR" may rank a chunk about diuretics in general above
+the one naming the drug. An Okapi BM25 inverted index over the same chunks
+catches those exact matches, and reciprocal-rank fusion merges both
+rankings without having to calibrate their scores against each other.
+"""
+
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from utils.logger import log_tool
+from .retrieval_backends import SearchHit
+
+
+BM25_FILENAME = "bm25_index.json"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its my of on or "
+    "should so that the their there these this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms without stopwords ("eGFR < 30" -> ["egfr", "30"])"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts
+
+    Postings are stored per term as parallel arrays of chunk positions and
+    term frequencies, so a query only touches the chunks containing its terms.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        postings: Dict[str, List[List[int]]],
+        doc_lengths: Sequence[int],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self._raw_postings = postings
+
+        count = len(ids)
+        average_length = float(self.doc_lengths.mean()) if count else 0.0
+        # Per-chunk part of the BM25 denominator, precomputed once
+        self._length_norm = k1 * (1 - b + b * self.doc_lengths / (average_length or 1.0))
+        self._postings = {}
+        for term, (positions, frequencies) in postings.items():
+            positions = np.asarray(positions, dtype=np.int64)
+            idf = np.log(1 + (count - len(positions) + 0.5) / (len(positions) + 0.5))
+            self._postings[term] = (positions, np.asarray(frequencies, dtype=np.float32), float(idf))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], **kwargs) -> "BM25Index":
+        """Tokenize the chunks and build the inverted index"""
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = []
+        for position, text in enumerate(documents):
+            tokens = tokenize(text or "")
+            doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings[term][0].append(position)
+                postings[term][1].append(frequency)
+        postings = {term: list(lists) for term, lists in postings.items()}
+        return cls(ids, documents, metadatas, postings, doc_lengths, **kwargs)
+
+    @classmethod
+    def from_collection(cls, collection, page_size: int = 5000) -> "BM25Index":
+        """Index every chunk stored in a Chroma collection"""
+        ids, documents, metadatas = [], [], []
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(limit=page_size, offset=offset, include=['documents', 'metadatas'])
+            ids.extend(page['ids'])
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+        index = cls.build(ids, documents, metadatas)
+        log_tool("RAG", f"Built BM25 index over {len(ids)} chunks ({len(index._postings)} terms)")
+        return index
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "postings": self._raw_postings,
+                "doc_lengths": self.doc_lengths.astype(int).tolist(),
+                "k1": self.k1,
+                "b": self.b,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["ids"], data["documents"], data["metadatas"], data["postings"], data["doc_lengths"],
+            k1=data["k1"], b=data["b"]
+        )
+
+    @staticmethod
+    def invalidate(path: str):
+        """Delete a saved index so it is rebuilt on next use"""
+        if os.path.exists(path):
+            os.remove(path)
+
+    def search(self, query: str, k: int) -> List[SearchHit]:
+        """
+        Rank chunks by BM25 score for a query
+
+        Returns:
+            Up to k hits with a positive score, best first; distance is the
+            negated score so that lower still ranks first
+        """
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not terms or k <= 0:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            positions, frequencies, idf = self._postings[term]
+            scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + self._length_norm[positions])
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [
+            SearchHit(self.ids[i], self.documents[i], self.metadatas[i], -float(scores[i]))
+            for i in matched
+        ]
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[SearchHit]]:
+        return [self.search(query, k) for query in queries]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[SearchHit]], k: int, rrf_k: int = 60) -> List[SearchHit]:
+    """
+    Merge ranked hit lists by summing 1 / (rrf_k + rank) per chunk
+
+    Each chunk keeps the hit from the first ranking that contains it.
+
+    Returns:
+        The top k hits by fused score
+    """
+    fused_scores: Dict[str, float] = defaultdict(float)
+    hits: Dict[str, SearchHit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            fused_scores[hit.id] += 1.0 / (rrf_k + rank)
+            hits.setdefault(hit.id, hit)
+    # sorted() is stable, so ties keep the order of the first ranking
+    ordered = sorted(hits, key=lambda chunk_id: -fused_scores[chunk_id])
+    return [hits[chunk_id] for chunk_id in ordered[:k]]
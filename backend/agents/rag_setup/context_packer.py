@@ -0,0 +1,182 @@
+"""
+Token-budgeted assembly of retrieved chunks into the clinical prompt context
+
+Pasting the top chunks verbatim sends every sentence of them, although
+only a few usually bear on the question. The packer splits each chunk into
+windows of a few sentences, scores every window against the query embedding
+and keeps the best ones that fit the token budget, in their original
+reading order.
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from agents.cache.embedding_cache import EmbeddingCache
+
+# Sentence ends followed by whitespace, or blank lines between paragraphs
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens: about 4 characters per token for English text"""
+    return (len(text) + 3) // 4
+
+
+def split_sentences(text: str, max_chars: int = 600) -> List[str]:
+    """
+    Split text into whitespace-normalized sentences
+
+    Sentences longer than max_chars (tables, run-on PDF text) are cut at
+    word boundaries so no single window exceeds the budget on its own.
+    """
+    sentences = []
+    for raw in _SENTENCE_BOUNDARY.split(text):
+        sentence = " ".join(raw.split())
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+class Window(NamedTuple):
+    source: int  # rank of the chunk the window comes from
+    position: int  # window index within the chunk
+    text: str
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int
+    original_tokens: int
+    windows_used: int
+    windows_total: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.tokens)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "tokens": self.tokens,
+            "original_tokens": self.original_tokens,
+            "tokens_saved": self.tokens_saved,
+            "windows_used": self.windows_used,
+            "windows_total": self.windows_total,
+        }
+
+
+def format_sources(contents: Sequence[str]) -> str:
+    """The unpacked context: every chunk in full, numbered by rank"""
+    return "\n\n".join(f"Source {i + 1}:\n{content}" for i, content in enumerate(contents))
+
+
+class ContextPacker:
+    """
+    Selects the sentence windows of retrieved chunks most similar to the query
+
+    Window embeddings are cached, so a chunk that is retrieved again costs
+    no encoder pass; the query embedding comes from the retrieval step.
+    """
+
+    def __init__(self, token_budget: int = 1500, window_sentences: int = 3, cache_size: int = 20000):
+        self.token_budget = token_budget
+        self.window_sentences = window_sentences
+        self.window_cache = EmbeddingCache(max_entries=cache_size)
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._tokens_original = 0
+        self._tokens_saved = 0
+
+    def windows(self, contents: Sequence[str]) -> List[Window]:
+        """Consecutive, non-overlapping groups of window_sentences sentences per chunk"""
+        windows = []
+        for source, content in enumerate(contents):
+            sentences = split_sentences(content)
+            for position, start in enumerate(range(0, len(sentences), self.window_sentences)):
+                windows.append(Window(source, position, " ".join(sentences[start:start + self.window_sentences])))
+        return windows
+
+    def pack(
+        self,
+        query_embedding: np.ndarray,
+        contents: Sequence[str],
+        encode: Callable[[List[str]], np.ndarray]
+    ) -> PackedContext:
+        """
+        Build the prompt context from retrieved chunk texts
+
+        Args:
+            query_embedding: Unit-length embedding of the patient's question
+            contents: Retrieved chunk texts, best first
+            encode: Function embedding a list of texts into unit vectors
+
+        Returns:
+            The packed context with its token counts
+        """
+        original_tokens = estimate_tokens(format_sources(contents))
+        windows = self.windows(contents)
+        if not windows:
+            return PackedContext("", 0, original_tokens, 0, 0)
+
+        embeddings = self.window_cache.get_or_compute([window.text for window in windows], encode)
+        scores = embeddings @ np.asarray(query_embedding, dtype=np.float32)
+
+        selected: List[Window] = []
+        sources = set()
+        used = 0
+        for i in np.argsort(-scores, kind="stable"):
+            window = windows[i]
+            # Each newly included chunk also costs its "Source n:" header
+            cost = estimate_tokens(window.text) + 1 + (4 if window.source not in sources else 0)
+            if used + cost > self.token_budget:
+                continue
+            selected.append(window)
+            sources.add(window.source)
+            used += cost
+
+        if not selected:
+            # Even the best window is over budget: keep its beginning
+            best = windows[int(np.argmax(scores))]
+            selected = [best._replace(text=best.text[:max(0, self.token_budget - 4) * 4])]
+
+        text = self._assemble(selected)
+        packed = PackedContext(text, estimate_tokens(text), original_tokens, len(selected), len(windows))
+        with self._stats_lock:
+            self._requests += 1
+            self._tokens_original += packed.original_tokens
+            self._tokens_saved += packed.tokens_saved
+        return packed
+
+    @staticmethod
+    def _assemble(selected: List[Window]) -> str:
+        """Selected windows in reading order, grouped under their chunk; gaps are marked with '...'"""
+        by_source: Dict[int, List[Window]] = {}
+        for window in sorted(selected):
+            by_source.setdefault(window.source, []).append(window)
+
+        sections = []
+        for number, source_windows in enumerate(by_source.values(), start=1):
+            parts = [source_windows[0].text]
+            for previous, window in zip(source_windows, source_windows[1:]):
+                parts.append(" " if window.position == previous.position + 1 else " ... ")
+                parts.append(window.text)
+            sections.append(f"Source {number}:\n{''.join(parts)}")
+        return "\n\n".join(sections)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "requests": self._requests,
+                "token_budget": self.token_budget,
+                "tokens_original": self._tokens_original,
+                "tokens_saved": self._tokens_saved,
+                "window_cache": self.window_cache.stats(),
+            }
@@ -1,10 +1,19 @@
-from typing import List, Dict, Any, Tuple
+import os
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
 import numpy as np
 import chromadb
 import uuid
 from sentence_transformers import SentenceTransformer
 
+from agents.cache.embedding_cache import EmbeddingCache
+from utils import config
+from utils.logger import log_tool
+from .bm25_index import BM25_FILENAME, BM25Index, reciprocal_rank_fusion
+from .embedding_batcher import EmbeddingBatcher
+from .retrieval_backends import SNAPSHOT_DIRNAME, EmbeddingSnapshot, RetrievalBackend, SearchHit, create_backend
+
 
 class Document:
     """Simple document class to hold content and metadata"""
@@ -14,53 +23,286 @@ class Document:
 
 
 class VectorStore:
-    def __init__(self, model_name: str):
-        self.client = chromadb.PersistentClient(path="data/vector_store/")
+    def __init__(
+        self,
+        model_name: str,
+        persist_directory: str = "data/vector_store/",
+        embedding_model: Optional[SentenceTransformer] = None,
+        query_cache: Optional[EmbeddingCache] = None,
+        backend: Optional[str] = None,
+        hybrid: Optional[bool] = None
+    ):
+        self.model_name = model_name
+        self.persist_directory = persist_directory
+        self.client = chromadb.PersistentClient(path=persist_directory)
         self.collection = self.client.get_or_create_collection(name="documents_collection")
-        self.embedding_model = SentenceTransformer(model_name)
+        self.embedding_model = embedding_model or SentenceTransformer(model_name)
+        # Shared by every query path so a repeated question is encoded once
+        self.query_cache = query_cache or EmbeddingCache(
+            max_entries=config.QUERY_EMBEDDING_CACHE_SIZE,
+            persist_path=config.QUERY_EMBEDDING_CACHE_PATH or None,
+            model_name=model_name
+        )
+        # Concurrent query encodes from different requests share forward passes
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if config.EMBEDDING_BATCHER_ENABLED:
+            self.batcher = EmbeddingBatcher(
+                self.embed_texts,
+                max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS
+            )
+        # Nearest-neighbour search is delegated to a backend built on first query
+        self.backend_name = backend or config.RETRIEVAL_BACKEND
+        self._backend: Optional[RetrievalBackend] = None
+        self._backend_lock = threading.Lock()
+        # Dense results are fused with a BM25 keyword index over the same chunks
+        self.hybrid = config.HYBRID_RETRIEVAL_ENABLED if hybrid is None else hybrid
+        self._lexical_index: Optional[BM25Index] = None
+        self._lexical_lock = threading.Lock()
+
+    @property
+    def backend(self) -> RetrievalBackend:
+        backend = self._backend
+        if backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = create_backend(
+                        self.backend_name,
+                        self.collection,
+                        self.persist_directory,
+                        rescore_factor=config.QUANTIZED_RESCORE_FACTOR
+                    )
+                backend = self._backend
+        return backend
+
+    @property
+    def lexical_index_path(self) -> str:
+        return os.path.join(self.persist_directory, BM25_FILENAME)
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        """BM25 index saved by the last ingestion, rebuilt from the collection if missing"""
+        index = self._lexical_index
+        if index is None:
+            index = self.load_lexical_index()
+        return index
 
-    def add_documents(self, documents: List[Dict[str, Any]]):
+    def load_lexical_index(self) -> BM25Index:
+        """
+        Load the saved BM25 index, building and saving it first if it is missing
+
+        Concurrent callers wait for a single build. Dense searches do not
+        wait, since the lexical index has its own lock.
+        """
+        with self._lexical_lock:
+            if self._lexical_index is None:
+                path = self.lexical_index_path
+                if os.path.exists(path):
+                    self._lexical_index = BM25Index.load(path)
+                else:
+                    log_tool("RAG", "BM25 index not found. Building it from the collection")
+                    self._lexical_index = BM25Index.from_collection(self.collection)
+                    self._lexical_index.save(path)
+            return self._lexical_index
+
+    def build_lexical_index(self) -> BM25Index:
+        """Rebuild and save the BM25 index from the current collection"""
+        with self._lexical_lock:
+            index = BM25Index.from_collection(self.collection)
+            index.save(self.lexical_index_path)
+            self._lexical_index = index
+        return index
+
+    def _invalidate_backend(self):
+        """Drop the in-process indexes after the collection changes"""
+        with self._backend_lock, self._lexical_lock:
+            self._backend = None
+            self._lexical_index = None
+            EmbeddingSnapshot.invalidate(os.path.join(self.persist_directory, SNAPSHOT_DIRNAME))
+            BM25Index.invalidate(self.lexical_index_path)
+
+    def embed_texts(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Encode texts in batches into a (len(texts), dim) float32 matrix of unit vectors"""
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Unit-length float32 embedding of a query, served from the cache when possible"""
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embeddings of several queries; cache misses are encoded in one batch"""
+        encode = self.batcher.encode if self.batcher is not None else self.embed_texts
+        return self.query_cache.get_or_compute(queries, encode)
+
+    def add_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        batch_size: int = 64,
+        ids: Optional[List[str]] = None
+    ):
+        """
+        Embed and add documents to the collection
+
+        Args:
+            documents: Dicts with 'text' and 'metadata' keys
+            batch_size: Number of texts per encoder forward pass
+            ids: Stable document IDs; existing documents with these IDs are replaced.
+                Random IDs are generated if omitted.
+        """
         texts = [doc['text'] for doc in documents]
         metadatas = [doc['metadata'] for doc in documents]
-        self.embeddings = [self.embedding_model.encode(text).tolist() for text in texts]
-        ids = [str(uuid.uuid4()) for _ in range(len(texts))]
-
-        self.collection.add(
-            ids=ids,
-            embeddings=self.embeddings,
-            metadatas=metadatas,
-            documents=texts
-        )
+        embeddings = self.embed_texts(texts, batch_size=batch_size)
+
+        if ids is None:
+            self.collection.add(
+                ids=[str(uuid.uuid4()) for _ in range(len(texts))],
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=texts
+            )
+        else:
+            self.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=texts
+            )
+        self._invalidate_backend()
         print(f"Added {len(texts)} documents to the vector store.")
-        
+
+    def get_ids(self, where: Dict[str, Any]) -> List[str]:
+        """IDs of the documents whose metadata matches a Chroma where filter"""
+        return self.collection.get(where=where, include=[])["ids"]
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+            self._invalidate_backend()
+
+    def reset(self):
+        """Drop every document in the collection"""
+        self.client.delete_collection(name="documents_collection")
+        self.collection = self.client.get_or_create_collection(name="documents_collection")
+        self._invalidate_backend()
 
     def query(self, query: str, top_k: int = 5) -> List[Tuple[str, Dict[str, Any]]]:
-        query_embedding = self.embedding_model.encode(query).tolist()
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
-        return list(zip(results['documents'][0], results['metadatas'][0]))
+        return [(doc.page_content, doc.metadata) for doc, _ in self.similarity_search_batch([query], top_k)[0]]
 
     def similarity_search_with_score(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
         """Search with distance scores"""
-        query_embedding = self.embedding_model.encode(query).tolist()
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
-            include=['documents', 'metadatas', 'distances']
-        )
+        return self.similarity_search_batch([query], k)[0]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[Document, float]]]:
+        """
+        Search several queries with one encoder call and one index lookup
         
-        # Return (document, score) tuples
-        docs_with_scores = []
-        for i in range(len(results['documents'][0])):
-            doc_content = results['documents'][0][i]
-            doc_metadata = results['metadatas'][0][i]
-            score = results['distances'][0][i]  # L2 distance
+        Args:
+            queries: Query texts
+            k: Results per query
             
-            # Create Document object
-            doc = Document(page_content=doc_content, metadata=doc_metadata)
-            docs_with_scores.append((doc, score))
-        
-        return docs_with_scores
-    
+        Returns:
+            One list of (document, score) tuples per query, in query order;
+            score is the squared L2 distance
+        """
+        if not queries:
+            return []
+        return [[self._to_document(hit) for hit in hits] for hits in self._search_hits(queries, k)]
+
+    def similarity_search_multi(
+        self,
+        queries: List[str],
+        k: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search several phrasings of one question and merge their results
+
+        The top k of each phrasing are fused by reciprocal rank, so chunks
+        found by several phrasings rise; a chunk returned by more than one
+        phrasing, or with the same text as a better-ranked chunk, appears once.
+
+        Args:
+            queries: Phrasings to search, most important first
+            k: Results to return
+            where: Metadata the results must match: {key: value} or {key: {"$in": [values]}}
+
+        Returns:
+            Up to k (document, score) tuples; score is the squared L2 distance
+        """
+        if not queries:
+            return []
+        # Fetch extra candidates so filtering and deduplication still leave k per phrasing.
+        # Only those k are fused: deeper ranks would reward generic chunks every phrasing finds.
+        rankings = [
+            _unique_texts(hit for hit in hits if where is None or _matches(hit.metadata, where))[:k]
+            for hits in self._search_hits(queries, max(k, config.HYBRID_CANDIDATES))
+        ]
+        fused = _unique_texts(reciprocal_rank_fusion(rankings, k * len(rankings), rrf_k=config.HYBRID_RRF_K))
+        return [self._to_document(hit) for hit in fused[:k]]
+
+    def _search_hits(self, queries: List[str], k: int) -> List[List[SearchHit]]:
+        embeddings = self.encode_queries(queries)
+        if self.hybrid:
+            return self._hybrid_search(queries, embeddings, k)
+        return self.backend.search(embeddings, k)
+
+    @staticmethod
+    def _to_document(hit: SearchHit) -> Tuple[Document, float]:
+        return Document(page_content=hit.content, metadata=hit.metadata), hit.distance
+
+    def _hybrid_search(self, queries: List[str], embeddings: np.ndarray, k: int) -> List[List[SearchHit]]:
+        """Fuse dense and BM25 candidates by reciprocal rank, keeping the top k"""
+        depth = max(k, config.HYBRID_CANDIDATES)
+        dense = self.backend.search(embeddings, depth)
+        lexical = self.lexical_index.search_batch(queries, depth)
+        fused = [
+            reciprocal_rank_fusion([dense_hits, lexical_hits], k, rrf_k=config.HYBRID_RRF_K)
+            for dense_hits, lexical_hits in zip(dense, lexical)
+        ]
+
+        # Chunks found only by keyword carry a BM25 score; report their embedding distance instead
+        dense_ids = [{hit.id for hit in hits} for hits in dense]
+        missing = sorted({hit.id for hits, seen in zip(fused, dense_ids) for hit in hits if hit.id not in seen})
+        if not missing:
+            return fused
+        stored = self.collection.get(ids=missing, include=['embeddings'])
+        vectors = np.asarray(stored['embeddings'], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        by_id = dict(zip(stored['ids'], vectors))
+        return [
+            [
+                hit if hit.id in seen else hit._replace(distance=float(2.0 - 2.0 * by_id[hit.id] @ embedding))
+                for hit in hits
+            ]
+            for hits, seen, embedding in zip(fused, dense_ids, embeddings)
+        ]
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Whether chunk metadata satisfies an equality / $in filter"""
+    for key, condition in where.items():
+        value = (metadata or {}).get(key)
+        if isinstance(condition, dict):
+            if value not in condition.get("$in", []):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _unique_texts(hits: Iterable[SearchHit]) -> List[SearchHit]:
+    """Drop hits whose text, ignoring whitespace, repeats an earlier hit"""
+    unique, seen = [], set()
+    for hit in hits:
+        text = " ".join(hit.content.split())
+        if text not in seen:
+            seen.add(text)
+            unique.append(hit)
+    return unique
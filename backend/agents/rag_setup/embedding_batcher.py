@@ -0,0 +1,159 @@
+"""
+Micro-batching of concurrent embedding requests
+"""
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from utils.logger import log_tool
+
+
+class _Request(NamedTuple):
+    text: str
+    future: Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent encode requests into batched forward passes
+
+    A worker thread takes the first waiting request, then keeps collecting
+    until max_batch_size texts are queued or max_wait_ms has passed since
+    that request arrived, and encodes the whole batch in one call. Each
+    caller blocks only on its own future. Once closed, texts are encoded
+    directly in the caller's thread.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 3.0
+    ):
+        self.encode_batch = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._wait_ms = deque(maxlen=2000)
+        self._encode_ms = deque(maxlen=2000)
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its float32 embedding"""
+        future = Future()
+        # Under the lock so no request can be queued behind close()'s stop marker
+        with self._lock:
+            if not self._closed:
+                self._ensure_worker()
+                self._queue.put(_Request(text, future, time.perf_counter()))
+                return future
+        try:
+            future.set_result(np.asarray(self.encode_batch([text]), dtype=np.float32)[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts through the shared batches
+
+        Returns:
+            (len(texts), dim) float32 matrix
+        """
+        futures = [self.submit(text) for text in texts]
+        return np.stack([future.result() for future in futures])
+
+    def close(self):
+        """Stop the worker after it finishes the queued requests"""
+        with self._lock:
+            self._closed = True
+            worker, self._worker = self._worker, None
+            if worker is not None:
+                self._queue.put(None)
+        if worker is not None:
+            worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batch_sizes = dict(self._batch_sizes)
+            wait_ms = np.asarray(self._wait_ms or [0.0])
+            encode_ms = np.asarray(self._encode_ms or [0.0])
+        batches = sum(batch_sizes.values())
+        items = sum(size * count for size, count in batch_sizes.items())
+        return {
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(batch_sizes.items())),
+            "queue_wait_p50_ms": float(np.percentile(wait_ms, 50)),
+            "queue_wait_p99_ms": float(np.percentile(wait_ms, 99)),
+            "encode_p50_ms": float(np.percentile(encode_ms, 50)),
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
+
+    def _ensure_worker(self):
+        # Called with self._lock held
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait_ms / 1000
+            stop = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[_Request]):
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._wait_ms.extend((started - request.enqueued_at) * 1000 for request in batch)
+
+        # Identical texts in one batch are encoded once
+        unique_texts = list(dict.fromkeys(request.text for request in batch))
+        try:
+            vectors = np.asarray(self.encode_batch(unique_texts), dtype=np.float32)
+        except Exception as e:
+            log_tool("EMBED_BATCH", f"Batch of {len(batch)} failed: {e}", level="error")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._encode_ms.append((time.perf_counter() - started) * 1000)
+            self._batch_sizes[len(batch)] += 1
+        by_text = dict(zip(unique_texts, vectors))
+        for request in batch:
+            request.future.set_result(by_text[request.text])
@@ -0,0 +1,288 @@
+"""
+Ingestion pipeline for the RAG corpus
+
+Files are parsed in a process pool, several at a time, with PDFs split
+into page ranges (structured_chunking.iter_file_blocks). The parsed
+blocks are streamed through structured_chunking.ChunkStream in file order
+and the chunks are embedded in batches as they arrive. Parsing and
+encoding overlap, and only a bounded window of parsed page ranges is held
+in memory. The BM25 keyword index is rebuilt once at the end of a run
+that changed the store.
+
+Indexing is incremental: chunk IDs are derived from their content and
+location, a manifest records which file versions are indexed, and only
+new or modified files are re-processed. Within a modified file only
+chunks whose content changed are embedded again.
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from contextlib import nullcontext
+from itertools import chain, groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from .create_vector_store import VectorStore
+from .manifest import CorpusManifest
+from .structured_chunking import ChunkStream, iter_file_blocks, parse_pool
+
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+# Recorded in the manifest: changing the chunking algorithm re-indexes the corpus
+CHUNKER_VERSION = "structured-2"
+
+
+class IngestionStats:
+    """Counters and throughput for one ingestion run"""
+
+    def __init__(self):
+        self.files = 0
+        self.documents = 0
+        self.chunks = 0
+        self.files_unchanged = 0
+        self.files_removed = 0
+        self.chunks_embedded = 0
+        self.chunks_deleted = 0
+        self.embed_seconds = 0.0
+        self._started = time.perf_counter()
+        self.elapsed_seconds = 0.0
+
+    def finish(self):
+        self.elapsed_seconds = time.perf_counter() - self._started
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Ingested {self.files} files: {self.documents} documents, {self.chunks} chunks "
+            f"({self.chunks_embedded} embedded, {self.chunks_deleted} deleted) "
+            f"in {self.elapsed_seconds:.1f}s ({self.docs_per_second:.1f} docs/s, "
+            f"{self.chunks_per_second:.1f} chunks/s; embedding {self.embed_seconds:.1f}s). "
+            f"{self.files_unchanged} files unchanged, {self.files_removed} removed."
+        )
+
+
+def iter_chunk_ids(file_path: str, chunks: Iterable[Document]) -> Iterator[Tuple[str, Document]]:
+    """
+    Content-addressed IDs: hash of source, page and chunk text
+
+    Identical chunks on the same page get an occurrence suffix so IDs stay unique.
+    """
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        page = chunk.metadata.get("page", "")
+        key = hashlib.sha256(f"{file_path}\0{page}\0{chunk.page_content}".encode("utf-8")).hexdigest()[:32]
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        yield (key if occurrence == 0 else f"{key}-{occurrence}"), chunk
+
+
+def chunk_ids(file_path: str, chunks: List[Document]) -> List[str]:
+    """IDs of a list of chunks, as iter_chunk_ids assigns them"""
+    return [chunk_id for chunk_id, _ in iter_chunk_ids(file_path, chunks)]
+
+
+def ingest_files(
+    vector_store: VectorStore,
+    file_paths: Sequence[str],
+    batch_size: int = 64,
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    add_batch_size: int = 512,
+    manifest: Optional[CorpusManifest] = None,
+    stats: Optional[IngestionStats] = None
+) -> IngestionStats:
+    """
+    Load, chunk, embed and store files
+
+    Chunks already stored under the same ID are not embedded again, and
+    chunks previously stored for a file that no longer produces them are deleted.
+
+    Args:
+        vector_store: Target vector store
+        file_paths: Files to ingest
+        batch_size: Texts per encoder forward pass
+        workers: Parsing processes (defaults to the CPU count)
+        chunk_size: Characters per chunk
+        chunk_overlap: Characters shared by consecutive chunks
+        add_batch_size: Chunks written to the collection per call
+        manifest: Updated and saved after each file, if given
+        stats: Statistics to add to (a new object if None)
+
+    Returns:
+        Ingestion statistics
+    """
+    stats = stats or IngestionStats()
+    workers = workers or os.cpu_count() or 1
+
+    with parse_pool(workers) if workers > 1 and file_paths else nullcontext() as executor:
+        parsed = iter_file_blocks(file_paths, workers, executor)
+        # Tasks come back in file order, so each group holds one whole file
+        for (_, file_path), parts in groupby(parsed, key=itemgetter(0)):
+            blocks = chain.from_iterable(part for _, part in parts)
+            stream = ChunkStream(file_path, blocks=blocks, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            _ingest_file(vector_store, file_path, stream, batch_size, add_batch_size, manifest, stats)
+
+    if stats.chunks_embedded or stats.chunks_deleted or not os.path.exists(vector_store.lexical_index_path):
+        # Built once per run, so the first patient query after ingestion never builds it;
+        # every write above invalidated the previous keyword index
+        vector_store.build_lexical_index()
+
+    stats.finish()
+    return stats
+
+
+def _ingest_file(
+    vector_store: VectorStore,
+    file_path: str,
+    stream: ChunkStream,
+    batch_size: int,
+    add_batch_size: int,
+    manifest: Optional[CorpusManifest],
+    stats: IngestionStats
+):
+    """Embed a file's new chunks, delete its stale ones and record it in the manifest"""
+    stored_ids = set(vector_store.get_ids({"source": file_path}))
+    ids = set()
+    pending: List[Tuple[str, Document]] = []
+    embedded = 0
+
+    for chunk_id, chunk in iter_chunk_ids(file_path, stream):
+        ids.add(chunk_id)
+        if chunk_id not in stored_ids:
+            pending.append((chunk_id, chunk))
+        if len(pending) >= add_batch_size:
+            embedded += _add_chunks(vector_store, pending, batch_size, stats)
+            pending = []
+    if pending:
+        embedded += _add_chunks(vector_store, pending, batch_size, stats)
+
+    stale_ids = list(stored_ids - ids)
+    vector_store.delete(stale_ids)
+
+    if manifest is not None:
+        manifest.record(file_path, len(ids))
+        manifest.save()
+
+    stats.files += 1
+    stats.documents += stream.pages
+    stats.chunks += len(ids)
+    stats.chunks_embedded += embedded
+    stats.chunks_deleted += len(stale_ids)
+    print(f"Indexed {file_path}: {stream.pages} pages, {len(ids)} chunks ({embedded} new)")
+
+
+def _add_chunks(
+    vector_store: VectorStore,
+    chunks: List[Tuple[str, Document]],
+    batch_size: int,
+    stats: IngestionStats
+) -> int:
+    """Embed and store (id, chunk) pairs, returning how many were added"""
+    started = time.perf_counter()
+    vector_store.add_documents(
+        [{'text': doc.page_content, 'metadata': doc.metadata} for _, doc in chunks],
+        batch_size=batch_size,
+        ids=[chunk_id for chunk_id, _ in chunks]
+    )
+    stats.embed_seconds += time.perf_counter() - started
+    return len(chunks)
+
+
+def sync_corpus(
+    vector_store: VectorStore,
+    data_dir: str,
+    model_name: str,
+    batch_size: int = 64,
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    rebuild: bool = False
+) -> IngestionStats:
+    """
+    Bring the vector store in line with the files in data_dir
+
+    Unchanged files are skipped, new and modified files are re-indexed and
+    chunks of deleted files are removed. The whole index is rebuilt when
+    rebuild is set, when the model or chunking settings changed, or when
+    the existing index has no manifest.
+
+    Returns:
+        Ingestion statistics
+    """
+    settings = {
+        "model_name": model_name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunker": CHUNKER_VERSION,
+    }
+    manifest_path = os.path.join(vector_store.persist_directory, MANIFEST_FILENAME)
+    manifest = CorpusManifest.load(manifest_path, settings)
+
+    if rebuild or manifest.is_new:
+        print("Rebuilding vector store from scratch.")
+        vector_store.reset()
+        manifest = CorpusManifest(manifest_path, settings)
+
+    stats = IngestionStats()
+
+    for file_path in manifest.removed_files(list_corpus_files(data_dir)):
+        stale_ids = vector_store.get_ids({"source": file_path})
+        vector_store.delete(stale_ids)
+        manifest.remove(file_path)
+        stats.files_removed += 1
+        stats.chunks_deleted += len(stale_ids)
+        print(f"Removed {file_path}: {len(stale_ids)} chunks")
+
+    changed_files = []
+    for file_path in list_corpus_files(data_dir):
+        if manifest.is_changed(file_path):
+            changed_files.append(file_path)
+        else:
+            stats.files_unchanged += 1
+    manifest.save()
+
+    return ingest_files(
+        vector_store,
+        changed_files,
+        batch_size=batch_size,
+        workers=workers,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        manifest=manifest,
+        stats=stats
+    )
+
+
+def list_corpus_files(data_dir: str) -> List[str]:
+    """Supported files in data_dir, in a stable order"""
+    supported = {".pdf", ".txt", ".csv", ".docx", ".xls", ".xlsx", ".json"}
+    return sorted(
+        str(path) for path in Path(data_dir).glob('*')
+        if path.is_file() and path.suffix.lower() in supported
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the RAG vector store from a directory of documents")
+    parser.add_argument("data_dir", nargs="?", default="data/pdf_files")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every file from scratch")
+    args = parser.parse_args()
+
+    from .query_rag import setup_rag
+    setup_rag(args.data_dir, args.model, batch_size=args.batch_size, workers=args.workers, rebuild=args.rebuild)
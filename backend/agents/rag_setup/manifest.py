@@ -0,0 +1,98 @@
+"""
+Manifest of indexed corpus files, used to re-index only what changed
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CorpusManifest:
+    """
+    Content hash, mtime and size of every indexed file
+
+    Stored as JSON next to the Chroma files. The settings that affect chunk
+    contents or embeddings (model, chunk size/overlap) are recorded too; if
+    they change, every file must be re-indexed.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, Any], files: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.settings = settings
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+        # True when nothing usable was stored: the index, if any, predates this manifest
+        self.is_new = files is None
+        # Hashes computed by is_changed(), reused by record()
+        self._hashes: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: str, settings: Dict[str, Any]) -> "CorpusManifest":
+        """
+        Load the manifest at path
+
+        Returns:
+            The stored manifest, or an empty one if none exists or it was
+            built with different settings
+        """
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("settings") == settings:
+                return cls(path, settings, data.get("files") or {})
+        return cls(path, settings)
+
+    def save(self):
+        """Write the manifest atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_changed(self, file_path: str) -> bool:
+        """
+        Whether file_path must be re-indexed
+
+        The file is only hashed when its mtime or size differs from the
+        manifest; a touched but identical file just has its stat refreshed.
+        """
+        entry = self.files.get(file_path)
+        stat = os.stat(file_path)
+        if entry is None:
+            return True
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return False
+        self._hashes[file_path] = file_sha256(file_path)
+        if entry["sha256"] == self._hashes[file_path]:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            entry["size"] = stat.st_size
+            return False
+        return True
+
+    def record(self, file_path: str, chunk_count: int):
+        stat = os.stat(file_path)
+        self.files[file_path] = {
+            "sha256": self._hashes.pop(file_path, None) or file_sha256(file_path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "chunks": chunk_count,
+        }
+
+    def remove(self, file_path: str):
+        self.files.pop(file_path, None)
+
+    def removed_files(self, current_files: List[str]) -> List[str]:
+        """Indexed files that are no longer in the corpus"""
+        current = set(current_files)
+        return sorted(path for path in self.files if path not in current)
@@ -0,0 +1,56 @@
+"""
+Retrieval queries built from the patient's discharge record
+
+A vague question such as "my legs feel heavy" retrieves generic chunks on
+its own. Searching it alongside phrasings that add the patient's primary
+diagnosis and medication names pulls in the chunks about their condition;
+the rankings are then fused and deduplicated by VectorStore.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+_DOSE_START = re.compile(r"\s(?=[\d(]|PRN\b)")
+
+
+def medication_names(medications: List[str]) -> List[str]:
+    """
+    Drug names without dose and schedule
+
+    "Furosemide 20mg twice daily" -> "Furosemide"
+    """
+    names = []
+    for medication in medications or []:
+        name = _DOSE_START.split(medication.strip(), maxsplit=1)[0].strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def build_retrieval_queries(question: str, patient_data: Optional[Dict[str, Any]], max_medications: int = 3) -> List[str]:
+    """
+    Phrasings of a patient's question to search together
+
+    Args:
+        question: The patient's message
+        patient_data: Discharge record with 'primary_diagnosis' and 'medications', if identified
+        max_medications: Medication names added to the medication query
+
+    Returns:
+        The question with the diagnosis and with the medication names
+        appended, when those are known, then the original question. Fusion
+        breaks ties in this order, so the patient-specific phrasings lead.
+    """
+    if not patient_data:
+        return [question]
+
+    queries = []
+    diagnosis = (patient_data.get("primary_diagnosis") or "").strip()
+    if diagnosis:
+        queries.append(f"{question} {diagnosis}")
+
+    names = medication_names(patient_data.get("medications") or [])[:max_medications]
+    if names:
+        queries.append(f"{question} {' '.join(names)}")
+    queries.append(question)
+    return queries
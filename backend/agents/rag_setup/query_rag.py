@@ -1,37 +1,35 @@
-from .data_loader import DataLoader
 from .create_vector_store import VectorStore
-from .create_chunks import ChunkCreator
-from pathlib import Path
-from tqdm import tqdm
-from typing import List, Dict
+from .ingestion import sync_corpus
+from .rag_service import rag_service
+from typing import List, Dict, Optional
 import os
 
-def setup_rag(data_dir: str, model_name: str = "all-MiniLM-L6-v2"):
-    # Load documents
-    documents = []
-    for file_path in Path(data_dir).glob('*'):
-        loader = DataLoader(str(file_path))
-        docs = loader.load_data()
-        documents.extend(docs)
-    print(f"Loaded {len(documents)} documents from {data_dir}.")
+def setup_rag(
+    data_dir: str,
+    model_name: str = "all-MiniLM-L6-v2",
+    batch_size: int = 64,
+    workers: Optional[int] = None,
+    rebuild: bool = False
+):
+    """
+    Build or incrementally update the vector store from the files in data_dir
     
-    # Create chunks
-    chunk_creator = ChunkCreator()
-    chunked_documents = chunk_creator.create_chunks(documents)
-    print(f"Created {len(chunked_documents)} chunks from documents.")
+    Only new and modified files are re-indexed; chunks of deleted files are removed.
     
+    Args:
+        data_dir: Directory of source documents
+        model_name: SentenceTransformer model used for embeddings
+        batch_size: Texts per encoder forward pass
+        workers: Processes used to load and chunk files (defaults to the CPU count)
+        rebuild: Re-index every file from scratch
+    """
     # Create vector store with model name
     vector_store = VectorStore(model_name)
     
-    # Process in batches
-    batch_size = 100
-    print(f"Adding {len(chunked_documents)} chunks to vector store...")
-    for i in tqdm(range(0, len(chunked_documents), batch_size)):
-        batch = chunked_documents[i:i+batch_size]
-        docs_to_add = [{'text': doc.page_content, 'metadata': doc.metadata} for doc in batch]
-        vector_store.add_documents(docs_to_add)
+    stats = sync_corpus(vector_store, data_dir, model_name, batch_size=batch_size, workers=workers, rebuild=rebuild)
+    print(stats.summary())
     
-    print("Vector store created and documents added.")
+    print("Vector store is up to date.")
     return vector_store
 
 def load_existing_vector_store(model_name: str = "all-MiniLM-L6-v2"):
@@ -51,6 +49,9 @@ def similarity_search_with_score(vector_store: VectorStore, query: str, k: int =
 def query_rag(query: str, top_k: int = 3) -> List[Dict[str, str]]:
     """
     Query the RAG system and return relevant documents
+
+    Uses the process-wide RAG service so the embedding model and collection
+    are loaded once rather than on every query.
     
     Args:
         query: User query
@@ -60,28 +61,8 @@ def query_rag(query: str, top_k: int = 3) -> List[Dict[str, str]]:
         List of dicts with 'content' and 'metadata' keys
     """
     try:
-        # Load existing vector store
-        if not check_vector_store_exists():
-            print("Warning: Vector store not found. Returning empty results.")
-            return []
-        
-        vector_store = load_existing_vector_store()
-        
-        # Perform similarity search
-        results = similarity_search_with_score(vector_store, query, k=top_k)
-        
-        # Format results
-        formatted_results = []
-        for doc, score in results:
-            formatted_results.append({
-                "content": doc.page_content if hasattr(doc, 'page_content') else str(doc),
-                "metadata": doc.metadata if hasattr(doc, 'metadata') else {},
-                "score": float(score)
-            })
-        
-        return formatted_results
+        return rag_service.query(query, top_k=top_k)
         
     except Exception as e:
         print(f"RAG query error: {e}")
         return []
-
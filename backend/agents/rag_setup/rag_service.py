@@ -0,0 +1,235 @@
+"""
+Process-wide RAG service that keeps the embedding model and vector store resident
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.logger import log_tool
+from utils import config
+from .context_packer import ContextPacker, PackedContext
+from .create_vector_store import VectorStore
+from .patient_queries import build_retrieval_queries
+from .reranker import CrossEncoderReranker
+
+
+def _vector_store_exists() -> bool:
+    # Imported lazily to avoid a circular import with query_rag
+    from .query_rag import check_vector_store_exists
+    return bool(check_vector_store_exists())
+
+
+class RAGService:
+    """
+    Lazily-initialized, thread-safe owner of the RAG VectorStore
+
+    The SentenceTransformer model and the Chroma collection are loaded once on
+    first use (or at server startup through warmup()) and shared by every
+    request, so a query only costs one encode plus one nearest-neighbour lookup.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self._vector_store: Optional[VectorStore] = None
+        self._lock = threading.Lock()
+        self.context_packer = ContextPacker(
+            token_budget=config.RAG_CONTEXT_TOKEN_BUDGET,
+            window_sentences=config.RAG_CONTEXT_WINDOW_SENTENCES
+        )
+        self.reranker: Optional[CrossEncoderReranker] = None
+        if config.RERANK_ENABLED:
+            self.reranker = CrossEncoderReranker(
+                config.RERANK_MODEL,
+                budget_ms=config.RERANK_BUDGET_MS,
+                batch_size=config.RERANK_BATCH_SIZE
+            )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._vector_store is not None
+
+    def get_vector_store(self) -> Optional[VectorStore]:
+        """
+        Return the resident vector store, loading it on first call
+
+        Returns:
+            VectorStore instance, or None if no vector store has been built yet
+        """
+        vector_store = self._vector_store
+        if vector_store is not None:
+            return vector_store
+
+        with self._lock:
+            if self._vector_store is None:
+                if not _vector_store_exists():
+                    log_tool("RAG", "Vector store not found. Run setup_rag first.", level="warning")
+                    return None
+                log_tool("RAG", f"Loading vector store with embedding model '{self.model_name}'")
+                self._vector_store = VectorStore(self.model_name)
+            return self._vector_store
+
+    def warmup(self) -> bool:
+        """
+        Load the model and collection ahead of the first request
+
+        Returns:
+            True if the vector store is ready to serve queries
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return False
+        # Run one encode so lazy model initialization happens now, not on a patient turn
+        vector_store.embedding_model.encode("warmup")
+        if vector_store.hybrid:
+            # Load (or build, if ingestion did not leave one) the keyword index for hybrid search
+            vector_store.load_lexical_index()
+        if self.reranker is not None:
+            self.reranker.load()
+        log_tool("RAG", "RAG service warmed up")
+        return True
+
+    def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed a query with the resident model
+
+        Args:
+            text: Query text
+
+        Returns:
+            L2-normalized float32 embedding, or None if the model is not loaded
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return None
+        return vector_store.encode_query(text)
+
+    def query(self, query: str, top_k: int = 3) -> List[Dict]:
+        """
+        Query the resident vector store
+
+        Args:
+            query: User query
+            top_k: Number of top results to return
+
+        Returns:
+            List of dicts with 'content', 'metadata' and 'score' keys
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return []
+
+        results = vector_store.similarity_search_with_score(query, k=self._candidates(top_k))
+        return self._format_results(self._rerank(query, results, top_k))
+
+    def query_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict]]:
+        """
+        Query several texts with a single encoder pass and index lookup
+
+        Returns:
+            One result list per query, in the same format as query()
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return [[] for _ in queries]
+
+        return [
+            self._format_results(results)
+            for results in vector_store.similarity_search_batch(queries, k=top_k)
+        ]
+
+    def query_for_patient(
+        self,
+        question: str,
+        patient_data: Optional[Dict[str, Any]],
+        top_k: int = 3,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict]:
+        """
+        Query with the question and phrasings that add the patient's diagnosis and medications
+
+        All phrasings are encoded in one batch; their results are fused and deduplicated.
+
+        Args:
+            question: The patient's message
+            patient_data: Discharge record of the identified patient, if any
+            top_k: Number of results to return
+            where: Optional metadata filter, e.g. {"source": "data/pdf_files/nephrology.pdf"}
+
+        Returns:
+            List of dicts in the same format as query()
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None:
+            return []
+
+        queries = build_retrieval_queries(question, patient_data)
+        results = vector_store.similarity_search_multi(queries, k=self._candidates(top_k), where=where)
+        # The cross-encoder judges relevance to what the patient actually asked
+        return self._format_results(self._rerank(question, results, top_k))
+
+    def _candidates(self, top_k: int) -> int:
+        """Results to retrieve: a wider set when the reranker will choose among them"""
+        return max(top_k, config.RERANK_CANDIDATES) if self.reranker is not None else top_k
+
+    def _rerank(self, query: str, results, top_k: int):
+        if self.reranker is None:
+            return results[:top_k]
+        return self.reranker.rerank(query, results, top_k)
+
+    def pack_context(self, query: str, results: List[Dict]) -> Optional[PackedContext]:
+        """
+        Keep the sentence windows of the results most relevant to the query within the token budget
+
+        Args:
+            query: Text the results were retrieved for; its embedding is already cached
+            results: Output of query() or query_for_patient()
+
+        Returns:
+            Packed context, or None if packing is disabled or the model is not loaded
+        """
+        vector_store = self.get_vector_store()
+        if vector_store is None or self.context_packer.token_budget <= 0:
+            return None
+        return self.context_packer.pack(
+            vector_store.encode_query(query),
+            [result["content"] for result in results],
+            vector_store.embed_texts
+        )
+
+    @staticmethod
+    def _format_results(results) -> List[Dict]:
+        return [
+            {
+                "content": doc.page_content if hasattr(doc, 'page_content') else str(doc),
+                "metadata": doc.metadata if hasattr(doc, 'metadata') else {},
+                "score": float(score)
+            }
+            for doc, score in results
+        ]
+
+    def stats(self) -> Dict:
+        vector_store = self._vector_store
+        return {
+            "loaded": vector_store is not None,
+            "query_embedding_cache": vector_store.query_cache.stats() if vector_store is not None else None,
+            "embedding_batcher": vector_store.batcher.stats()
+            if vector_store is not None and vector_store.batcher is not None else None,
+            "context_packer": self.context_packer.stats(),
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+        }
+
+    def shutdown(self):
+        """Release the model and collection so they can be garbage collected"""
+        with self._lock:
+            if self._vector_store is not None:
+                self._vector_store.query_cache.close()
+                if self._vector_store.batcher is not None:
+                    self._vector_store.batcher.close()
+                self._vector_store = None
+                log_tool("RAG", "RAG service shut down")
+
+
+# Singleton instance
+rag_service = RAGService()
@@ -0,0 +1,166 @@
+"""
+Cross-encoder re-ranking of dense retrieval candidates under a latency budget
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from utils.logger import log_tool
+
+
+class CrossEncoderReranker:
+    """
+    Re-orders the top dense candidates by cross-encoder relevance
+
+    Candidates are scored in dense order, batch_size pairs at a time, on
+    the CPU. Before each batch the reranker checks whether it would still
+    finish within budget_ms, judging by the slowest batch so far; if not it
+    stops. When at least k candidates were scored, those are re-ranked and
+    returned (a re-rank of a shorter dense prefix); otherwise the dense
+    order is kept. Requests that arrive before the model has loaded also
+    keep the dense order while it loads in the background.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        budget_ms: float = 150.0,
+        batch_size: int = 4,
+        model=None,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        """
+        Args:
+            model_name: Cross-encoder loaded on first use (unless model is given)
+            budget_ms: Scoring time allowed per request
+            batch_size: Pairs scored per forward pass
+            model: Preloaded model with a predict(pairs, batch_size) method
+            clock: Seconds timer the budget is measured with
+        """
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = max(1, batch_size)
+        self._model = model
+        self._clock = clock
+        self._load_lock = threading.Lock()
+        self._loading = False
+        self._failed = False
+
+        self._stats_lock = threading.Lock()
+        self._outcomes: Counter = Counter()
+        self._elapsed_ms = deque(maxlen=2000)
+        self._pair_ms = deque(maxlen=2000)
+        self._pairs_scored = 0
+        self._top_k_changed = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> bool:
+        """
+        Load the cross-encoder on the CPU (blocking)
+
+        Returns:
+            True if the model is ready
+        """
+        with self._load_lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    started = time.perf_counter()
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    log_tool("RERANK", f"Loaded {self.model_name} in {time.perf_counter() - started:.1f}s")
+                except Exception as e:
+                    # Not retried: every request would otherwise pay for the failed load
+                    self._failed = True
+                    log_tool("RERANK", f"Could not load {self.model_name}, keeping dense order: {e}", level="error")
+            self._loading = False
+        return self._model is not None
+
+    def rerank(self, query: str, candidates: Sequence[Tuple[Any, float]], k: int) -> List[Tuple[Any, float]]:
+        """
+        Top k of the (document, distance) candidates, re-ranked if the budget allows
+
+        Args:
+            query: Text the candidates were retrieved for
+            candidates: Dense results, nearest first
+            k: Results to return
+
+        Returns:
+            Up to k (document, distance) tuples
+        """
+        dense = list(candidates[:k])
+        if len(candidates) <= 1:
+            return dense
+        if self._model is None:
+            self._load_in_background()
+            self._record("not_loaded", 0.0, 0)
+            return dense
+
+        started = self._clock()
+        scores: List[float] = []
+        slowest_batch_ms = 0.0
+        for start in range(0, len(candidates), self.batch_size):
+            elapsed_ms = (self._clock() - started) * 1000
+            if scores and elapsed_ms + slowest_batch_ms > self.budget_ms:
+                break
+            batch_started = self._clock()
+            pairs = [(query, doc.page_content) for doc, _ in candidates[start:start + self.batch_size]]
+            scores.extend(float(score) for score in self._model.predict(pairs, batch_size=len(pairs)))
+            slowest_batch_ms = max(slowest_batch_ms, (self._clock() - batch_started) * 1000)
+
+        elapsed_ms = (self._clock() - started) * 1000
+        if len(scores) < min(k, len(candidates)):
+            self._record("over_budget", elapsed_ms, len(scores))
+            return dense
+
+        order = np.argsort(-np.asarray(scores), kind="stable")[:k]
+        reranked = [candidates[i] for i in order]
+        outcome = "reranked" if len(scores) == len(candidates) else "partial"
+        self._record(outcome, elapsed_ms, len(scores), changed=[d for d, _ in reranked] != [d for d, _ in dense])
+        return reranked
+
+    def _load_in_background(self):
+        with self._load_lock:
+            if self._loading or self._failed or self._model is not None:
+                return
+            self._loading = True
+        threading.Thread(target=self.load, name="reranker-load", daemon=True).start()
+
+    def _record(self, outcome: str, elapsed_ms: float, scored: int, changed: bool = False):
+        with self._stats_lock:
+            self._outcomes[outcome] += 1
+            if scored:
+                self._elapsed_ms.append(elapsed_ms)
+                self._pair_ms.append(elapsed_ms / scored)
+                self._pairs_scored += scored
+            self._top_k_changed += changed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            outcomes = dict(self._outcomes)
+            elapsed_ms = np.asarray(self._elapsed_ms or [0.0])
+            pair_ms = np.asarray(self._pair_ms or [0.0])
+            pairs_scored = self._pairs_scored
+            top_k_changed = self._top_k_changed
+        requests = sum(outcomes.values())
+        reranked = outcomes.get("reranked", 0) + outcomes.get("partial", 0)
+        return {
+            "model": self.model_name,
+            "loaded": self.is_loaded,
+            "budget_ms": self.budget_ms,
+            "requests": requests,
+            "outcomes": outcomes,
+            "fallback_rate": 1 - reranked / requests if requests else 0.0,
+            # How often the cross-encoder changed which results reach the prompt
+            "top_k_changed_rate": top_k_changed / reranked if reranked else 0.0,
+            "pairs_scored": pairs_scored,
+            "latency_p50_ms": float(np.percentile(elapsed_ms, 50)),
+            "latency_p99_ms": float(np.percentile(elapsed_ms, 99)),
+            "per_pair_p50_ms": float(np.percentile(pair_ms, 50)),
+        }
@@ -0,0 +1,232 @@
+"""
+Nearest-neighbour backends behind VectorStore
+
+Chroma is the system of record. The in-process backends search a snapshot
+of its embeddings exported to data/vector_store/snapshot/: a float32
+matrix loaded with np.load(mmap_mode="r") plus the chunk texts and
+metadata. All backends return squared L2 distances between unit vectors
+(2 - 2 * cosine), the same scale Chroma reports.
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+
+from utils.logger import log_tool
+
+
+SNAPSHOT_DIRNAME = "snapshot"
+
+
+class SearchHit(NamedTuple):
+    id: str
+    content: str
+    metadata: Dict[str, Any]
+    distance: float
+
+
+class RetrievalBackend:
+    """Interface for nearest-neighbour search over the chunk embeddings"""
+
+    name = "base"
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> List[List[SearchHit]]:
+        """
+        Find the k nearest chunks for each query
+
+        Args:
+            query_embeddings: (n_queries, dim) unit-length float32 matrix
+            k: Results per query
+
+        Returns:
+            One list of hits per query, nearest first
+        """
+        raise NotImplementedError
+
+
+class ChromaBackend(RetrievalBackend):
+    """Queries the Chroma collection directly"""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> List[List[SearchHit]]:
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32),
+            n_results=k,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return [
+            [SearchHit(*hit) for hit in zip(ids, documents, metadatas, distances)]
+            for ids, documents, metadatas, distances in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            )
+        ]
+
+
+class EmbeddingSnapshot:
+    """Chunk embeddings, texts and metadata exported from the Chroma collection"""
+
+    def __init__(self, embeddings: np.ndarray, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+
+    def hit(self, position: int, distance: float) -> SearchHit:
+        return SearchHit(self.ids[position], self.documents[position], self.metadatas[position], float(distance))
+
+    @staticmethod
+    def export(collection, directory: str, page_size: int = 5000):
+        """Write the collection to directory as embeddings.npy and chunks.json"""
+        ids, documents, metadatas, embeddings = [], [], [], []
+        total = collection.count()
+        for offset in range(0, total, page_size):
+            page = collection.get(
+                limit=page_size, offset=offset,
+                include=['embeddings', 'documents', 'metadatas']
+            )
+            ids.extend(page['ids'])
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+            embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+
+        matrix = np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+        if len(matrix):
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        tmp_directory = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        np.save(os.path.join(tmp_directory, "embeddings.npy"), matrix)
+        with open(os.path.join(tmp_directory, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        log_tool("RAG", f"Exported {len(ids)} chunk embeddings to {directory}")
+
+    @classmethod
+    def load(cls, directory: str) -> "EmbeddingSnapshot":
+        with open(os.path.join(directory, "chunks.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        if chunks["ids"]:
+            embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        else:
+            # Empty arrays cannot be memory-mapped
+            embeddings = np.empty((0, 0), dtype=np.float32)
+        return cls(embeddings, chunks["ids"], chunks["documents"], chunks["metadatas"])
+
+    @staticmethod
+    def invalidate(directory: str):
+        """Delete a snapshot so it is re-exported on next use"""
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class NumpyBackend(RetrievalBackend):
+    """Exact search: one matrix product against the memory-mapped embeddings"""
+
+    name = "numpy"
+
+    def __init__(self, snapshot: EmbeddingSnapshot):
+        self.snapshot = snapshot
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> List[List[SearchHit]]:
+        matrix = self.snapshot.embeddings
+        if len(matrix) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        k = min(k, len(matrix))
+        similarities = np.asarray(query_embeddings, dtype=np.float32) @ matrix.T
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in zip(similarities, top):
+            ordered = candidates[np.argsort(-row[candidates])]
+            results.append([self.snapshot.hit(i, 2.0 - 2.0 * row[i]) for i in ordered])
+        return results
+
+
+class FaissBackend(RetrievalBackend):
+    """
+    FAISS inner-product index over the snapshot embeddings
+
+    index_type:
+        flat - exact search
+        hnsw - graph index, sub-linear queries, no training
+        ivf  - inverted lists over k-means cells; searches nprobe cells
+    """
+
+    def __init__(self, snapshot: EmbeddingSnapshot, index_type: str = "flat", hnsw_m: int = 32,
+                 ef_search: int = 64, nprobe: int = 8):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("FAISS retrieval backends require the faiss-cpu package") from e
+
+        self.snapshot = snapshot
+        self.name = f"faiss-{index_type}"
+        vectors = np.ascontiguousarray(snapshot.embeddings, dtype=np.float32)
+        dim = vectors.shape[1] if vectors.ndim == 2 and len(vectors) else 1
+
+        if index_type == "flat":
+            self.index = faiss.IndexFlatIP(dim)
+        elif index_type == "hnsw":
+            self.index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efSearch = ef_search
+        elif index_type == "ivf":
+            # Roughly sqrt(n) cells, with enough points per cell to train k-means
+            nlist = max(1, min(int(np.sqrt(len(vectors))), len(vectors) // 39))
+            self.quantizer = faiss.IndexFlatIP(dim)
+            self.index = faiss.IndexIVFFlat(self.quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            if len(vectors):
+                self.index.train(vectors)
+            self.index.nprobe = min(nprobe, nlist)
+        else:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+        if len(vectors):
+            self.index.add(vectors)
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> List[List[SearchHit]]:
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        similarities, positions = self.index.search(queries, k)
+        return [
+            [self.snapshot.hit(int(i), 2.0 - 2.0 * s) for s, i in zip(row_s, row_i) if i >= 0]
+            for row_s, row_i in zip(similarities, positions)
+        ]
+
+
+BACKENDS = ("chroma", "numpy", "faiss-flat", "faiss-hnsw", "faiss-ivf", "int8", "binary")
+
+
+def create_backend(name: str, collection, persist_directory: str, rescore_factor: int = 4) -> RetrievalBackend:
+    """
+    Build the retrieval backend selected by name
+
+    In-process backends export a snapshot of the collection on first use.
+
+    Raises:
+        ValueError: If name is not one of BACKENDS
+    """
+    if name == "chroma":
+        return ChromaBackend(collection)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown retrieval backend: {name}")
+
+    snapshot_directory = os.path.join(persist_directory, SNAPSHOT_DIRNAME)
+    if not os.path.exists(os.path.join(snapshot_directory, "chunks.json")):
+        EmbeddingSnapshot.export(collection, snapshot_directory)
+    snapshot = EmbeddingSnapshot.load(snapshot_directory)
+    log_tool("RAG", f"Using {name} retrieval backend over {len(snapshot.ids)} chunks")
+
+    if name == "numpy":
+        return NumpyBackend(snapshot)
+    if name in ("int8", "binary"):
+        # Imported here: quantized_backend builds on this module
+        from .quantized_backend import QuantizedBackend
+        return QuantizedBackend(snapshot, scheme=name, rescore_factor=rescore_factor)
+    return FaissBackend(snapshot, index_type=name.split("-", 1)[1])
@@ -0,0 +1,311 @@
+"""
+Page-aware, structure-preserving chunking for the ingestion pipeline
+
+PDFs are parsed with PyMuPDF in parallel, one page range per worker
+process; other files are loaded one per worker. Text blocks set in a
+larger font than the body text become section headings. Each section is
+split into retrieval-sized chunks that keep the section title, the page
+range they span and the ID of their parent section.
+
+Everything is a generator: parse tasks are submitted through a bounded
+window and consumed in order, so the embedder starts on the first chunks
+while later pages and files are still being parsed, and only a window of
+parsed ranges is held in memory at a time.
+"""
+
+import hashlib
+import multiprocessing
+import re
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .data_loader import DataLoader
+
+
+class Block(NamedTuple):
+    page: int  # 0-based, as PyMuPDFLoader numbers pages
+    text: str
+    is_heading: bool
+
+
+class Section(NamedTuple):
+    title: str
+    page_start: int
+    page_end: int
+    text: str
+    page_offsets: List[Tuple[int, int]]  # (character offset in text, page) where each page begins
+
+
+def page_ranges(page_count: int, workers: int, min_pages: int = 8) -> List[Tuple[int, int]]:
+    """Split pages into [start, end) ranges, about two per worker so slow pages even out"""
+    size = max(min_pages, -(-page_count // max(1, workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def parse_pdf_range(file_path: str, start: int, end: int, heading_ratio: float = 1.15) -> List[Block]:
+    """
+    Extract the text blocks of pages [start, end) and flag headings (runs in a worker process)
+
+    A block is a heading when it is short, does not end like a sentence and
+    its font is at least heading_ratio times the body size, which is the
+    most common font size by character count within the range.
+    """
+    import pymupdf
+
+    raw_blocks = []
+    size_counts = {}
+    with pymupdf.open(file_path) as document:
+        for page_number in range(start, end):
+            for block in document[page_number].get_text("dict")["blocks"]:
+                lines, size = [], 0.0
+                for line in block.get("lines", []):
+                    text = "".join(span["text"] for span in line["spans"]).strip()
+                    if text:
+                        lines.append(text)
+                    for span in line["spans"]:
+                        characters = len(span["text"].strip())
+                        if characters:
+                            size = max(size, span["size"])
+                            rounded = round(span["size"], 1)
+                            size_counts[rounded] = size_counts.get(rounded, 0) + characters
+                if lines:
+                    raw_blocks.append((page_number, "\n".join(lines), size))
+
+    body_size = max(size_counts, key=size_counts.get) if size_counts else 0.0
+    return [
+        Block(page, text, _looks_like_heading(text, size, body_size, heading_ratio))
+        for page, text, size in raw_blocks
+    ]
+
+
+def _looks_like_heading(text: str, size: float, body_size: float, heading_ratio: float) -> bool:
+    return (
+        body_size > 0
+        and size >= body_size * heading_ratio
+        and len(text) <= 150
+        and not text.rstrip().endswith((".", ",", ";"))
+    )
+
+
+def parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for parse tasks"""
+    # spawn: forking a process that already holds the embedding model is not safe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def ordered_results(
+    tasks: Iterable[Tuple[Hashable, Callable[..., Any], tuple]],
+    executor: Optional[Executor],
+    window: int
+) -> Iterator[Tuple[Hashable, Any]]:
+    """
+    Run (key, function, args) tasks and yield (key, result) in task order
+
+    At most window tasks are submitted but not yet consumed, which bounds
+    memory however many tasks there are. Without an executor tasks run
+    inline, one at a time, as results are consumed.
+    """
+    tasks = iter(tasks)
+    if executor is None:
+        for key, function, args in tasks:
+            yield key, function(*args)
+        return
+
+    pending = deque((key, executor.submit(function, *args)) for key, function, args in islice(tasks, window))
+    try:
+        while pending:
+            key, future = pending.popleft()
+            result = future.result()
+            # Refill before handing the result over, so the pool stays busy while it is processed
+            for next_key, function, args in islice(tasks, 1):
+                pending.append((next_key, executor.submit(function, *args)))
+            yield key, result
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def parse_tasks(file_path: str, workers: int) -> List[Tuple[Callable[..., List[Block]], tuple]]:
+    """(function, args) calls that together produce a file's blocks in order"""
+    if Path(file_path).suffix.lower() != ".pdf":
+        return [(load_document_blocks, (file_path,))]
+
+    import pymupdf
+
+    with pymupdf.open(file_path) as document:
+        page_count = document.page_count
+    # An empty PDF still gets a task, so it shows up as a (blockless) file
+    ranges = page_ranges(page_count, workers) or [(0, 0)]
+    return [(parse_pdf_range, (file_path, start, end)) for start, end in ranges]
+
+
+def iter_file_blocks(
+    file_paths: Iterable[str],
+    workers: int,
+    executor: Optional[Executor] = None
+) -> Iterator[Tuple[Tuple[int, str], List[Block]]]:
+    """
+    Parse files in parallel, yielding ((position, path), blocks) per task in file and page order
+
+    Page ranges of one PDF and tasks of different files share the executor's
+    window, so small files and short PDFs are parsed alongside each other.
+    """
+    tasks = (
+        ((position, file_path), function, args)
+        for position, file_path in enumerate(file_paths)
+        for function, args in parse_tasks(file_path, workers)
+    )
+    return ordered_results(tasks, executor, window=2 * workers)
+
+
+def iter_pdf_blocks(file_path: str, workers: int) -> Iterator[Block]:
+    """Blocks of a PDF in page order, parsing page ranges in parallel when workers > 1"""
+    tasks = [(index, function, args) for index, (function, args) in enumerate(parse_tasks(file_path, workers))]
+    if workers <= 1 or len(tasks) <= 1:
+        for _, blocks in ordered_results(tasks, None, window=1):
+            yield from blocks
+        return
+
+    with parse_pool(min(workers, len(tasks))) as executor:
+        for _, blocks in ordered_results(tasks, executor, window=2 * workers):
+            yield from blocks
+
+
+def iter_document_blocks(file_path: str) -> Iterator[Block]:
+    """Blocks of a non-PDF file: one per loaded document, Markdown-style '#' lines become headings"""
+    for position, document in enumerate(DataLoader(file_path).load_data()):
+        page = document.metadata.get("page", position)
+        paragraph = []
+        for line in document.page_content.splitlines():
+            match = re.match(r"#{1,6}\s+(.+)", line.strip())
+            if match:
+                if paragraph:
+                    yield Block(page, "\n".join(paragraph), False)
+                    paragraph = []
+                yield Block(page, match.group(1).strip(), True)
+            else:
+                paragraph.append(line)
+        if any(line.strip() for line in paragraph):
+            yield Block(page, "\n".join(paragraph), False)
+
+
+def load_document_blocks(file_path: str) -> List[Block]:
+    """All blocks of a non-PDF file (runs in a worker process)"""
+    return list(iter_document_blocks(file_path))
+
+
+def iter_sections(blocks: Iterable[Block], max_pages: int = 20) -> Iterator[Section]:
+    """
+    Group blocks into sections that run from one heading to the next
+
+    A section reaching max_pages pages (e.g. a PDF with no detected
+    headings) is cut at the next page boundary and continues under the same
+    title, so a section is never held in memory for more than max_pages.
+    """
+    title, parts, offsets, length = "", [], [], 0
+    page_start = page_end = None
+
+    for block in blocks:
+        too_long = parts and not block.is_heading and block.page != page_end and block.page - page_start >= max_pages
+        if (block.is_heading or too_long) and parts:
+            yield Section(title, page_start, page_end, "\n\n".join(parts), offsets)
+            parts, offsets, length, page_start = [], [], 0, None
+        if block.is_heading:
+            # Consecutive heading lines (e.g. chapter number and name) form one title
+            title = f"{title} {block.text}".strip() if not parts and page_start is not None else block.text
+            title = " ".join(title.split())
+            page_start = block.page if page_start is None else page_start
+            page_end = block.page
+            continue
+
+        if page_start is None:
+            page_start = block.page
+        if not offsets or offsets[-1][1] != block.page:
+            offsets.append((length + (2 if parts else 0), block.page))
+        length += len(block.text) + (2 if parts else 0)
+        parts.append(block.text)
+        page_end = block.page
+
+    if parts:
+        yield Section(title, page_start, page_end, "\n\n".join(parts), offsets)
+
+
+class ChunkStream:
+    """
+    Iterator over the retrieval chunks of one file
+
+    Chunk metadata: source, page and page_end (0-based), section (its
+    heading, or "" before the first heading), section_id (shared by every
+    chunk of a section, linking it to its parent) and chunk_index within
+    the section. Chunk text starts with the section heading so the
+    embedding sees the topic. The pages attribute counts pages read so far.
+
+    The file is parsed here unless blocks already parsed elsewhere (e.g. by
+    iter_file_blocks) are passed in.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        workers: int = 1,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 150,
+        blocks: Optional[Iterable[Block]] = None,
+        max_section_pages: int = 20
+    ):
+        self.file_path = file_path
+        self.workers = workers
+        self.blocks = blocks
+        self.max_section_pages = max_section_pages
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ". ", " ", ""],
+            keep_separator="end",
+            add_start_index=True
+        )
+        self.pages = 0
+        self._seen_pages = set()
+
+    def __iter__(self) -> Iterator[Document]:
+        if self.blocks is not None:
+            blocks = self.blocks
+        elif Path(self.file_path).suffix.lower() == ".pdf":
+            blocks = iter_pdf_blocks(self.file_path, self.workers)
+        else:
+            blocks = iter_document_blocks(self.file_path)
+
+        for section in iter_sections(self._count_pages(blocks), self.max_section_pages):
+            section_id = hashlib.sha256(
+                f"{self.file_path}\0{section.page_start}\0{section.title}".encode("utf-8")
+            ).hexdigest()[:16]
+            offsets = [offset for offset, _ in section.page_offsets]
+
+            pieces = self.splitter.create_documents([section.text])
+            for index, piece in enumerate(pieces):
+                start = piece.metadata["start_index"]
+                first = section.page_offsets[max(0, bisect_right(offsets, start) - 1)][1]
+                last = section.page_offsets[max(0, bisect_right(offsets, start + len(piece.page_content) - 1) - 1)][1]
+                content = f"{section.title}\n{piece.page_content}" if section.title else piece.page_content
+                yield Document(page_content=content, metadata={
+                    "source": self.file_path,
+                    "page": first,
+                    "page_end": last,
+                    "section": section.title,
+                    "section_id": section_id,
+                    "chunk_index": index,
+                })
+
+    def _count_pages(self, blocks: Iterable[Block]) -> Iterator[Block]:
+        for block in blocks:
+            if block.page not in self._seen_pages:
+                self._seen_pages.add(block.page)
+                self.pages += 1
+            yield block
@@ -4,13 +4,15 @@ Handles patient greeting, data retrieval, and basic queries
 """
 
 from agents.tools.patient_data_tool import get_patient_data
+import asyncio
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 from agents.prompts.receptionist_prompts import RECEPTIONIST_SYSTEM_PROMPT
+from agents.cache.llm_cache import llm_cache
+from agents.intent_classifier import intent_router
 load_dotenv()
 
 
@@ -24,22 +26,20 @@ class ReceptionistAgent:
             temperature=0.7
         )
         
-        # Medical keywords for routing detection
-        self.medical_keywords = [
-            # Symptoms
-            "pain", "swelling", "urine", "bp", "blood pressure", "breath", 
-            "breathing", "fever", "nausea", "dizzy", "tired", "chest", "leg",
-            "stomach", "headache", "side effect", "symptom", "feeling", "hurt",
-            "worse", "emergency", "severe",
-            # Medical information queries (for RAG/web search)
-            "latest", "recent", "new", "current", "trend", "research", 
-            "treatment", "medication", "drug", "therapy", "study", "guideline",
-            "medical", "science", "recommendation", "update"
-        ]
+        # Prompt for general queries, built once
+        self.general_prompt = ChatPromptTemplate.from_messages([
+            ("system", RECEPTIONIST_SYSTEM_PROMPT),
+            ("system", "{patient_context}"),
+            ("placeholder", "{chat_history}"),
+            ("human", "{input}")
+        ])
+        
+        # Intent classifier with keyword fallback (agents/routing_rules.json) for routing detection
+        self.intent_router = intent_router
         
         logging.info("✓ Receptionist Agent initialized")
     
-    def process(self, message: str, session: Dict, chat_history: List = None) -> Dict:
+    def process(self, message: str, session: Dict, chat_history: List = None, use_cache: bool = True) -> Dict:
         """
         Process user message through receptionist agent
         
@@ -47,38 +47,42 @@ class ReceptionistAgent:
             message: User input
             session: Session data containing patient info
             chat_history: Previous conversation history
+            use_cache: Reuse the response to an identical recent prompt
             
         Returns:
             Agent response and metadata
         """
         try:
-            logging.info(f"[RECEPTIONIST] Processing: {message[:50]}...")
-            logging.info(f"[RECEPTIONIST] Session has patient_name: {'patient_name' in session}, patient_data: {'patient_data' in session}")
+            result = self._route(message, session)
+            if result is not None:
+                return result
             
-            # STEP 1: Check if patient data is loaded
-            # Must check for BOTH patient_name AND patient_data
-            if not session.get("patient_data"):
-                logging.info(f"[RECEPTIONIST] No patient data, attempting to fetch for: {message}")
-                # Try to get patient data with the message as name
-                return self._handle_new_patient(message.strip(), session)
+            # Handle general query with LLM
+            response = self._handle_general_query(message, session.get("patient_data"), chat_history, use_cache)
             
-            # STEP 2: Patient is identified, now handle their query
-            logging.info(f"[RECEPTIONIST] Patient {session.get('patient_name')} identified, handling query")
+            return {
+                "agent": "receptionist",
+                "message": response,
+                "needs_routing": False
+            }
             
-            # Check if medical concern needs routing
-            needs_routing = self._check_medical_routing(message)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def aprocess(self, message: str, session: Dict, chat_history: List = None, use_cache: bool = True) -> Dict:
+        """
+        Async version of process that awaits the LLM without blocking the event loop
+        """
+        try:
+            if self.intent_router.enabled:
+                # The classifier embeds the message with the RAG model, which is too slow for the event loop
+                result = await asyncio.get_running_loop().run_in_executor(None, self._route, message, session)
+            else:
+                result = self._route(message, session)
+            if result is not None:
+                return result
             
-            if needs_routing:
-                logging.info("[RECEPTIONIST] Medical concern detected, routing to clinical agent")
-                return {
-                    "agent": "receptionist",
-                    "message": "I understand you have medical concerns. Let me connect you with our clinical specialist.",
-                    "needs_routing": True,
-                    "patient_data": session.get("patient_data")
-                }
-            
-            # Handle general query with LLM
-            response = self._handle_general_query(message, session.get("patient_data"), chat_history)
+            response = await self._ahandle_general_query(message, session.get("patient_data"), chat_history, use_cache)
             
             return {
                 "agent": "receptionist",
@@ -87,13 +91,50 @@ class ReceptionistAgent:
             }
             
         except Exception as e:
-            logging.error(f"[RECEPTIONIST] Error: {e}")
+            return self._error_result(e)
+    
+    def _route(self, message: str, session: Dict) -> Optional[Dict]:
+        """
+        Handle everything that does not need the LLM
+        
+        Returns:
+            Agent result, or None if the message is a general query for the LLM
+        """
+        logging.info(f"[RECEPTIONIST] Processing: {message[:50]}...")
+        logging.info(f"[RECEPTIONIST] Session has patient_name: {'patient_name' in session}, patient_data: {'patient_data' in session}")
+        
+        # STEP 1: Check if patient data is loaded
+        # Must check for BOTH patient_name AND patient_data
+        if not session.get("patient_data"):
+            logging.info(f"[RECEPTIONIST] No patient data, attempting to fetch for: {message}")
+            # Try to get patient data with the message as name
+            return self._handle_new_patient(message.strip(), session)
+        
+        # STEP 2: Patient is identified, now handle their query
+        logging.info(f"[RECEPTIONIST] Patient {session.get('patient_name')} identified, handling query")
+        
+        # Check if medical concern needs routing
+        needs_routing = self._check_medical_routing(message)
+        
+        if needs_routing:
+            logging.info("[RECEPTIONIST] Medical concern detected, routing to clinical agent")
             return {
                 "agent": "receptionist",
-                "message": "I apologize, but I'm having trouble processing your request. Could you please rephrase that?",
-                "error": str(e),
-                "needs_routing": False
+                "message": "I understand you have medical concerns. Let me connect you with our clinical specialist.",
+                "needs_routing": True,
+                "patient_data": session.get("patient_data")
             }
+        
+        return None
+    
+    def _error_result(self, error: Exception) -> Dict:
+        logging.error(f"[RECEPTIONIST] Error: {error}")
+        return {
+            "agent": "receptionist",
+            "message": "I apologize, but I'm having trouble processing your request. Could you please rephrase that?",
+            "error": str(error),
+            "needs_routing": False
+        }
     
     def _handle_new_patient(self, patient_name: str, session: Dict) -> Dict:
         """Handle initial patient identification and data retrieval"""
@@ -149,47 +190,50 @@ How can I assist you today? Do you have any questions about your medications, re
             "patient_data": data
         }
     
-    def _handle_general_query(self, user_input: str, patient_data: Dict, chat_history: List = None) -> str:
+    def _handle_general_query(self, user_input: str, patient_data: Dict, chat_history: List = None, use_cache: bool = True) -> str:
         """Handle general queries using LLM"""
         try:
-            # Build patient context
-            patient_context = ""
-            if patient_data:
-                patient_context = f"""
+            messages = self._prepare_general_messages(user_input, patient_data, chat_history)
+            response = llm_cache.invoke(self.llm, messages, use_cache=use_cache)
+            return response.content
+            
+        except Exception as e:
+            logging.error(f"[RECEPTIONIST] LLM error: {e}")
+            return self._generate_fallback_response(user_input, patient_data)
+    
+    async def _ahandle_general_query(self, user_input: str, patient_data: Dict, chat_history: List = None, use_cache: bool = True) -> str:
+        """Async version of _handle_general_query"""
+        try:
+            messages = self._prepare_general_messages(user_input, patient_data, chat_history)
+            response = await llm_cache.ainvoke(self.llm, messages, use_cache=use_cache)
+            return response.content
+            
+        except Exception as e:
+            logging.error(f"[RECEPTIONIST] LLM error: {e}")
+            return self._generate_fallback_response(user_input, patient_data)
+    
+    def _prepare_general_messages(self, user_input: str, patient_data: Dict, chat_history: List = None):
+        """Render the prompt for a general query"""
+        # Build patient context
+        patient_context = ""
+        if patient_data:
+            patient_context = f"""
 Patient Information:
 - Name: {patient_data.get('patient_name', 'Unknown')}
 - Diagnosis: {patient_data.get('primary_diagnosis', 'Not available')}
 - Discharge Date: {patient_data.get('discharge_date', 'Not available')}
 - Medications: {', '.join(patient_data.get('medications', []))}
 """
-            
-            # Create prompt with context
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", RECEPTIONIST_SYSTEM_PROMPT),
-                ("system", patient_context),
-                ("placeholder", "{chat_history}"),
-                ("human", "{input}")
-            ])
-            
-            # Create chain
-            chain = prompt | self.llm | StrOutputParser()
-            
-            # Invoke chain
-            response = chain.invoke({
-                "input": user_input,
-                "chat_history": chat_history or []
-            })
-            
-            return response
-            
-        except Exception as e:
-            logging.error(f"[RECEPTIONIST] LLM error: {e}")
-            return self._generate_fallback_response(user_input, patient_data)
+        
+        return self.general_prompt.format_messages(
+            patient_context=patient_context,
+            input=user_input,
+            chat_history=chat_history or []
+        )
     
     def _check_medical_routing(self, message: str) -> bool:
-        """Check if message contains medical keywords requiring clinical routing"""
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in self.medical_keywords)
+        """Check if message is a medical query requiring clinical routing"""
+        return self.intent_router.route(message).needs_routing
     
     def _generate_fallback_response(self, user_input: str, patient_data: Dict) -> str:
         """Generate fallback response when LLM fails"""
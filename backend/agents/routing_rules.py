@@ -0,0 +1,101 @@
+"""
+Keyword routing rules compiled into a single word-level automaton
+
+Each category (clinical routing, RAG, web search) is a list of keywords
+and phrases in routing_rules.json. They are compiled into one trie over
+words, so a message is tokenized once and every category that matched is
+found in a single pass. Keywords match whole words only, case
+insensitively, with optional plural suffixes: "new" no longer matches
+"renew" and "leg" no longer matches "allergy".
+"""
+
+import json
+import os
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from utils import config
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_rules.json")
+
+_WORD = re.compile(r"\w+")
+# Trie node key holding the categories of the phrase that ends at the node
+_END = ""
+
+
+class RoutingRules:
+    """
+    Matches messages against keyword categories in one pass over their words
+
+    Keywords are stored in a trie keyed by word; the last word of each
+    keyword is also stored with every suffix, so lookups are exact dict hits.
+    Matching starts a walk at every word and collects the categories of
+    every keyword that ends along it, so overlapping keywords ("chest" and
+    "chest pain") all count.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], suffixes: Sequence[str] = ("s", "es")):
+        self.category_names: FrozenSet[str] = frozenset(categories)
+        self.keywords: List[str] = []
+        self._root: Dict[str, dict] = {}
+
+        keyword_categories: Dict[Tuple[str, ...], Set[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                words = tuple(_WORD.findall(keyword.lower()))
+                if words:
+                    keyword_categories.setdefault(words, set()).add(category)
+
+        for words, matched in keyword_categories.items():
+            self.keywords.append(" ".join(words))
+            for last in (words[-1], *(words[-1] + suffix for suffix in suffixes)):
+                node = self._root
+                for word in (*words[:-1], last):
+                    node = node.setdefault(word, {})
+                node[_END] = frozenset(node.get(_END, frozenset()) | matched)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RoutingRules":
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        return cls(rules["categories"], rules.get("suffixes", ("s", "es")))
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """Every category with at least one keyword in the text"""
+        found: Set[str] = set()
+        for _, _, matched in self._walk(_WORD.findall(text.lower())):
+            found |= matched
+            if len(found) == len(self.category_names):
+                break
+        return frozenset(found)
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Matched keywords in the text, as written, grouped by category (for logging and debugging)"""
+        tokens = list(_WORD.finditer(text))
+        matches: Dict[str, List[str]] = {}
+        for first, last, matched in self._walk([token.group(0).lower() for token in tokens]):
+            for category in matched:
+                matches.setdefault(category, []).append(text[tokens[first].start():tokens[last].end()])
+        return matches
+
+    def _walk(self, words: List[str]):
+        """Yield (first word, last word, categories) for every keyword occurrence"""
+        root = self._root
+        for i, word in enumerate(words):
+            node = root.get(word)
+            j = i
+            while node is not None:
+                matched = node.get(_END)
+                if matched:
+                    yield i, j, matched
+                j += 1
+                node = node.get(words[j]) if j < len(words) else None
+
+
+def load_routing_rules(path: Optional[str] = None) -> RoutingRules:
+    """Compile the rules file at path, or the bundled routing_rules.json"""
+    return RoutingRules.from_file(path or DEFAULT_RULES_PATH)
+
+
+# Singleton instance
+routing_rules = load_routing_rules(config.ROUTING_RULES_PATH)
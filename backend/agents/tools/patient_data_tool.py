@@ -1,12 +1,11 @@
-import json
 import logging
 
+from agents.tools.patient_registry import patient_registry
+
 def get_patient_data(name: str):
     try:
-        with open("data/patients_json_data/patient_data.json") as f:
-            patients = json.load(f)
-        matches = [p for p in patients if p["patient_name"].lower() == name.lower()]
-        
+        matches = patient_registry.find(name)
+
         if len(matches) == 1:
             logging.info(f"✅ Found patient: {name}")
             return matches[0]
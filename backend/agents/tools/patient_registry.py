@@ -0,0 +1,122 @@
+"""
+In-memory patient registry with a normalized-name index
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+DEFAULT_PATIENT_DATA_PATH = "data/patients_json_data/patient_data.json"
+
+
+def normalize_name(name: str) -> str:
+    """Fold case and collapse whitespace so lookups ignore formatting differences"""
+    return " ".join(name.split()).casefold()
+
+
+class _RegistrySnapshot(NamedTuple):
+    """Immutable view of one load of the patient file"""
+    index: Dict[str, List[Dict[str, Any]]]
+    duplicates: List[str]
+    mtime_ns: int
+    size: int
+    record_count: int
+
+
+class PatientRegistry:
+    """
+    Loads discharge records once and serves O(1) lookups by patient name
+
+    The file is re-read only when its mtime or size changes. A reload builds a
+    complete new snapshot before swapping it in, so concurrent readers always
+    see either the old or the new index, never a partial one. If the changed
+    file cannot be read (e.g. it is half-written), lookups keep using the
+    previous snapshot and the file is retried once it changes again.
+    """
+
+    def __init__(self, file_path: str = DEFAULT_PATIENT_DATA_PATH, check_interval: float = 1.0):
+        """
+        Args:
+            file_path: Path to the patient JSON file
+            check_interval: Minimum seconds between file modification checks
+        """
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._snapshot: Optional[_RegistrySnapshot] = None
+        self._last_check = 0.0
+        self._force_reload = False
+        # (mtime_ns, size) of a file version that failed to load
+        self._failed_version: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def _load(self, mtime_ns: int, size: int) -> _RegistrySnapshot:
+        with open(self.file_path, encoding="utf-8") as f:
+            patients = json.load(f)
+
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for patient in patients:
+            key = normalize_name(patient["patient_name"])
+            index.setdefault(key, []).append(patient)
+
+        duplicates = [key for key, records in index.items() if len(records) > 1]
+        if duplicates:
+            logging.warning(f"Patient registry: {len(duplicates)} duplicate name(s): {duplicates}")
+
+        logging.info(f"✓ Patient registry loaded {len(patients)} records from {self.file_path}")
+        return _RegistrySnapshot(index, duplicates, mtime_ns, size, len(patients))
+
+    def _current_snapshot(self) -> _RegistrySnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._last_check < self.check_interval:
+                return snapshot
+
+            try:
+                stat = os.stat(self.file_path)
+                version = (stat.st_mtime_ns, stat.st_size)
+                changed = snapshot is None or version != (snapshot.mtime_ns, snapshot.size)
+                if self._force_reload or (changed and version != self._failed_version):
+                    if snapshot is not None:
+                        logging.info("Patient data file changed, reloading registry")
+                    self._force_reload = False
+                    self._failed_version = version
+                    snapshot = self._load(*version)
+                    self._snapshot = snapshot
+                    self._failed_version = None
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if snapshot is None:
+                    raise
+                logging.warning(f"Patient registry: could not reload {self.file_path} ({e}), serving the previous records")
+            self._last_check = now
+            return snapshot
+
+    def find(self, name: str) -> List[Dict[str, Any]]:
+        """Return copies of all records whose normalized name matches (callers may modify them)"""
+        return copy.deepcopy(self._current_snapshot().index.get(normalize_name(name), []))
+
+    def reload(self):
+        """Force a reload on the next lookup"""
+        with self._lock:
+            self._force_reload = True
+            self._last_check = float("-inf")
+
+    @property
+    def patient_count(self) -> int:
+        return self._current_snapshot().record_count
+
+    @property
+    def duplicate_names(self) -> List[str]:
+        return list(self._current_snapshot().duplicates)
+
+
+# Singleton instance
+patient_registry = PatientRegistry()
@@ -0,0 +1,14 @@
+from .providers import DuckDuckGoProvider, FixtureProvider, SearchProvider, SearchResult, create_provider
+from .search_service import WebSearchResponse, WebSearchService, medical_query, web_search_service
+
+__all__ = [
+    "DuckDuckGoProvider",
+    "FixtureProvider",
+    "SearchProvider",
+    "SearchResult",
+    "create_provider",
+    "WebSearchResponse",
+    "WebSearchService",
+    "medical_query",
+    "web_search_service",
+]
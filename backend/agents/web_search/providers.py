@@ -0,0 +1,92 @@
+"""
+Web search providers: the backends WebSearchService runs queries against
+"""
+
+import json
+import re
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from agents.cache.embedding_cache import normalize_query
+
+
+class SearchResult(NamedTuple):
+    title: str
+    snippet: str
+    url: str
+
+    def as_dict(self) -> Dict[str, str]:
+        return self._asdict()
+
+
+class SearchProvider:
+    """
+    Interface for a web search backend
+
+    search() runs in a WebSearchService worker thread and may block; the
+    service enforces the deadline, so providers need no timeout handling.
+    """
+
+    name = "base"
+
+    def search(self, query: str, max_results: int) -> List[SearchResult]:
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo text search, one result per hit with its own title and link"""
+
+    name = "duckduckgo"
+
+    def __init__(self, region: str = "wt-wt", safesearch: str = "moderate"):
+        from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+        self._wrapper = DuckDuckGoSearchAPIWrapper(region=region, safesearch=safesearch)
+
+    def search(self, query: str, max_results: int) -> List[SearchResult]:
+        return [
+            SearchResult(hit.get("title", ""), hit.get("snippet", ""), hit.get("link", ""))
+            for hit in self._wrapper.results(query, max_results)
+            if "snippet" in hit
+        ]
+
+
+class FixtureProvider(SearchProvider):
+    """
+    Canned results from a JSON file or dict, for offline development and tests
+
+    The fixture maps a query to a list of {"title", "snippet", "url"}
+    objects. A query matches the entry with the same normalized text, or
+    else the longest entry whose words all appear in it (punctuation ignored).
+    """
+
+    name = "fixture"
+
+    def __init__(self, fixtures: Union[str, Dict[str, List[Dict[str, str]]]]):
+        if isinstance(fixtures, str):
+            with open(fixtures, encoding="utf-8") as f:
+                fixtures = json.load(f)
+        self.fixtures = {
+            normalize_query(query): [SearchResult(r["title"], r["snippet"], r["url"]) for r in results]
+            for query, results in fixtures.items()
+        }
+
+    def search(self, query: str, max_results: int) -> List[SearchResult]:
+        key = self._match(normalize_query(query))
+        return self.fixtures[key][:max_results] if key is not None else []
+
+    def _match(self, query: str) -> Optional[str]:
+        if query in self.fixtures:
+            return query
+        words = set(re.findall(r"\w+", query))
+        matches = [key for key in self.fixtures if set(re.findall(r"\w+", key)) <= words]
+        return max(matches, key=len) if matches else None
+
+
+def create_provider(name: str, fixture_path: Optional[str] = None) -> SearchProvider:
+    """Instantiate the provider selected by WEB_SEARCH_PROVIDER"""
+    if name == "duckduckgo":
+        return DuckDuckGoProvider()
+    if name == "fixture":
+        if not fixture_path:
+            raise ValueError("WEB_SEARCH_PROVIDER=fixture requires WEB_SEARCH_FIXTURE_PATH")
+        return FixtureProvider(fixture_path)
+    raise ValueError(f"Unknown WEB_SEARCH_PROVIDER: {name}")
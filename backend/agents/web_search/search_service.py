@@ -0,0 +1,272 @@
+"""
+Web search with a result cache and a per-call deadline
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from agents.cache.embedding_cache import normalize_query
+from utils import config
+from utils.concurrency import cancel_requested
+from utils.logger import log_tool
+from .providers import SearchProvider, SearchResult, create_provider
+
+
+def medical_query(query: str) -> str:
+    """Steer a patient's question towards health sources"""
+    return f"{query} medical health information"
+
+
+class WebSearchResponse(NamedTuple):
+    query: str
+    results: List[SearchResult]
+    from_cache: bool = False
+    timed_out: bool = False
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    def format(self) -> str:
+        """Results as prompt context, one block per source"""
+        return "\n\n".join(
+            f"Source: {result.title}\n{result.snippet}\nURL: {result.url}"
+            for result in self.results
+        )
+
+
+class WebSearchService:
+    """
+    Runs provider searches in a small thread pool under a deadline
+
+    Results are cached for cache_ttl_seconds, keyed by the normalized query
+    and result count. A call that misses its deadline returns an empty,
+    timed_out response straight away. Concurrent identical searches, including
+    a retry of one that timed out, share a single provider call; when the
+    last caller waiting on it gives up, the search is cancelled if it has not
+    started yet, otherwise it finishes in the background and its results are
+    cached for the next caller. Failed searches are never cached.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[SearchProvider] = None,
+        timeout_seconds: float = 4.0,
+        cache_ttl_seconds: float = 3600,
+        cache_size: int = 256,
+        max_workers: int = 4
+    ):
+        self._provider = provider
+        self.timeout_seconds = timeout_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+
+        # Reentrant: cancelling a search under the lock runs its done callback, which takes it again
+        self._lock = threading.RLock()
+        # (normalized query, max_results) -> (results, created_at)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[List[SearchResult], float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, int], Future] = {}
+        # Callers still waiting on each in-flight search
+        self._waiters: Dict[Future, int] = {}
+        self._abandoned: Set[Future] = set()
+
+        self._hits = 0
+        self._misses = 0
+        self._joined = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._late_completions = 0
+        self._provider_ms = deque(maxlen=2000)
+
+    @property
+    def provider(self) -> SearchProvider:
+        if self._provider is None:
+            self._provider = create_provider(config.WEB_SEARCH_PROVIDER, config.WEB_SEARCH_FIXTURE_PATH)
+        return self._provider
+
+    def search(self, query: str, max_results: int = 3, timeout: Optional[float] = None) -> WebSearchResponse:
+        """
+        Search the web, waiting at most timeout seconds
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+            timeout: Deadline in seconds (defaults to timeout_seconds)
+
+        Returns:
+            Response with the results; empty with timed_out or error set on failure
+        """
+        started = time.perf_counter()
+        cached, future = self._begin(query, max_results)
+        if cached is not None:
+            return WebSearchResponse(query, cached, from_cache=True, elapsed_ms=_ms_since(started))
+
+        gave_up = False
+        try:
+            results = future.result(timeout=self.timeout_seconds if timeout is None else timeout)
+        except (FuturesTimeoutError, CancelledError):
+            gave_up = True
+            return self._timed_out(query, started)
+        except Exception as e:
+            return self._failed(query, e, started)
+        finally:
+            self._leave(future, gave_up)
+        return WebSearchResponse(query, results, elapsed_ms=_ms_since(started))
+
+    async def asearch(self, query: str, max_results: int = 3, timeout: Optional[float] = None) -> WebSearchResponse:
+        """
+        Async version of search
+
+        The shared search is shielded from this caller's deadline, so timing
+        out or cancelling the awaiting task only ends this caller's wait; the
+        search is cancelled only when no other caller is waiting on it.
+        """
+        started = time.perf_counter()
+        cached, future = self._begin(query, max_results)
+        if cached is not None:
+            return WebSearchResponse(query, cached, from_cache=True, elapsed_ms=_ms_since(started))
+
+        gave_up = False
+        wrapped = asyncio.wrap_future(future)
+        try:
+            results = await asyncio.wait_for(
+                asyncio.shield(wrapped),
+                self.timeout_seconds if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            gave_up = True
+            return self._timed_out(query, started)
+        except asyncio.CancelledError:
+            gave_up = True
+            # The search itself was cancelled (e.g. by shutdown) rather than this task
+            if future.cancelled() and not cancel_requested():
+                return self._timed_out(query, started)
+            raise
+        except Exception as e:
+            return self._failed(query, e, started)
+        finally:
+            if gave_up:
+                # Nobody awaits the shielded search any more; retrieve its outcome so asyncio does not log it
+                wrapped.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._leave(future, gave_up)
+        return WebSearchResponse(query, results, elapsed_ms=_ms_since(started))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        """Drop queued searches; running ones finish in their daemon threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses + self._joined
+            provider_ms = np.asarray(self._provider_ms or [0.0])
+            return {
+                "provider": self._provider.name if self._provider is not None else config.WEB_SEARCH_PROVIDER,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "joined": self._joined,
+                "hit_rate": (self._hits + self._joined) / lookups if lookups else 0.0,
+                "in_flight": len(self._in_flight),
+                "timeouts": self._timeouts,
+                "errors": self._errors,
+                # Searches that finished after their caller gave up; their results were cached
+                "late_completions": self._late_completions,
+                "timeout_seconds": self.timeout_seconds,
+                "provider_p50_ms": float(np.percentile(provider_ms, 50)),
+                "provider_p99_ms": float(np.percentile(provider_ms, 99)),
+            }
+
+    def _begin(self, query: str, max_results: int) -> Tuple[Optional[List[SearchResult]], Optional[Future]]:
+        """Return cached results, or the in-flight search for the query (starting it if needed)"""
+        key = (normalize_query(query), max_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.time() - entry[1] <= self.cache_ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[0], None
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._joined += 1
+                self._waiters[future] = self._waiters.get(future, 0) + 1
+                return None, future
+
+            self._misses += 1
+            future = self._executor.submit(self._run, query, max_results)
+            self._in_flight[key] = future
+            self._waiters[future] = 1
+        future.add_done_callback(lambda done: self._complete(key, done))
+        return None, future
+
+    def _leave(self, future: Future, gave_up: bool):
+        """Stop waiting on a search; the last caller to give up cancels it if it has not started"""
+        with self._lock:
+            waiters = self._waiters.pop(future, 1) - 1
+            if waiters > 0:
+                self._waiters[future] = waiters
+                return
+            if gave_up:
+                # Only a search still queued behind others can be cancelled
+                future.cancel()
+                if not future.done():
+                    self._abandoned.add(future)
+
+    def _run(self, query: str, max_results: int) -> List[SearchResult]:
+        started = time.perf_counter()
+        try:
+            return self.provider.search(query, max_results)
+        finally:
+            with self._lock:
+                self._provider_ms.append(_ms_since(started))
+
+    def _complete(self, key: Tuple[str, int], future: Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if future in self._abandoned:
+                self._abandoned.discard(future)
+                self._late_completions += not future.cancelled()
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._entries[key] = (future.result(), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+
+    def _timed_out(self, query: str, started: float) -> WebSearchResponse:
+        with self._lock:
+            self._timeouts += 1
+        elapsed_ms = _ms_since(started)
+        log_tool("WEB_SEARCH", f"Search timed out after {elapsed_ms:.0f}ms: '{query[:50]}'", level="warning")
+        return WebSearchResponse(query, [], timed_out=True, elapsed_ms=elapsed_ms)
+
+    def _failed(self, query: str, error: Exception, started: float) -> WebSearchResponse:
+        with self._lock:
+            self._errors += 1
+        log_tool("WEB_SEARCH", f"Search failed: {error}", level="error")
+        return WebSearchResponse(query, [], error=str(error), elapsed_ms=_ms_since(started))
+
+
+def _ms_since(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+# Singleton instance
+web_search_service = WebSearchService(
+    timeout_seconds=config.WEB_SEARCH_TIMEOUT_SECONDS,
+    cache_ttl_seconds=config.WEB_SEARCH_CACHE_TTL_SECONDS,
+    cache_size=config.WEB_SEARCH_CACHE_SIZE,
+    max_workers=config.WEB_SEARCH_MAX_WORKERS
+)
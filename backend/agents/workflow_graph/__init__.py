@@ -7,10 +7,13 @@ from .main import medical_system, MedicalAgentSystem, create_workflow
 from .state import AgentState
 from .nodes import (
     receptionist_node,
+    areceptionist_node,
     clinical_router_node,
     rag_node,
     web_search_node,
-    clinical_response_node
+    aweb_search_node,
+    clinical_response_node,
+    aclinical_response_node
 )
 
 __all__ = [
@@ -19,8 +22,11 @@ __all__ = [
     "create_workflow",
     "AgentState",
     "receptionist_node",
+    "areceptionist_node",
     "clinical_router_node",
     "rag_node",
     "web_search_node",
-    "clinical_response_node"
+    "aweb_search_node",
+    "clinical_response_node",
+    "aclinical_response_node"
 ]
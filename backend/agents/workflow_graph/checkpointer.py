@@ -0,0 +1,702 @@
+"""
+Session checkpointers for the medical agent workflow
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    ChannelVersions,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from utils.logger import log_workflow
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver that bounds how much session state stays in memory
+
+    - Keeps only the latest max_checkpoints_per_thread steps of each session
+    - Evicts the least recently used session beyond max_threads
+    - Evicts sessions idle for longer than idle_ttl_seconds
+    - Deletes a session's checkpoints, writes and channel blobs on delete_thread
+
+    Keys are indexed per thread so pruning and deletion never scan other sessions.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        idle_ttl_seconds: float = 3600,
+        max_checkpoints_per_thread: int = 5,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+
+        self._lock = threading.RLock()
+        # thread_id -> last access time, least recently used first
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        # thread_id -> keys into self.writes / self.blobs owned by that thread
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._blob_keys: Dict[str, Set[Tuple[str, str, str, Any]]] = {}
+        # thread_id -> (checkpoint_ns, checkpoint_id) -> channel versions of that checkpoint
+        self._checkpoint_versions: Dict[str, Dict[Tuple[str, str], ChannelVersions]] = {}
+        self._evictions = 0
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # MemorySaver's defaultdicts would otherwise create an entry for unknown threads
+            if thread_id not in self.storage:
+                return None
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config and config["configurable"]["thread_id"] not in self.storage:
+                return iter(())
+            # Materialize under the lock so concurrent pruning cannot mutate mid-iteration
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            saved_config = super().put(config, checkpoint, metadata, new_versions)
+
+            blob_keys = self._blob_keys.setdefault(thread_id, set())
+            for channel, version in new_versions.items():
+                blob_keys.add((thread_id, checkpoint_ns, channel, version))
+            self._checkpoint_versions.setdefault(thread_id, {})[(checkpoint_ns, checkpoint["id"])] = dict(
+                checkpoint["channel_versions"]
+            )
+
+            self._touch(thread_id)
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._evict()
+            return saved_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add((thread_id, checkpoint_ns, checkpoint_id))
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in self._write_keys.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._blob_keys.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            self._checkpoint_versions.pop(thread_id, None)
+            self._last_access.pop(thread_id, None)
+
+    def has_thread(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self.storage
+
+    def evict_expired(self) -> int:
+        """
+        Drop sessions idle for longer than idle_ttl_seconds
+
+        Returns:
+            Number of sessions evicted
+        """
+        with self._lock:
+            return self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory usage gauges for the retained session state"""
+        with self._lock:
+            checkpoint_count = 0
+            retained_bytes = 0
+            for namespaces in self.storage.values():
+                for checkpoints in namespaces.values():
+                    checkpoint_count += len(checkpoints)
+                    for (_, checkpoint_bytes), (_, metadata_bytes), _ in checkpoints.values():
+                        retained_bytes += len(checkpoint_bytes) + len(metadata_bytes)
+            for task_writes in self.writes.values():
+                for _, _, (_, value_bytes), _ in task_writes.values():
+                    retained_bytes += len(value_bytes)
+            for _, blob_bytes in self.blobs.values():
+                retained_bytes += len(blob_bytes)
+
+            return {
+                "backend": "memory",
+                "threads": len(self.storage),
+                "checkpoints": checkpoint_count,
+                "bytes_retained": retained_bytes,
+                "evictions": self._evictions,
+                "max_threads": self.max_threads,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "max_checkpoints_per_thread": self.max_checkpoints_per_thread,
+            }
+
+    def _touch(self, thread_id: str):
+        self._last_access[thread_id] = time.monotonic()
+        self._last_access.move_to_end(thread_id)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        """Keep only the latest checkpoints of a thread and the blobs they reference"""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+
+        thread_versions = self._checkpoint_versions.get(thread_id, {})
+        # Checkpoint IDs are time-ordered, so the oldest sort first
+        stale_ids = sorted(checkpoints)[:-self.max_checkpoints_per_thread]
+        for checkpoint_id in stale_ids:
+            del checkpoints[checkpoint_id]
+            write_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(write_key, None)
+            self._write_keys.get(thread_id, set()).discard(write_key)
+            thread_versions.pop((checkpoint_ns, checkpoint_id), None)
+
+        # Unchanged channels keep pointing at older blob versions, so keep every referenced one
+        referenced = set()
+        for checkpoint_id in checkpoints:
+            versions = thread_versions.get((checkpoint_ns, checkpoint_id), {})
+            referenced.update((thread_id, checkpoint_ns, channel, version) for channel, version in versions.items())
+
+        blob_keys = self._blob_keys.get(thread_id, set())
+        for key in [k for k in blob_keys if k[1] == checkpoint_ns and k not in referenced]:
+            self.blobs.pop(key, None)
+            blob_keys.discard(key)
+
+    def _evict(self) -> int:
+        evicted = 0
+        now = time.monotonic()
+        while self._last_access:
+            thread_id, last_access = next(iter(self._last_access.items()))
+            if len(self._last_access) <= self.max_threads and now - last_access <= self.idle_ttl_seconds:
+                break
+            self.delete_thread(thread_id)
+            evicted += 1
+
+        if evicted:
+            self._evictions += evicted
+            log_workflow(f"Evicted {evicted} idle session(s) from checkpointer")
+        return evicted
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer backed by a SQLite database in WAL mode
+
+    Sessions survive restarts and are shared by every uvicorn worker process
+    on the node: WAL lets readers proceed while one writer commits, and the
+    busy timeout serializes concurrent writers.
+
+    Each checkpoint is stored as one row holding the serialized checkpoint
+    (msgpack via the LangGraph serializer, zlib-compressed above a size
+    threshold). Writes are batched: put_writes only buffers the rows of a
+    step's tasks, and the next put of that thread commits them together
+    with the new checkpoint and the pruning of old steps in one
+    transaction. Reads and deletes of a thread flush its buffer first. A
+    crash loses only the buffered writes of the step in progress, whose
+    checkpoint was never committed either, so the step simply runs again.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL DEFAULT '',
+            checkpoint_id TEXT NOT NULL,
+            parent_checkpoint_id TEXT,
+            checkpoint_type TEXT NOT NULL,
+            checkpoint BLOB NOT NULL,
+            metadata_type TEXT NOT NULL,
+            metadata BLOB NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+        );
+        CREATE TABLE IF NOT EXISTS writes (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL DEFAULT '',
+            checkpoint_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            value_type TEXT NOT NULL,
+            value BLOB NOT NULL,
+            task_path TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+        );
+        CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at);
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_checkpoints_per_thread: int = 5,
+        idle_ttl_seconds: Optional[float] = None,
+        compress_min_bytes: int = 1024,
+        **kwargs
+    ):
+        """
+        Args:
+            db_path: SQLite database file (created if missing)
+            max_checkpoints_per_thread: Steps retained per session
+            idle_ttl_seconds: Sessions idle longer than this are deleted by evict_expired()
+            compress_min_bytes: Payloads at least this large are zlib-compressed
+        """
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.compress_min_bytes = compress_min_bytes
+        self._local = threading.local()
+        # thread_id -> (statement, rows) buffered by put_writes until the thread's next put
+        self._pending_writes: Dict[str, List[Tuple[str, List[tuple]]]] = {}
+        # Also guards the counters, which executor threads update under the async API
+        self._pending_lock = threading.Lock()
+        self._puts = 0
+        self._transactions = 0
+        self._evictions = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn.executescript(self._SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _dumps(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.compress_min_bytes:
+            return f"{type_}+zlib", zlib.compress(data, 1)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[:-len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def _row_to_tuple(self, row: sqlite3.Row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, c_type, c_data, m_type, m_data = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, value_type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self._loads(c_type, c_data),
+            metadata=self._loads(m_type, m_data),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self._loads(v_type, v_data))
+                for task_id, channel, v_type, v_data in writes
+            ],
+        )
+
+    _SELECT = (
+        "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+        "checkpoint_type, checkpoint, metadata_type, metadata FROM checkpoints "
+    )
+
+    def _transaction(self, conn: sqlite3.Connection) -> "_transaction":
+        with self._pending_lock:
+            self._transactions += 1
+        return _transaction(conn)
+
+    def _take_pending(self, thread_id: Optional[str] = None) -> Dict[str, List[Tuple[str, List[tuple]]]]:
+        """Remove and return the buffered writes of one thread, or of all threads"""
+        with self._pending_lock:
+            if thread_id is not None:
+                batches = self._pending_writes.pop(thread_id, None)
+                return {thread_id: batches} if batches else {}
+            taken, self._pending_writes = self._pending_writes, {}
+            return taken
+
+    def _restore_pending(self, taken: Dict[str, List[Tuple[str, List[tuple]]]]):
+        """Put back writes whose transaction failed, ahead of any buffered since"""
+        with self._pending_lock:
+            for thread_id, batches in taken.items():
+                self._pending_writes[thread_id] = batches + self._pending_writes.get(thread_id, [])
+
+    @staticmethod
+    def _insert_writes(conn: sqlite3.Connection, taken: Dict[str, List[Tuple[str, List[tuple]]]]):
+        for batches in taken.values():
+            for statement, rows in batches:
+                conn.executemany(statement, rows)
+
+    def flush(self, thread_id: Optional[str] = None):
+        """Commit buffered writes of one thread (or all threads) without waiting for a put"""
+        taken = self._take_pending(thread_id)
+        if taken:
+            conn = self._conn
+            try:
+                with self._transaction(conn):
+                    self._insert_writes(conn, taken)
+            except BaseException:
+                self._restore_pending(taken)
+                raise
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        self.flush(thread_id)
+        if checkpoint_id := get_checkpoint_id(config):
+            row = self._conn.execute(
+                self._SELECT + "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = self._conn.execute(
+                self._SELECT + "WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        return self._row_to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush(config["configurable"]["thread_id"] if config else None)
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        query = self._SELECT
+        if clauses:
+            query += "WHERE " + " AND ".join(clauses) + " "
+        query += "ORDER BY checkpoint_id DESC"
+        # Metadata filters are applied after decoding, so only push the limit down without them
+        if limit is not None and not filter:
+            query += f" LIMIT {int(limit)}"
+
+        remaining = limit
+        for row in self._conn.execute(query, params).fetchall():
+            checkpoint_tuple = self._row_to_tuple(row)
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                remaining -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c_type, c_data = self._dumps(checkpoint)
+        m_type, m_data = self._dumps(get_checkpoint_metadata(config, metadata))
+
+        conn = self._conn
+        taken = self._take_pending(thread_id)
+        try:
+            with self._transaction(conn):
+                self._insert_writes(conn, taken)
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        c_type,
+                        c_data,
+                        m_type,
+                        m_data,
+                        time.time(),
+                    ),
+                )
+                self._prune_thread(conn, thread_id, checkpoint_ns)
+        except BaseException:
+            # A retried put (or the next flush) commits them
+            self._restore_pending(taken)
+            raise
+
+        with self._pending_lock:
+            self._puts += 1
+            puts = self._puts
+        if self.idle_ttl_seconds and puts % 100 == 0:
+            self.evict_expired()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts) overwrite; regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(c in WRITES_IDX_MAP for c, _ in writes) else "INSERT OR IGNORE"
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            v_type, v_data = self._dumps(value)
+            rows.append((
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                v_type,
+                v_data,
+                task_path,
+            ))
+
+        with self._pending_lock:
+            self._pending_writes.setdefault(thread_id, []).append(
+                (f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._take_pending(thread_id)
+        conn = self._conn
+        with self._transaction(conn):
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def has_thread(self, thread_id: str) -> bool:
+        self.flush(thread_id)
+        row = self._conn.execute(
+            "SELECT 1 FROM checkpoints WHERE thread_id = ? LIMIT 1", (thread_id,)
+        ).fetchone()
+        return row is not None
+
+    def evict_expired(self) -> int:
+        """
+        Delete sessions idle for longer than idle_ttl_seconds
+
+        Returns:
+            Number of sessions evicted
+        """
+        if not self.idle_ttl_seconds:
+            return 0
+        self.flush()
+        cutoff = time.time() - self.idle_ttl_seconds
+        conn = self._conn
+        with self._transaction(conn):
+            expired = [
+                thread_id
+                for (thread_id,) in conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?",
+                    (cutoff,),
+                ).fetchall()
+            ]
+            for thread_id in expired:
+                conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+        if expired:
+            with self._pending_lock:
+                self._evictions += len(expired)
+            log_workflow(f"Evicted {len(expired)} idle session(s) from checkpointer")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Storage gauges for the retained session state"""
+        self.flush()
+        conn = self._conn
+        threads, checkpoints, checkpoint_bytes = conn.execute(
+            "SELECT COUNT(DISTINCT thread_id), COUNT(*), "
+            "COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+        ).fetchone()
+        (write_bytes,) = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "bytes_retained": checkpoint_bytes + write_bytes,
+            "db_file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "evictions": self._evictions,
+            "transactions": self._transactions,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "max_checkpoints_per_thread": self.max_checkpoints_per_thread,
+        }
+
+    def _prune_thread(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str):
+        """Delete all but the latest checkpoints of a thread, with their writes"""
+        stale = conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread),
+        ).fetchall()
+        if not stale:
+            return
+        keys = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale]
+        conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys
+        )
+        conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys
+        )
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: zero-padded counter plus a random tiebreaker
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
+
+    # SQLite calls are blocking, so the async API runs them in the loop's executor
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Only buffers in memory; the rows are committed by the next aput
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.delete_thread, thread_id)
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        # IMMEDIATE takes the write lock up front so concurrent writers wait on busy_timeout
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
@@ -3,19 +3,25 @@ LangGraph workflow definition for medical multi-agent system
 """
 
 import uuid
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
 from .state import AgentState
+from .checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver
 from .nodes import (
     receptionist_node,
+    areceptionist_node,
     clinical_router_node,
     rag_node,
     web_search_node,
+    aweb_search_node,
     clinical_response_node,
+    aclinical_response_node,
 )
 from utils.logger import log_workflow, logger
+from utils import config as settings
 
 
 def should_route_to_clinical(state: AgentState) -> str:
@@ -30,12 +36,20 @@ def should_route_to_clinical(state: AgentState) -> str:
     return "end"
 
 
-def should_use_rag_or_web(state: AgentState) -> str:
+def should_use_rag_or_web(state: AgentState) -> Union[str, List[str]]:
     """
-    Conditional edge: Use EITHER RAG OR web search (never both)
-    Priority: web_search > rag > direct response
+    Conditional edge: RAG and/or web search, or a direct response
+    
+    With RETRIEVAL_FANOUT_ENABLED the router may ask for both; they then run
+    as parallel branches that the clinical response waits for. Both branches
+    share one deadline, RETRIEVAL_DEADLINE_SECONDS from the clinical node, and
+    a branch that misses it contributes no context rather than delaying the
+    response. Otherwise at most one runs: web_search > rag > direct response.
     """
-    if state.get("needs_web_search"):
+    if state.get("needs_web_search") and state.get("needs_rag"):
+        log_workflow("Using RAG and web search in parallel")
+        return ["rag", "web_search"]
+    elif state.get("needs_web_search"):
         log_workflow("Using web search")
         return "web_search"
     elif state.get("needs_rag"):
@@ -46,10 +60,32 @@ def should_use_rag_or_web(state: AgentState) -> str:
         return "clinical_response"
 
 
-def create_workflow() -> StateGraph:
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Create the session checkpointer selected by CHECKPOINTER_BACKEND"""
+    if settings.CHECKPOINTER_BACKEND == "sqlite":
+        log_workflow(f"Using SQLite checkpointer at {settings.CHECKPOINT_DB_PATH}")
+        return SQLiteCheckpointSaver(
+            settings.CHECKPOINT_DB_PATH,
+            max_checkpoints_per_thread=settings.SESSION_MAX_CHECKPOINTS,
+            idle_ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS
+        )
+    if settings.CHECKPOINTER_BACKEND != "memory":
+        raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {settings.CHECKPOINTER_BACKEND}")
+    
+    return BoundedMemorySaver(
+        max_threads=settings.SESSION_MAX_THREADS,
+        idle_ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+        max_checkpoints_per_thread=settings.SESSION_MAX_CHECKPOINTS
+    )
+
+
+def create_workflow(checkpointer: Optional[BaseCheckpointSaver] = None) -> StateGraph:
     """
     Create the medical agent workflow graph
     
+    Args:
+        checkpointer: Session checkpointer (selected from config if None)
+        
     Returns:
         Compiled workflow graph
     """
@@ -58,12 +94,22 @@ def create_workflow() -> StateGraph:
     # Initialize graph
     workflow = StateGraph(AgentState)
     
-    # Add nodes
-    workflow.add_node("receptionist", receptionist_node)
+    # Add nodes - LLM and web search nodes get an async variant used by ainvoke;
+    # the other nodes run in the event loop's worker pool under ainvoke
+    workflow.add_node(
+        "receptionist",
+        RunnableLambda(receptionist_node, afunc=areceptionist_node, name="receptionist")
+    )
     workflow.add_node("clinical_router", clinical_router_node)
     workflow.add_node("rag", rag_node)
-    workflow.add_node("web_search", web_search_node)
-    workflow.add_node("clinical_response", clinical_response_node)
+    workflow.add_node(
+        "web_search",
+        RunnableLambda(web_search_node, afunc=aweb_search_node, name="web_search")
+    )
+    workflow.add_node(
+        "clinical_response",
+        RunnableLambda(clinical_response_node, afunc=aclinical_response_node, name="clinical_response")
+    )
     
     # Set entry point
     workflow.set_entry_point("receptionist")
@@ -78,7 +124,7 @@ def create_workflow() -> StateGraph:
         }
     )
     
-    # Add conditional edges from clinical router - EITHER rag OR web, never both
+    # Add conditional edges from clinical router - rag, web or (fan-out mode) both
     workflow.add_conditional_edges(
         "clinical_router",
         should_use_rag_or_web,
@@ -92,15 +138,17 @@ def create_workflow() -> StateGraph:
     # RAG goes directly to clinical response (no web search after)
     workflow.add_edge("rag", "clinical_response")
     
-    # Web search goes directly to clinical response
+    # Web search goes directly to clinical response; when both branches ran in
+    # the same step, clinical response runs once after both have returned
     workflow.add_edge("web_search", "clinical_response")
     
     # Clinical response goes to END
     workflow.add_edge("clinical_response", END)
     
-    # Compile with memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
+    # Compile with bounded session memory
+    if checkpointer is None:
+        checkpointer = create_checkpointer()
+    app = workflow.compile(checkpointer=checkpointer)
     
     log_workflow("✓ Workflow graph compiled successfully")
     
@@ -110,15 +158,17 @@ def create_workflow() -> StateGraph:
 class MedicalAgentSystem:
     """Main system for medical multi-agent interactions"""
     
-    def __init__(self):
-        self.workflow = create_workflow()
+    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None):
+        self.checkpointer = checkpointer or create_checkpointer()
+        self.workflow = create_workflow(self.checkpointer)
         log_workflow("Medical Agent System initialized")
     
     def process_message(
         self,
         message: str,
         session_id: Optional[str] = None,
-        patient_name: Optional[str] = None
+        patient_name: Optional[str] = None,
+        use_cache: bool = True
     ) -> Dict:
         """
         Process a user message through the workflow
@@ -127,6 +177,7 @@ class MedicalAgentSystem:
             message: User message
             session_id: Session identifier (creates new if None)
             patient_name: Patient name if known
+            use_cache: Allow answers from the semantic response cache
             
         Returns:
             Response dict with message and metadata
@@ -146,59 +197,179 @@ class MedicalAgentSystem:
             except:
                 has_state = False
             
-            # Prepare input - only new message for existing sessions
-            if has_state:
-                log_workflow(f"Continuing session {session_id}")
-                input_data = {"messages": [HumanMessage(content=message)]}
-            else:
-                log_workflow(f"Starting new session {session_id}")
-                input_data = {
-                    "messages": [HumanMessage(content=message)],
-                    "patient_name": patient_name,
-                    "patient_data": None,
-                    "current_agent": "receptionist",
-                    "needs_routing": False,
-                    "needs_rag": False,
-                    "needs_web_search": False,
-                    "rag_context": None,
-                    "web_search_results": None,
-                    "session_id": session_id,
-                    "conversation_count": 0,
-                    "error": None
-                }
+            input_data = self._build_input(message, session_id, patient_name, has_state, use_cache)
             
             # Run workflow
             result = self.workflow.invoke(input_data, config)
             
-            # Extract response from last message
-            last_message_obj = result["messages"][-1]
-            last_message = last_message_obj.content if hasattr(last_message_obj, 'content') else str(last_message_obj)
-            
-            log_workflow(f"Session {session_id}: Response generated")
-            
-            return {
-                "success": True,
-                "message": last_message,
-                "session_id": session_id,
-                "agent": result.get("current_agent"),
-                "patient_name": result.get("patient_name"),
-                "metadata": {
-                    "used_rag": bool(result.get("rag_context")),
-                    "used_web_search": bool(result.get("web_search_results")),
-                    "conversation_count": result.get("conversation_count", 0)
-                }
-            }
+            return self._format_result(result, session_id)
             
         except Exception as e:
-            log_workflow(f"Error processing message: {e}", level="error")
-            logger.exception(e)
-            
-            return {
-                "success": False,
-                "message": "I apologize, but I encountered an error. Please try again or contact support if the issue persists.",
-                "session_id": session_id,
-                "error": str(e)
+            return self._error_result(e, session_id)
+    
+    async def process_message_async(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        patient_name: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """
+        Async version of process_message for use inside the event loop
+        
+        Runs the workflow with ainvoke: LLM nodes are awaited and the
+        synchronous nodes run in the loop's worker pool, so a slow turn
+        never blocks other requests.
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+            log_workflow(f"New session created: {session_id}")
+        
+        try:
+            config = {"configurable": {"thread_id": session_id}}
+            
+            try:
+                existing_state = await self.workflow.aget_state(config)
+                has_state = existing_state and existing_state.values
+            except:
+                has_state = False
+            
+            input_data = self._build_input(message, session_id, patient_name, has_state, use_cache)
+            
+            result = await self.workflow.ainvoke(input_data, config)
+            
+            return self._format_result(result, session_id)
+            
+        except Exception as e:
+            return self._error_result(e, session_id)
+    
+    async def stream_message_async(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        patient_name: Optional[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream a workflow run as events
+        
+        Yields dicts with a "type" key:
+            session: {"session_id"} - always first
+            node:    {"node"} - a workflow node started
+            token:   {"node", "content"} - an LLM token from that node
+            done:    the same payload process_message returns
+            error:   {"error"} - the run failed
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+            log_workflow(f"New session created: {session_id}")
+        
+        yield {"type": "session", "session_id": session_id}
+        
+        try:
+            config = {"configurable": {"thread_id": session_id}}
+            
+            try:
+                existing_state = await self.workflow.aget_state(config)
+                has_state = existing_state and existing_state.values
+            except:
+                has_state = False
+            
+            input_data = self._build_input(message, session_id, patient_name, has_state, use_cache)
+            
+            async for mode, chunk in self.workflow.astream(
+                input_data, config, stream_mode=["tasks", "messages"]
+            ):
+                if mode == "tasks":
+                    # Task start events carry the node input, finish events carry the result
+                    if "input" in chunk:
+                        yield {"type": "node", "node": chunk["name"]}
+                elif mode == "messages":
+                    msg, metadata = chunk
+                    # Only token chunks are streamed; complete messages arrive with "done"
+                    if isinstance(msg, AIMessageChunk) and msg.content:
+                        yield {
+                            "type": "token",
+                            "node": metadata.get("langgraph_node"),
+                            "content": msg.content
+                        }
+            
+            final_state = await self.workflow.aget_state(config)
+            yield {"type": "done", **self._format_result(final_state.values, session_id)}
+            
+        except Exception as e:
+            result = self._error_result(e, session_id)
+            yield {"type": "error", "error": result["error"], "message": result["message"]}
+    
+    def _build_input(
+        self,
+        message: str,
+        session_id: str,
+        patient_name: Optional[str],
+        has_state: bool,
+        use_cache: bool = True
+    ) -> Dict:
+        """Prepare workflow input - only the new message for existing sessions"""
+        if has_state:
+            log_workflow(f"Continuing session {session_id}")
+            # Clears an error left by the previous turn
+            return {"messages": [HumanMessage(content=message)], "use_cache": use_cache, "error": None}
+        
+        log_workflow(f"Starting new session {session_id}")
+        return {
+            "messages": [HumanMessage(content=message)],
+            "patient_name": patient_name,
+            "patient_data": None,
+            "current_agent": "receptionist",
+            "needs_routing": False,
+            "needs_rag": False,
+            "needs_web_search": False,
+            "rag_context": None,
+            "rag_context_tokens": None,
+            "web_search_results": None,
+            "retrieval_deadline": None,
+            "retrieval_timings": None,
+            "use_cache": use_cache,
+            "cached_response": None,
+            "session_id": session_id,
+            "conversation_count": 0,
+            "error": None
+        }
+    
+    def _format_result(self, result: Dict, session_id: str) -> Dict:
+        """Build the response dict from the final workflow state"""
+        # Extract response from last message
+        last_message_obj = result["messages"][-1]
+        last_message = last_message_obj.content if hasattr(last_message_obj, 'content') else str(last_message_obj)
+        
+        log_workflow(f"Session {session_id}: Response generated")
+        
+        return {
+            "success": True,
+            "message": last_message,
+            "session_id": session_id,
+            "agent": result.get("current_agent"),
+            "patient_name": result.get("patient_name"),
+            "metadata": {
+                "used_rag": bool(result.get("rag_context")),
+                "used_web_search": bool(result.get("web_search_results")),
+                "from_cache": bool(result.get("cached_response")),
+                "rag_context_tokens": result.get("rag_context_tokens"),
+                "retrieval_timings": result.get("retrieval_timings") or None,
+                "conversation_count": result.get("conversation_count", 0)
             }
+        }
+    
+    def _error_result(self, error: Exception, session_id: str) -> Dict:
+        log_workflow(f"Error processing message: {error}", level="error")
+        logger.exception(error)
+        
+        return {
+            "success": False,
+            "message": "I apologize, but I encountered an error. Please try again or contact support if the issue persists.",
+            "session_id": session_id,
+            "error": str(error)
+        }
     
     def get_conversation_history(self, session_id: str) -> List[Dict]:
         """
@@ -217,7 +388,26 @@ class MedicalAgentSystem:
         except Exception as e:
             log_workflow(f"Error retrieving history: {e}", level="error")
             return []
+    
+    def clear_session(self, session_id: str) -> bool:
+        """
+        Delete all stored state for a session
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            True if the session existed
+        """
+        existed = self.checkpointer.has_thread(session_id)
+        self.checkpointer.delete_thread(session_id)
+        log_workflow(f"Session {session_id} cleared")
+        return existed
+    
+    def session_stats(self) -> Dict:
+        """Memory usage gauges for stored sessions"""
+        return self.checkpointer.stats()
 
 
 # Singleton instance
-medical_system = MedicalAgentSystem()
\ No newline at end of file
+medical_system = MedicalAgentSystem()
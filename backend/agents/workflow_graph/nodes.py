@@ -2,13 +2,21 @@
 Node functions for the medical agent workflow
 """
 
-from typing import Dict, Any
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, Any, Optional
 
 from agents.receptionist_agent import ReceptionistAgent
-from agents.clinical_agent import ClinicalAgent
-from agents.rag_setup.query_rag import query_rag
-from agents.web_search.Duck_Duck_GO import search_medical_info
+from agents.clinical_agent import ClinicalAgent, ERROR_RESPONSE
+from agents.rag_setup.context_packer import format_sources
+from agents.rag_setup.rag_service import rag_service
+from agents.cache.semantic_cache import semantic_cache, scope_key
+from agents.web_search.search_service import WebSearchResponse, medical_query, web_search_service
 from utils.logger import log_workflow, log_receptionist, log_clinical, log_tool
+from utils import config
+from .prefetch import rag_prefetcher
 from .state import AgentState
 
 
@@ -16,6 +24,12 @@ from .state import AgentState
 receptionist_agent = ReceptionistAgent()
 clinical_agent = ClinicalAgent()
 
+# Name on clinical answers in the message history, so later turns can tell they follow one
+CLINICAL_MESSAGE_NAME = "clinical"
+
+# RAG runs here when it has a fan-out deadline, so the node can stop waiting for it
+retrieval_executor = ThreadPoolExecutor(max_workers=config.RETRIEVAL_WORKER_THREADS, thread_name_prefix="retrieval")
+
 
 def receptionist_node(state: AgentState) -> Dict[str, Any]:
     """
@@ -23,6 +37,41 @@ def receptionist_node(state: AgentState) -> Dict[str, Any]:
     """
     log_workflow("Entering receptionist node")
     
+    last_message, session, chat_history = _receptionist_inputs(state)
+    _start_rag_prefetch(state, last_message)
+    
+    # Process through receptionist
+    result = receptionist_agent.process(
+        message=last_message,
+        session=session,
+        chat_history=chat_history,
+        use_cache=state.get("use_cache", True)
+    )
+    
+    return _receptionist_updates(state, result)
+
+
+async def areceptionist_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Async receptionist node - awaits the LLM instead of holding a worker thread
+    """
+    log_workflow("Entering receptionist node")
+    
+    last_message, session, chat_history = _receptionist_inputs(state)
+    _start_rag_prefetch(state, last_message)
+    
+    result = await receptionist_agent.aprocess(
+        message=last_message,
+        session=session,
+        chat_history=chat_history,
+        use_cache=state.get("use_cache", True)
+    )
+    
+    return _receptionist_updates(state, result)
+
+
+def _receptionist_inputs(state: AgentState):
+    """Extract the last message, session context and chat history for the receptionist"""
     # Get last message - handle LangGraph message objects
     messages = state["messages"]
     if messages:
@@ -45,13 +94,11 @@ def receptionist_node(state: AgentState) -> Dict[str, Any]:
             role = "user" if msg.__class__.__name__ == "HumanMessage" else "assistant"
             chat_history.append({"role": role, "content": msg.content})
     
-    # Process through receptionist
-    result = receptionist_agent.process(
-        message=last_message,
-        session=session,
-        chat_history=chat_history
-    )
-    
+    return last_message, session, chat_history
+
+
+def _receptionist_updates(state: AgentState, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a receptionist result into state updates"""
     log_receptionist(f"Response: {result['message'][:100]}...")
     
     # Update state - messages will be automatically converted by add_messages
@@ -72,10 +119,20 @@ def receptionist_node(state: AgentState) -> Dict[str, Any]:
     # Set routing if needed
     if result.get("needs_routing"):
         log_workflow("Routing to clinical agent")
+    elif config.RAG_PREFETCH_ENABLED:
+        rag_prefetcher.discard(state.get("session_id"))
     
     return updates
 
 
+def _start_rag_prefetch(state: AgentState, message: str):
+    """Speculatively retrieve for an identified patient while the receptionist decides on routing"""
+    if not (config.RAG_PREFETCH_ENABLED and state.get("patient_data") and state.get("session_id") and message):
+        return
+    # The state as the RAG node will see it: patient_data only changes when a patient is identified
+    rag_prefetcher.start(state["session_id"], message, _retrieve_rag, dict(state), message)
+
+
 def clinical_router_node(state: AgentState) -> Dict[str, Any]:
     """
     Clinical router node - determines if RAG or web search is needed
@@ -95,21 +152,91 @@ def clinical_router_node(state: AgentState) -> Dict[str, Any]:
     
     log_workflow(f"Analyzing user query for clinical needs: '{user_message[:50]}...'")
     
-    # Determine what the clinical agent needs
-    needs_assessment = clinical_agent.assess_query_needs(user_message)
+    # Determine what the clinical agent needs; in fan-out mode a query may want both
+    fan_out = config.RETRIEVAL_FANOUT_ENABLED
+    needs_assessment = clinical_agent.assess_query_needs(user_message, allow_both=fan_out)
     
     log_clinical(f"Needs assessment: RAG={needs_assessment['needs_rag']}, Web={needs_assessment['needs_web_search']}")
     
+    if config.RAG_PREFETCH_ENABLED and not needs_assessment["needs_rag"]:
+        rag_prefetcher.discard(state.get("session_id"))
+    
+    # Web search answers are time-sensitive, so only the other paths use the cache
+    if not needs_assessment["needs_web_search"]:
+        cached_response = _semantic_cache_lookup(state, user_message)
+        if cached_response is not None:
+            log_clinical("Semantic cache hit - skipping retrieval and generation")
+            rag_prefetcher.discard(state.get("session_id"))
+            return {
+                "current_agent": "clinical",
+                "needs_rag": False,
+                "needs_web_search": False,
+                "rag_context": None,
+                "rag_context_tokens": None,
+                "web_search_results": None,
+                "retrieval_deadline": None,
+                "retrieval_timings": None,
+                "cached_response": cached_response
+            }
+    
     # CRITICAL: Clear previous tool contexts to prevent contamination
     return {
         "current_agent": "clinical",
         "needs_rag": needs_assessment["needs_rag"],
         "needs_web_search": needs_assessment["needs_web_search"],
         "rag_context": None,
-        "web_search_results": None
+        "rag_context_tokens": None,
+        "web_search_results": None,
+        # Shared by the parallel branches; serial retrieval keeps its own timeouts
+        "retrieval_deadline": time.time() + config.RETRIEVAL_DEADLINE_SECONDS if fan_out else None,
+        "retrieval_timings": None,
+        "cached_response": None
     }
 
 
+def _semantic_cache_enabled(state: AgentState) -> bool:
+    """
+    Cached answers are only for standalone questions: after an earlier
+    clinical answer in the session a message may be a follow-up ("what
+    about at night?") that means nothing without its conversation
+    """
+    return (
+        config.SEMANTIC_CACHE_ENABLED
+        and state.get("use_cache", True)
+        and not _has_clinical_history(state)
+    )
+
+
+def _has_clinical_history(state: AgentState) -> bool:
+    return any(getattr(msg, "name", None) == CLINICAL_MESSAGE_NAME for msg in state["messages"][:-1])
+
+
+def _semantic_cache_lookup(state: AgentState, user_message: str) -> Optional[str]:
+    """Return a cached answer for a similar query from a patient in the same scope"""
+    if not _semantic_cache_enabled(state):
+        return None
+    try:
+        embedding = rag_service.embed_query(user_message)
+        if embedding is None:
+            return None
+        return semantic_cache.lookup(embedding, scope_key(state.get("patient_data")))
+    except Exception as e:
+        log_clinical(f"Semantic cache lookup failed: {e}", level="warning")
+        return None
+
+
+def _semantic_cache_store(state: AgentState, user_message: str, response: str):
+    """Cache a freshly generated answer unless it came from web search or an error"""
+    if not _semantic_cache_enabled(state) or state.get("web_search_results") or response == ERROR_RESPONSE:
+        return
+    try:
+        embedding = rag_service.embed_query(user_message)
+        if embedding is not None:
+            semantic_cache.store(embedding, scope_key(state.get("patient_data")), user_message, response)
+    except Exception as e:
+        log_clinical(f"Semantic cache store failed: {e}", level="warning")
+
+
 def rag_node(state: AgentState) -> Dict[str, Any]:
     """
     RAG node - retrieves context from medical knowledge base
@@ -128,20 +255,61 @@ def rag_node(state: AgentState) -> Dict[str, Any]:
     
     log_workflow(f"Querying RAG for: '{user_message[:50]}...'")
     
+    started = time.perf_counter()
+    time_left = _time_left(state)
+    prefetch = rag_prefetcher.take(state.get("session_id"), user_message) if config.RAG_PREFETCH_ENABLED else None
+    if prefetch is None and time_left is None:
+        updates = _retrieve_rag(state, user_message)
+        status = "error" if updates.get("error") else "ok"
+    else:
+        future = prefetch.future if prefetch else retrieval_executor.submit(_retrieve_rag, state, user_message)
+        try:
+            updates = dict(future.result(timeout=time_left))
+            status = "error" if updates.get("error") else "prefetched" if prefetch else "ok"
+        except FuturesTimeoutError:
+            # Retrieval finishes in the background; the response goes ahead without it
+            future.cancel()
+            log_tool("RAG", "Missed the retrieval deadline, continuing without RAG context", level="warning")
+            updates = {"rag_context": None, "rag_context_tokens": None}
+            status = "timed_out"
+    
+    timing = _branch_timing((time.perf_counter() - started) * 1000, status)
+    if prefetch is not None:
+        # Retrieval time that overlapped the receptionist and router steps
+        timing["saved_ms"] = round(prefetch.saved_ms(started), 1)
+        rag_prefetcher.record_saved(timing["saved_ms"])
+        log_tool("RAG", f"Used prefetched retrieval, {timing['saved_ms']:.0f}ms saved")
+    updates["retrieval_timings"] = {"rag": timing}
+    return updates
+
+
+def _retrieve_rag(state: AgentState, user_message: str) -> Dict[str, Any]:
+    """Retrieve and pack the RAG context for the user message"""
     try:
-        # Query RAG system
-        rag_results = query_rag(user_message, top_k=3)
-        
-        # Format context
-        context = "\n\n".join([
-            f"Source {i+1}:\n{doc['content']}"
-            for i, doc in enumerate(rag_results)
-        ])
+        # Query the resident RAG service (model and collection stay loaded)
+        patient_data = state.get("patient_data")
+        if config.RAG_PATIENT_CONTEXT_ENABLED and patient_data:
+            # Also search with the patient's diagnosis and medications
+            rag_results = rag_service.query_for_patient(user_message, patient_data, top_k=3)
+        else:
+            rag_results = rag_service.query(user_message, top_k=3)
         
         log_tool("RAG", f"Retrieved {len(rag_results)} relevant documents")
-        
+
+        # Keep only the most relevant sentence windows within the token budget
+        packed = rag_service.pack_context(user_message, rag_results) if rag_results else None
+        if packed is None:
+            context = format_sources([doc['content'] for doc in rag_results])
+            return {"rag_context": context, "rag_context_tokens": None}
+
+        log_tool(
+            "RAG",
+            f"Packed context into {packed.tokens} tokens ({packed.tokens_saved} of "
+            f"{packed.original_tokens} saved, {packed.windows_used}/{packed.windows_total} windows)"
+        )
         return {
-            "rag_context": context
+            "rag_context": packed.text,
+            "rag_context_tokens": packed.summary()
         }
         
     except Exception as e:
@@ -152,46 +320,76 @@ def rag_node(state: AgentState) -> Dict[str, Any]:
         }
 
 
+def _time_left(state: AgentState) -> Optional[float]:
+    """Seconds until the shared retrieval deadline, or None when retrieval is serial"""
+    deadline = state.get("retrieval_deadline")
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def _branch_timing(elapsed_ms: float, status: str) -> Dict[str, Any]:
+    return {"ms": round(elapsed_ms, 1), "status": status}
+
+
 def web_search_node(state: AgentState) -> Dict[str, Any]:
     """
     Web search node - searches for current medical information
     """
     log_workflow("Entering web search node")
     
-    # Get the ORIGINAL USER MESSAGE
-    messages = state["messages"]
+    user_message = _web_search_inputs(state)
     
-    # Find the last user message (HumanMessage)
+    # Bounded by the fan-out deadline or WEB_SEARCH_TIMEOUT_SECONDS; a slow search never holds up the turn
+    response = web_search_service.search(medical_query(user_message), max_results=3, timeout=_time_left(state))
+    
+    return _web_search_updates(response)
+
+
+async def aweb_search_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Async web search node - awaits the search instead of holding a worker thread
+    """
+    log_workflow("Entering web search node")
+    
+    user_message = _web_search_inputs(state)
+    
+    response = await web_search_service.asearch(
+        medical_query(user_message), max_results=3, timeout=_time_left(state)
+    )
+    
+    return _web_search_updates(response)
+
+
+def _web_search_inputs(state: AgentState) -> str:
+    """The last user message, which is what gets searched"""
     user_message = ""
-    for msg in reversed(messages):
+    for msg in reversed(state["messages"]):
         if hasattr(msg, '__class__') and msg.__class__.__name__ == "HumanMessage":
             user_message = msg.content if hasattr(msg, 'content') else str(msg)
             break
     
     log_workflow(f"Web searching for: '{user_message[:50]}...'")
-    
-    try:
-        # Perform web search
-        search_results = search_medical_info(user_message, max_results=3)
-        
-        # Format results
-        formatted_results = "\n\n".join([
-            f"Source: {result['title']}\n{result['snippet']}\nURL: {result['url']}"
-            for result in search_results
-        ])
-        
-        log_tool("WEB_SEARCH", f"Found {len(search_results)} results")
-        
-        return {
-            "web_search_results": formatted_results
-        }
-        
-    except Exception as e:
-        log_tool("WEB_SEARCH", f"Error: {e}", level="error")
+    return user_message
+
+
+def _web_search_updates(response: WebSearchResponse) -> Dict[str, Any]:
+    """State updates from a search response"""
+    if response.error:
         return {
             "web_search_results": None,
-            "error": f"Web search error: {str(e)}"
+            "retrieval_timings": {"web_search": _branch_timing(response.elapsed_ms, "error")},
+            "error": f"Web search error: {response.error}"
         }
+    
+    status = "cache" if response.from_cache else "timed_out" if response.timed_out else "ok"
+    log_tool("WEB_SEARCH", f"Found {len(response.results)} results ({status}, {response.elapsed_ms:.0f}ms)")
+    
+    # No results (or a timeout) leaves the clinical agent without web context
+    return {
+        "web_search_results": response.format() or None,
+        "retrieval_timings": {"web_search": _branch_timing(response.elapsed_ms, status)}
+    }
 
 
 def clinical_response_node(state: AgentState) -> Dict[str, Any]:
@@ -200,6 +398,50 @@ def clinical_response_node(state: AgentState) -> Dict[str, Any]:
     """
     log_workflow("Entering clinical response node")
     
+    if state.get("cached_response"):
+        return _clinical_response_updates(state, state["cached_response"])
+    
+    user_message, context, chat_history = _clinical_response_inputs(state)
+    
+    # Generate response
+    response = clinical_agent.generate_response(
+        query=user_message,
+        context=context,
+        chat_history=chat_history,
+        use_cache=state.get("use_cache", True)
+    )
+    _semantic_cache_store(state, user_message, response)
+    
+    return _clinical_response_updates(state, response)
+
+
+async def aclinical_response_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Async clinical response node - awaits the LLM instead of holding a worker thread
+    """
+    log_workflow("Entering clinical response node")
+    
+    if state.get("cached_response"):
+        return _clinical_response_updates(state, state["cached_response"])
+    
+    user_message, context, chat_history = _clinical_response_inputs(state)
+    
+    response = await clinical_agent.agenerate_response(
+        query=user_message,
+        context=context,
+        chat_history=chat_history,
+        use_cache=state.get("use_cache", True)
+    )
+    # Embedding is CPU work - keep it off the event loop
+    await asyncio.get_running_loop().run_in_executor(
+        None, _semantic_cache_store, state, user_message, response
+    )
+    
+    return _clinical_response_updates(state, response)
+
+
+def _clinical_response_inputs(state: AgentState):
+    """Extract the user query, tool context and chat history for the clinical agent"""
     # Get the ORIGINAL USER MESSAGE (not receptionist's routing message)
     messages = state["messages"]
     
@@ -226,19 +468,17 @@ def clinical_response_node(state: AgentState) -> Dict[str, Any]:
             role = "user" if msg.__class__.__name__ == "HumanMessage" else "assistant"
             chat_history.append({"role": role, "content": msg.content})
     
-    # Generate response
-    response = clinical_agent.generate_response(
-        query=user_message,
-        context=context,
-        chat_history=chat_history
-    )
-    
+    return user_message, context, chat_history
+
+
+def _clinical_response_updates(state: AgentState, response: str) -> Dict[str, Any]:
+    """Turn a clinical response into state updates"""
     log_clinical(f"Response generated: {response[:100]}...")
     
     from langchain_core.messages import AIMessage
     
     return {
-        "messages": [AIMessage(content=response)],
+        "messages": [AIMessage(content=response, name=CLINICAL_MESSAGE_NAME)],
         "current_agent": "clinical",
         "needs_routing": False,
         "conversation_count": state.get("conversation_count", 0) + 1
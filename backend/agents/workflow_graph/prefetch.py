@@ -0,0 +1,118 @@
+"""
+Speculative background work started before the workflow knows it is needed
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from utils import config
+
+
+class Prefetch:
+    """A speculative call for one session message"""
+
+    def __init__(self, message: str, future: Future):
+        self.message = message
+        self.future = future
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def saved_ms(self, needed_at: float) -> float:
+        """Work done before the result was needed: all of it, or the overlap if it was still running"""
+        end = needed_at if self.finished is None else min(needed_at, self.finished)
+        return max(0.0, (end - self.started) * 1000)
+
+
+class SpeculativePrefetcher:
+    """
+    Runs a call ahead of time, keyed by session, for a later node to consume
+
+    start() replaces any earlier prefetch of the session. take() hands the
+    prefetch over only if it was started for the same message; discard()
+    drops it when routing decides it is not needed. Queued calls are
+    cancelled on discard, running ones finish and their result is dropped.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, Prefetch]" = OrderedDict()
+
+        self._started = 0
+        self._consumed = 0
+        self._discarded = 0
+        self._wasted_ms = 0.0
+        self._saved_ms = deque(maxlen=2000)
+
+    def start(self, key: str, message: str, fn: Callable[..., Any], *args) -> Prefetch:
+        """Run fn(*args) in the background for the session's current message"""
+        prefetch = Prefetch(message, None)
+
+        def run():
+            try:
+                return fn(*args)
+            finally:
+                prefetch.finished = time.perf_counter()
+
+        prefetch.future = self._executor.submit(run)
+        with self._lock:
+            self._started += 1
+            self._drop(self._pending.pop(key, None))
+            self._pending[key] = prefetch
+            while len(self._pending) > self.max_pending:
+                self._drop(self._pending.popitem(last=False)[1])
+        return prefetch
+
+    def take(self, key: str, message: str) -> Optional[Prefetch]:
+        """Claim the session's prefetch if it was started for this message"""
+        with self._lock:
+            prefetch = self._pending.pop(key, None)
+            if prefetch is None:
+                return None
+            if prefetch.message != message:
+                self._drop(prefetch)
+                return None
+            self._consumed += 1
+            return prefetch
+
+    def discard(self, key: str):
+        with self._lock:
+            self._drop(self._pending.pop(key, None))
+
+    def record_saved(self, saved_ms: float):
+        with self._lock:
+            self._saved_ms.append(saved_ms)
+
+    def _drop(self, prefetch: Optional[Prefetch]):
+        if prefetch is None:
+            return
+        self._discarded += 1
+        if not prefetch.future.cancel() and prefetch.finished is not None:
+            self._wasted_ms += (prefetch.finished - prefetch.started) * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved_ms = np.asarray(self._saved_ms or [0.0])
+            return {
+                "enabled": config.RAG_PREFETCH_ENABLED,
+                "started": self._started,
+                "consumed": self._consumed,
+                "discarded": self._discarded,
+                "pending": len(self._pending),
+                # Latency taken off the clinical turns that used a prefetch
+                "saved_p50_ms": float(np.percentile(saved_ms, 50)),
+                "saved_mean_ms": float(saved_ms.mean()),
+                "saved_total_ms": float(sum(self._saved_ms)),
+                # Completed retrieval work that routing did not need
+                "wasted_ms": self._wasted_ms,
+            }
+
+
+# Singleton instance
+rag_prefetcher = SpeculativePrefetcher(max_workers=config.RAG_PREFETCH_WORKERS)
@@ -6,6 +6,26 @@ from typing import TypedDict, Annotated, List, Optional, Dict, Any
 from langgraph.graph.message import add_messages
 
 
+def merge_timings(
+    left: Optional[Dict[str, Dict[str, Any]]],
+    right: Optional[Dict[str, Dict[str, Any]]]
+) -> Dict[str, Dict[str, Any]]:
+    """Combine the timings of parallel retrieval branches; None starts a new turn"""
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+
+def latest_error(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """
+    Last reported error; None clears it at the start of a turn
+
+    Parallel retrieval branches may both report an error in one step, and
+    they only write the channel when they fail.
+    """
+    return right
+
+
 class AgentState(TypedDict):
     """State for the medical agent workflow"""
     
@@ -24,9 +44,16 @@ class AgentState(TypedDict):
     needs_rag: bool
     needs_web_search: bool
     rag_context: Optional[str]
+    rag_context_tokens: Optional[Dict[str, int]]  # packed vs full-chunk token counts
     web_search_results: Optional[str]
+    retrieval_deadline: Optional[float]  # epoch seconds; parallel retrieval branches stop waiting then
+    retrieval_timings: Annotated[Dict[str, Dict[str, Any]], merge_timings]  # branch -> {"ms", "status"}
+    
+    # Semantic response cache
+    use_cache: bool  # per-request opt-out
+    cached_response: Optional[str]  # answer found by the router, served without an LLM call
     
     # Metadata
     session_id: str
     conversation_count: int
-    error: Optional[str]
\ No newline at end of file
+    error: Annotated[Optional[str], latest_error]
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Checkpoint write/read latency: MemorySaver vs BoundedMemorySaver vs SQLiteCheckpointSaver
+
+Run from backend/:
+    python -m benchmarks.checkpointer_benchmark --turns 200
+"""
+
+import argparse
+import os
+import tempfile
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.workflow_graph.checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver
+from benchmarks.timing import format_row, summarize, time_calls
+
+PATIENT = {
+    "patient_name": "John Smith",
+    "discharge_date": "2024-01-15",
+    "primary_diagnosis": "Chronic Kidney Disease Stage 3",
+    "medications": ["Lisinopril 10mg daily", "Furosemide 20mg twice daily"],
+    "dietary_restrictions": "Low sodium (2g/day), fluid restriction (1.5L/day)",
+    "follow_up": "Nephrology clinic in 2 weeks",
+    "warning_signs": "Swelling, shortness of breath, decreased urine output",
+    "discharge_instructions": "Monitor blood pressure daily",
+}
+
+
+def make_state(turn: int) -> dict:
+    """AgentState channel values after `turn` question/answer pairs"""
+    messages = []
+    for i in range(turn):
+        messages.append(HumanMessage(content=f"Question {i}: I have some swelling in my legs, is that normal?"))
+        messages.append(AIMessage(content="Swelling can be related to your kidney disease. " * 12))
+    return {
+        "messages": messages,
+        "patient_name": PATIENT["patient_name"],
+        "patient_data": PATIENT,
+        "current_agent": "clinical",
+        "needs_routing": False,
+        "needs_rag": True,
+        "needs_web_search": False,
+        "rag_context": "Source 1:\n" + "Edema is common in chronic kidney disease. " * 70,
+        "web_search_results": None,
+        "session_id": "bench",
+        "conversation_count": turn * 2,
+        "error": None,
+    }
+
+
+def run(saver, turns: int, threads: int):
+    """Write `turns` checkpoints per thread, then read the latest of each"""
+    put_samples, get_samples = [], []
+    for t in range(threads):
+        thread_id = f"bench-{t}"
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        versions = {}
+        for turn in range(1, turns + 1):
+            checkpoint = empty_checkpoint()
+            checkpoint["id"] = str(uuid6(clock_seq=turn))
+            values = make_state(turn)
+            new_versions = {}
+            for channel in values:
+                versions[channel] = saver.get_next_version(versions.get(channel), None)
+                new_versions[channel] = versions[channel]
+            checkpoint["channel_values"] = values
+            checkpoint["channel_versions"] = dict(versions)
+
+            put_samples += time_calls(
+                lambda: saver.put(config, checkpoint, {"source": "loop", "step": turn}, new_versions), 1
+            )
+            config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": checkpoint["id"]}}
+
+        latest = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        get_samples += time_calls(lambda: saver.get_tuple(latest), 20)
+    return summarize(put_samples), summarize(get_samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100, help="checkpoints written per session")
+    parser.add_argument("--threads", type=int, default=5, help="number of sessions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        savers = {
+            "MemorySaver": MemorySaver(),
+            "BoundedMemorySaver": BoundedMemorySaver(max_checkpoints_per_thread=5),
+            "SQLiteCheckpointSaver": SQLiteCheckpointSaver(os.path.join(tmp, "bench.db")),
+        }
+        print(f"{args.threads} sessions x {args.turns} checkpoints each\n")
+        for name, saver in savers.items():
+            put_stats, get_stats = run(saver, args.turns, args.threads)
+            print(format_row(f"{name} put", put_stats))
+            print(format_row(f"{name} get_tuple", get_stats))
+            if hasattr(saver, "stats"):
+                stats = saver.stats()
+                print(f"{'':<34} retained {stats['checkpoints']} checkpoints, {stats['bytes_retained'] / 1024:.1f} KiB")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Routing accuracy, calibration and latency of the intent classifier vs keywords
+
+The classifier is trained the way the server trains it (generated examples,
+fixed seed) and evaluated on examples generated with another seed plus
+hand-written messages the templates do not cover. Keyword routing maps the
+rule categories to an intent: no clinical match is general, a web search
+match is web_search, anything else is rag. "hybrid" is what the router does:
+the classifier above the confidence threshold, keywords below it.
+
+Calibration is reported as expected calibration error (ECE) of the raw
+cosine softmax and of the temperature-scaled one. Latency is split into the
+message embedding and the centroid step; in the server the embedding is
+shared with the semantic cache and retrieval.
+
+By default texts are embedded with a hashed bag-of-words encoder so the
+benchmark runs offline; --model uses a SentenceTransformer instead.
+
+Run from backend/:
+    python -m benchmarks.intent_benchmark --examples 150
+    python -m benchmarks.intent_benchmark --model all-MiniLM-L6-v2
+"""
+
+import argparse
+import random
+import tempfile
+
+import numpy as np
+from faker import Faker
+
+from agents.intent_classifier import INTENTS, IntentRouter, expected_calibration_error, softmax
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.routing_rules import routing_rules
+from benchmarks.patient_query_benchmark import HashingEncoder
+from benchmarks.timing import format_row, summarize, time_calls
+from utils.patient_data_generation import MedicalDataGenerator
+
+HAND_WRITTEN = [
+    ("Can I renew my prescription online?", "general"),
+    ("I have an allergy to penicillin, is that on file?", "general"),
+    ("What are the visiting hours?", "general"),
+    ("Could you tell me my nurse's name?", "general"),
+    ("My ankles have puffed up since this morning", "rag"),
+    ("I can't catch my breath when I climb stairs", "rag"),
+    ("Should I be worried about blood in my urine?", "rag"),
+    ("Is it normal to feel light-headed after my pills?", "rag"),
+    ("My incision looks red and warm", "rag"),
+    ("What's new in heart failure care this year?", "web_search"),
+    ("Are there any breakthroughs for kidney disease?", "web_search"),
+    ("What do the newest studies say about statins?", "web_search"),
+]
+
+
+def keyword_intent(message: str) -> str:
+    categories = routing_rules.categories(message)
+    if "clinical" not in categories:
+        return "general"
+    return "web_search" if "web_search" in categories else "rag"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", type=int, default=150, help="training examples per intent")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--model", help="SentenceTransformer model (default: offline hashing encoder)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            store = VectorStore(args.model, persist_directory=tmp)
+        else:
+            store = VectorStore("hashing", persist_directory=tmp, embedding_model=HashingEncoder())
+
+        router = IntentRouter(routing_rules, enabled=True, threshold=args.threshold, examples_per_intent=args.examples)
+        router.train(store.embed_texts, store.encode_query)
+        classifier = router.classifier
+
+        random.seed(1)
+        Faker.seed(1)
+        generated = MedicalDataGenerator().generate_intent_examples(max(args.examples // 3, 20))
+        evaluation = [(e["query"], e["intent"]) for e in generated] + HAND_WRITTEN
+        messages = [message for message, _ in evaluation]
+        labels = np.array([INTENTS.index(intent) for _, intent in evaluation])
+        print(f"{args.examples * len(INTENTS)} training examples, {len(evaluation)} evaluation messages "
+              f"({len(HAND_WRITTEN)} hand-written), temperature {classifier.temperature:.4f}\n")
+
+        embeddings = store.embed_texts(messages)
+        probabilities = classifier.predict_proba(embeddings)
+        predicted = probabilities.argmax(axis=1)
+        confident = probabilities.max(axis=1) >= args.threshold
+        keyword = np.array([INTENTS.index(keyword_intent(message)) for message in messages])
+        hybrid = np.where(confident, predicted, keyword)
+        hand = slice(len(generated), None)
+
+        print(f"{'router':<12} {'accuracy':>9} {'hand-written':>13}")
+        for name, choice in (("keywords", keyword), ("classifier", predicted), ("hybrid", hybrid)):
+            print(f"{name:<12} {(choice == labels).mean():9.3f} {(choice[hand] == labels[hand]).mean():13.3f}")
+        print(f"\nclassifier confident on {confident.mean():.1%} of messages")
+
+        raw = softmax(classifier.scores(embeddings))
+        print(f"ECE raw cosine softmax:    {expected_calibration_error(raw, labels):.3f}")
+        print(f"ECE temperature-scaled:    {expected_calibration_error(probabilities, labels):.3f}\n")
+
+        stream = iter(messages * 3)
+        print(format_row("embed message (uncached)", summarize(time_calls(lambda: store.embed_texts([next(stream)]), len(messages)))))
+        stream = iter(embeddings)
+        print(format_row("centroid step", summarize(time_calls(lambda: classifier.predict(next(stream)), len(messages)))))
+        stream = iter(messages * 3)
+        print(format_row("keyword rules", summarize(time_calls(lambda: routing_rules.categories(next(stream)), len(messages)))))
+
+
+if __name__ == "__main__":
+    main()
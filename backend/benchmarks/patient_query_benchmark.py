@@ -0,0 +1,120 @@
+"""
+Retrieval quality of raw vs patient-context-aware RAG queries
+
+Symptom questions come from MedicalDataGenerator.generate_symptom_queries
+and are each asked by a generated patient. The corpus is built from the
+generator's per-diagnosis discharge knowledge (medications, warning signs,
+diet, follow-up), with every diagnosis also discussing the same common
+symptoms, so a vague question alone cannot tell which condition applies.
+precision@k is the share of retrieved chunks about the asking patient's
+diagnosis.
+
+By default texts are embedded with a hashed bag-of-words encoder so the
+benchmark runs offline; --model uses a SentenceTransformer instead.
+
+Run from backend/:
+    python -m benchmarks.patient_query_benchmark --queries 200 --k 3
+    python -m benchmarks.patient_query_benchmark --model all-MiniLM-L6-v2
+"""
+
+import argparse
+import hashlib
+import random
+import tempfile
+
+import numpy as np
+from faker import Faker
+
+from agents.rag_setup.bm25_index import tokenize
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.rag_setup.patient_queries import build_retrieval_queries
+from benchmarks.timing import summarize, time_calls
+from utils.patient_data_generation import MedicalDataGenerator
+
+SYMPTOMS = ["pain", "swelling", "nausea", "dizziness", "fatigue", "shortness of breath",
+            "headache", "chest pain", "abdominal pain", "leg pain", "back pain"]
+
+
+class HashingEncoder:
+    """Hashed bag-of-words vectors: an offline stand-in for the embedding model"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                bucket = int(hashlib.md5(token.encode("utf-8")).hexdigest()[:8], 16) % self.dim
+                vectors[row, bucket] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def build_corpus(generator: MedicalDataGenerator):
+    """Chunks about each diagnosis, tagged with it in their metadata"""
+    documents = []
+    for diagnosis in generator.diagnoses:
+        medications = ", ".join(generator.medications.get(diagnosis, []))
+        texts = [
+            f"{diagnosis}: discharge medications usually include {medications}. "
+            f"{generator.discharge_instructions.get(diagnosis, '')}",
+            f"{diagnosis}: warning signs are {generator.warning_signs.get(diagnosis, '')}. "
+            f"Follow-up: {generator.follow_ups.get(diagnosis, '')}.",
+            f"{diagnosis}: dietary advice is {generator.dietary_restrictions.get(diagnosis, '')}.",
+        ]
+        texts += [
+            f"After discharge for {diagnosis}, new or worsening {symptom} should be reported "
+            f"if it does not settle with rest."
+            for symptom in SYMPTOMS
+        ]
+        documents += [{"text": text, "metadata": {"diagnosis": diagnosis}} for text in texts]
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--model", help="SentenceTransformer model (default: offline hashing encoder)")
+    args = parser.parse_args()
+    random.seed(0)
+    Faker.seed(0)
+
+    generator = MedicalDataGenerator()
+    documents = build_corpus(generator)
+    questions = [q["query"] for q in generator.generate_symptom_queries(args.queries)]
+    patients = [generator.generate_patient_record() for _ in questions]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            store = VectorStore(args.model, persist_directory=tmp)
+        else:
+            store = VectorStore("hashing", persist_directory=tmp, embedding_model=HashingEncoder())
+        store.add_documents(documents)
+        print(f"{len(documents)} chunks over {len(generator.diagnoses)} diagnoses, "
+              f"{len(questions)} symptom queries, k={args.k}\n")
+
+        modes = {
+            "raw query": lambda question, patient: store.similarity_search_with_score(question, k=args.k),
+            "patient-aware": lambda question, patient: store.similarity_search_multi(
+                build_retrieval_queries(question, patient), k=args.k
+            ),
+        }
+        print(f"{'mode':<16} {'precision@' + str(args.k):>12} {'any relevant':>13} {'p50':>9} {'p99':>9}")
+        for name, search in modes.items():
+            relevant, any_relevant = 0, 0
+            for question, patient in zip(questions, patients):
+                hits = [doc.metadata["diagnosis"] == patient["primary_diagnosis"] for doc, _ in search(question, patient)]
+                relevant += sum(hits)
+                any_relevant += any(hits)
+
+            pairs = iter(zip(questions, patients))
+            # Cached query embeddings make the timing measure retrieval, not encoding
+            stats = summarize(time_calls(lambda: search(*next(pairs)), len(questions)))
+            print(f"{name:<16} {relevant / (len(questions) * args.k):12.3f} {any_relevant / len(questions):13.3f} "
+                  f"{stats['p50_ms']:7.3f}ms {stats['p99_ms']:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
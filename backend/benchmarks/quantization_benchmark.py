@@ -0,0 +1,70 @@
+"""
+Recall vs resident memory of quantized embedding storage
+
+Compares exact float32 search against int8 and binary codes at several
+rescore factors. Point --store at the nephrology vector store built by
+setup_rag to measure the real corpus; without it a synthetic clustered
+corpus is used.
+
+Run from backend/:
+    python -m benchmarks.quantization_benchmark --store data/vector_store/
+    python -m benchmarks.quantization_benchmark --chunks 50000
+"""
+
+import argparse
+import tempfile
+
+import chromadb
+import numpy as np
+
+from agents.rag_setup.quantized_backend import QuantizedBackend
+from agents.rag_setup.retrieval_backends import EmbeddingSnapshot, NumpyBackend
+from benchmarks.retrieval_benchmark import fill_collection, make_queries, recall_at_k, synthetic_corpus
+from benchmarks.timing import summarize, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", help="Existing vector store directory (default: synthetic corpus)")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            collection = chromadb.PersistentClient(path=args.store).get_collection("documents_collection")
+        else:
+            collection = chromadb.PersistentClient(path=f"{tmp}/chroma").get_or_create_collection("documents_collection")
+            fill_collection(collection, synthetic_corpus(args.chunks, args.dim, 200, rng))
+
+        EmbeddingSnapshot.export(collection, f"{tmp}/snapshot")
+        snapshot = EmbeddingSnapshot.load(f"{tmp}/snapshot")
+        n, dim = snapshot.embeddings.shape
+        print(f"{n} chunks x {dim} dims, k={args.k}\n")
+
+        queries = make_queries(snapshot.embeddings, args.queries, rng)
+        exact = NumpyBackend(snapshot)
+        truth = [{hit.id for hit in hits} for hits in exact.search(queries, args.k)]
+        float_bytes = n * dim * 4
+
+        configs = [("float32 exact", exact, float_bytes)]
+        for scheme in ("int8", "binary"):
+            for factor in (1, 4, 10):
+                backend = QuantizedBackend(snapshot, scheme=scheme, rescore_factor=factor)
+                label = f"{scheme} rescore x{factor}" if factor > 1 else f"{scheme} (no rescore)"
+                configs.append((label, backend, backend.memory_bytes))
+
+        print(f"{'storage':<22} {'resident':>10} {'ratio':>6} {'recall@' + str(args.k):>9} {'p50':>9} {'p99':>9}")
+        for label, backend, resident in configs:
+            it = iter(queries)
+            stats = summarize(time_calls(lambda: backend.search(next(it)[None, :], args.k), len(queries)))
+            recall = recall_at_k(backend, queries, truth, args.k)
+            print(f"{label:<22} {resident / 2**20:8.2f}MiB {float_bytes / resident:5.1f}x {recall:9.3f} "
+                  f"{stats['p50_ms']:7.3f}ms {stats['p99_ms']:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
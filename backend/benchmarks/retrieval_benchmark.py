@@ -0,0 +1,111 @@
+"""
+Query latency and recall@k of the retrieval backends against Chroma
+
+Each backend is timed one query per call and with all queries in one call.
+
+Recall is measured against exact search (the NumPy backend). By default a
+synthetic clustered corpus of unit vectors is written to a temporary Chroma
+collection; --store benchmarks an existing vector store instead. Queries
+are perturbed copies of stored embeddings, so no embedding model is needed.
+
+Run from backend/:
+    python -m benchmarks.retrieval_benchmark --chunks 20000 --k 5
+    python -m benchmarks.retrieval_benchmark --store data/vector_store/
+"""
+
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from agents.rag_setup.retrieval_backends import (
+    ChromaBackend,
+    EmbeddingSnapshot,
+    FaissBackend,
+    NumpyBackend,
+)
+from benchmarks.timing import format_row, summarize, time_calls
+
+
+def synthetic_corpus(chunks: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors grouped around topic centroids, like chunk embeddings of a textbook"""
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, chunks)] + 0.6 * rng.standard_normal((chunks, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill_collection(collection, vectors: np.ndarray, batch: int = 5000):
+    for start in range(0, len(vectors), batch):
+        end = min(start + batch, len(vectors))
+        collection.add(
+            ids=[f"chunk-{i}" for i in range(start, end)],
+            embeddings=vectors[start:end],
+            documents=[f"chunk {i}" for i in range(start, end)],
+            metadatas=[{"page": i // 4} for i in range(start, end)]
+        )
+
+
+def make_queries(matrix: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    base = np.asarray(matrix[rng.integers(0, len(matrix), count)], dtype=np.float32)
+    # Noise of about the same norm as the vector: the source chunk is a near, not exact, match
+    queries = base + rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_k(backend, queries: np.ndarray, truth, k: int) -> float:
+    found = 0
+    for query, expected in zip(queries, truth):
+        ids = {hit.id for hit in backend.search(query[None, :], k)[0]}
+        found += len(ids & expected)
+    return found / (len(queries) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", help="Existing vector store directory (default: synthetic corpus)")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            collection = chromadb.PersistentClient(path=args.store).get_collection("documents_collection")
+        else:
+            collection = chromadb.PersistentClient(path=f"{tmp}/chroma").get_or_create_collection("documents_collection")
+            fill_collection(collection, synthetic_corpus(args.chunks, args.dim, 200, rng))
+
+        started = time.perf_counter()
+        EmbeddingSnapshot.export(collection, f"{tmp}/snapshot")
+        snapshot = EmbeddingSnapshot.load(f"{tmp}/snapshot")
+        print(f"{len(snapshot.ids)} chunks x {snapshot.embeddings.shape[1]} dims, "
+              f"snapshot export {time.perf_counter() - started:.1f}s, k={args.k}\n")
+
+        queries = make_queries(snapshot.embeddings, args.queries, rng)
+        exact = NumpyBackend(snapshot)
+        truth = [{hit.id for hit in hits} for hits in exact.search(queries, args.k)]
+
+        backends = [("chroma", lambda: ChromaBackend(collection)), ("numpy (memmap)", lambda: exact)]
+        for index_type in ("flat", "hnsw", "ivf"):
+            backends.append((f"faiss-{index_type}", lambda t=index_type: FaissBackend(snapshot, index_type=t)))
+
+        for name, build in backends:
+            started = time.perf_counter()
+            backend = build()
+            build_seconds = time.perf_counter() - started
+
+            it = iter(queries)
+            samples = time_calls(lambda: backend.search(next(it)[None, :], args.k), len(queries))
+            recall = recall_at_k(backend, queries, truth, args.k)
+            # All queries in one search call, as similarity_search_batch does
+            batch_ms = summarize(time_calls(lambda: backend.search(queries, args.k), 5))["p50_ms"] / len(queries)
+            print(f"{format_row(name, summarize(samples), width=16)}  recall@{args.k}={recall:.3f}  "
+                  f"batched={batch_ms:.3f}ms/query  build={build_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
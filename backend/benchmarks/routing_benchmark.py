@@ -0,0 +1,97 @@
+"""
+Latency and decisions of the compiled routing rules vs the old substring scans
+
+The baseline is the routing the agents used before: lowercase the message
+and test every keyword list with `keyword in message`, once in the
+receptionist and again in the clinical router. The compiled rules answer
+all categories with one regex scan. Messages are generated symptom queries
+plus general receptionist questions; messages whose routing changed are
+listed so the differences can be reviewed.
+
+Run from backend/:
+    python -m benchmarks.routing_benchmark --messages 2000
+"""
+
+import argparse
+import random
+
+from faker import Faker
+
+from agents.routing_rules import routing_rules
+from benchmarks.timing import format_row, summarize, time_calls
+from utils.patient_data_generation import MedicalDataGenerator
+
+LEGACY_KEYWORDS = {
+    "clinical": [
+        "pain", "swelling", "urine", "bp", "blood pressure", "breath",
+        "breathing", "fever", "nausea", "dizzy", "tired", "chest", "leg",
+        "stomach", "headache", "side effect", "symptom", "feeling", "hurt",
+        "worse", "emergency", "severe",
+        "latest", "recent", "new", "current", "trend", "research",
+        "treatment", "medication", "drug", "therapy", "study", "guideline",
+        "medical", "science", "recommendation", "update",
+    ],
+    "rag": [
+        "medication", "drug", "side effect", "treatment", "procedure",
+        "diagnosis", "condition", "disease", "surgery", "therapy",
+        "pain", "swelling", "fever", "nausea", "vomiting", "diarrhea",
+        "breathing", "shortness of breath", "chest pain", "headache",
+        "dizzy", "fatigue", "tired", "symptom", "bleeding", "infection",
+        "rash", "cough", "constipation", "wound", "incision",
+    ],
+    "web_search": [
+        "latest", "recent", "new", "current", "update", "research",
+        "study", "guideline", "recommendation",
+    ],
+}
+
+GENERAL_MESSAGES = [
+    "When is my follow-up appointment?",
+    "Can I renew my prescription online?",
+    "I have an allergy to penicillin, is that on file?",
+    "Who do I call to reschedule?",
+    "Thank you, that was helpful",
+    "What are the visiting hours at the clinic?",
+    "I knew about the diet, thanks",
+    "Is the pharmacy near the college open on Sunday?",
+]
+
+
+def legacy_categories(message: str):
+    message_lower = message.lower()
+    return frozenset(
+        category for category, keywords in LEGACY_KEYWORDS.items()
+        if any(keyword in message_lower for keyword in keywords)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+    random.seed(0)
+    Faker.seed(0)
+
+    generator = MedicalDataGenerator()
+    messages = [q["query"] for q in generator.generate_symptom_queries(args.messages)]
+    messages += [random.choice(GENERAL_MESSAGES) for _ in range(args.messages // 4)]
+    random.shuffle(messages)
+    print(f"{len(messages)} messages, {len(routing_rules.keywords)} compiled keywords\n")
+
+    stream = iter(messages * 3)
+    print(format_row("substring scans (per message)", summarize(time_calls(lambda: legacy_categories(next(stream)), len(messages)))))
+    stream = iter(messages * 3)
+    print(format_row("compiled rules (per message)", summarize(time_calls(lambda: routing_rules.categories(next(stream)), len(messages)))))
+
+    changed = {}
+    for message in messages:
+        before, after = legacy_categories(message), routing_rules.categories(message)
+        if before != after:
+            changed[message] = (sorted(before), sorted(after))
+    print(f"\n{len(changed)} distinct messages routed differently:")
+    for message, (before, after) in sorted(changed.items()):
+        print(f"  {message!r}: {before} -> {after}")
+
+
+if __name__ == "__main__":
+    main()
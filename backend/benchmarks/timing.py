@@ -0,0 +1,32 @@
+"""
+Shared timing helpers for the benchmark scripts
+"""
+
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Call fn repeat times and return each call's latency in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p99/mean of latency samples in milliseconds"""
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+
+
+def format_row(name: str, stats: Dict[str, float], width: int = 34) -> str:
+    return f"{name:<{width}} p50={stats['p50_ms']:8.3f}ms  p99={stats['p99_ms']:8.3f}ms  mean={stats['mean_ms']:8.3f}ms"
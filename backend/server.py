@@ -1,19 +1,64 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import asyncio
+import json
 import logging
 import uuid
 from datetime import datetime
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Import workflow system
 from agents.workflow_graph.main import medical_system
 from agents.tools.patient_data_tool import get_patient_data
+from agents.tools.patient_registry import patient_registry
+from agents.rag_setup.rag_service import rag_service
+from agents.cache.llm_cache import llm_cache
+from agents.cache.semantic_cache import semantic_cache
+from agents.web_search.search_service import web_search_service
+from agents.workflow_graph.prefetch import rag_prefetcher
+from agents.intent_classifier import intent_router
+from utils.concurrency import ConcurrencyLimiter, ServerBusyError
+from utils import config
+
+# Bounds concurrent /chat work; requests beyond the queue limit get 429
+chat_limiter = ConcurrencyLimiter(
+    max_in_flight=config.MAX_INFLIGHT_CHATS,
+    max_queue=config.MAX_QUEUED_CHATS
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load long-lived resources on startup and release them on shutdown"""
+    # Synchronous workflow nodes run in the loop's default executor under ainvoke
+    workflow_executor = ThreadPoolExecutor(
+        max_workers=config.WORKFLOW_WORKER_THREADS,
+        thread_name_prefix="workflow"
+    )
+    asyncio.get_running_loop().set_default_executor(workflow_executor)
+    try:
+        if not rag_service.warmup():
+            logger.warning("RAG service not warmed up: vector store not available")
+    except Exception as e:
+        logger.error(f"RAG warmup error: {e}")
+    if config.INTENT_CLASSIFIER_ENABLED:
+        try:
+            intent_router.warmup()
+        except Exception as e:
+            logger.error(f"Intent classifier training error: {e}")
+    yield
+    rag_service.shutdown()
+    web_search_service.shutdown()
+    workflow_executor.shutdown(wait=False)
 
 app = FastAPI(
     title="Medical Assistant Chatbot API",
     description="API for post-discharge patient care chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for Next.js frontend
@@ -33,6 +78,8 @@ logger = logging.getLogger(__name__)
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    # Set to False to always generate a fresh answer
+    use_cache: bool = True
 
 class ChatResponse(BaseModel):
     response: str
@@ -55,6 +102,7 @@ def read_root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/chat",
+            "chat_stream": "/chat/stream",
             "patient": "/patient/{name}",
             "health": "/health"
         }
@@ -70,11 +118,13 @@ async def chat(request: ChatRequest):
         if not message:
             raise HTTPException(status_code=400, detail="Message is required")
         
-        # Process through workflow
-        result = medical_system.process_message(
-            message=message,
-            session_id=session_id
-        )
+        # Process through workflow without blocking the event loop
+        async with chat_limiter.slot():
+            result = await medical_system.process_message_async(
+                message=message,
+                session_id=session_id,
+                use_cache=request.use_cache
+            )
         
         if not result.get("success"):
             raise HTTPException(status_code=500, detail=result.get("error", "Processing error"))
@@ -86,12 +136,71 @@ async def chat(request: ChatRequest):
             timestamp=datetime.now().isoformat()
         )
         
+    except ServerBusyError as e:
+        logger.warning(f"Chat rejected, server busy: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"API error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+class SlotStreamingResponse(StreamingResponse):
+    """
+    Streaming response that returns a limiter slot however the response ends
+
+    The slot is released when the response finishes, including when the
+    client disconnects or sending fails before the body iterator has started
+    (the generator's own finally would never run then).
+    """
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream a chat response as newline-delimited JSON events
+
+    Emits session, node, token and done (or error) events as the workflow runs.
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    
+    # Take the slot before streaming starts so a busy server can still answer 429
+    try:
+        await chat_limiter.acquire()
+    except ServerBusyError as e:
+        logger.warning(f"Chat stream rejected, server busy: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    async def event_stream():
+        async for event in medical_system.stream_message_async(
+            message=request.message,
+            session_id=request.session_id,
+            use_cache=request.use_cache
+        ):
+            if event["type"] == "done":
+                event["timestamp"] = datetime.now().isoformat()
+            yield json.dumps(event, default=str) + "\n"
+    
+    return SlotStreamingResponse(event_stream(), chat_limiter.release, media_type="application/x-ndjson")
+
 @app.get("/patient/{patient_name}", response_model=PatientResponse)
 async def get_patient(patient_name: str):
     """
@@ -166,14 +275,21 @@ async def get_session(session_id: str):
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
     """
-    Clear/delete a session (note: LangGraph manages sessions internally)
+    Clear/delete a session and all of its stored conversation state
     """
     try:
+        existed = medical_system.clear_session(session_id)
+        
+        if not existed:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
         return {
-            "message": f"Session {session_id} will expire based on LangGraph memory settings",
-            "note": "Sessions are managed by LangGraph MemorySaver"
+            "message": f"Session {session_id} deleted",
+            "session_id": session_id
         }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Session clear error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -191,7 +307,7 @@ async def health_check():
             "services": {
                 "workflow": "active",
                 "database": "connected",
-                "vector_store": "available"
+                "vector_store": "loaded" if rag_service.is_loaded else "not_loaded"
             }
         }
     except Exception as e:
@@ -209,9 +325,17 @@ async def get_stats():
     """
     try:
         return {
-            "total_patients": 29,  # Based on your patient data
+            "total_patients": patient_registry.patient_count,
             "api_version": "1.0.0",
             "workflow_enabled": True,
+            "chat_concurrency": chat_limiter.stats(),
+            "sessions": medical_system.session_stats(),
+            "semantic_cache": semantic_cache.stats(),
+            "llm_cache": llm_cache.stats(),
+            "rag": rag_service.stats(),
+            "web_search": web_search_service.stats(),
+            "rag_prefetch": rag_prefetcher.stats(),
+            "intent_router": intent_router.stats(),
             "uptime": datetime.now().isoformat()
         }
     except Exception as e:
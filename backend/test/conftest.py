@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Run tests from anywhere: imports resolve against backend/ and data paths are relative to it
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+# The Gemini client requires a key at construction time; tests never call it
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+import chromadb
+import numpy as np
+import pytest
+
+from agents.rag_setup.bm25_index import BM25_FILENAME, BM25Index, reciprocal_rank_fusion, tokenize
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.rag_setup.rag_service import RAGService
+from agents.rag_setup.retrieval_backends import SearchHit
+from utils import config
+
+
+TEXTS = [
+    "Loop diuretics such as furosemide reduce fluid overload in chronic kidney disease.",
+    "Diuretics increase urine output and help control blood pressure.",
+    "An eGFR below 30 indicates stage 4 chronic kidney disease.",
+    "Dialysis removes waste products when the kidneys fail.",
+]
+
+
+def hit(chunk_id):
+    return SearchHit(chunk_id, chunk_id, {}, 0.0)
+
+
+def test_tokenize_keeps_clinical_terms():
+    assert tokenize("What is my eGFR? Take Furosemide 40mg") == ["egfr", "take", "furosemide", "40mg"]
+
+
+def test_bm25_ranks_exact_term_first(tmp_path):
+    index = BM25Index.build([f"c{i}" for i in range(4)], TEXTS, [{"page": i} for i in range(4)])
+
+    assert [h.id for h in index.search("Furosemide dose", 3)] == ["c0"]
+    assert index.search("eGFR result", 3)[0].id == "c2"
+    assert index.search("unrelated words", 3) == []
+
+    path = str(tmp_path / BM25_FILENAME)
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("kidney disease", 4) == index.search("kidney disease", 4)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[hit("a"), hit("b"), hit("c")], [hit("c"), hit("d")]], k=3)
+
+    assert [h.id for h in fused] == ["c", "a", "b"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((len(TEXTS) + 1, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection("documents_collection")
+    collection.add(ids=[f"c{i}" for i in range(len(TEXTS))], embeddings=vectors[:-1], documents=TEXTS)
+
+    # The query embedding sits nearest chunk 3, which never mentions the drug
+    query = vectors[3] + 0.01 * vectors[-1]
+    query /= np.linalg.norm(query)
+    encoder = type("Encoder", (), {"encode": lambda self, texts, **kwargs: np.stack([query] * len(texts))})()
+    return str(tmp_path), vectors, encoder
+
+
+def test_hybrid_search_surfaces_keyword_match(store, monkeypatch):
+    directory, vectors, encoder = store
+    # One candidate per retriever, so the drug chunk is found by keyword only
+    monkeypatch.setattr(config, "HYBRID_CANDIDATES", 1)
+    dense_only = VectorStore("fake", persist_directory=directory, embedding_model=encoder, hybrid=False)
+    hybrid = VectorStore("fake", persist_directory=directory, embedding_model=encoder, hybrid=True)
+
+    assert dense_only.similarity_search_with_score("furosemide", k=1)[0][0].page_content == TEXTS[3]
+
+    results = hybrid.similarity_search_with_score("furosemide", k=2)
+    assert [doc.page_content for doc, _ in results] == [TEXTS[3], TEXTS[0]]
+    # Keyword-only hits still report their embedding distance
+    query = encoder.encode(["furosemide"])[0]
+    assert results[1][1] == pytest.approx(2 - 2 * vectors[0] @ query, abs=1e-4)
+    assert os.path.exists(os.path.join(directory, BM25_FILENAME))
+
+
+def test_writes_invalidate_keyword_index(store):
+    directory, _, encoder = store
+    vector_store = VectorStore("fake", persist_directory=directory, embedding_model=encoder, hybrid=True)
+    assert vector_store.lexical_index.search("hemodialysis", 1) == []
+
+    vector_store.add_documents([{"text": "Hemodialysis three times a week", "metadata": {"page": 9}}], ids=["h"])
+
+    assert not os.path.exists(os.path.join(directory, BM25_FILENAME))
+    assert vector_store.lexical_index.search("hemodialysis", 1)[0].id == "h"
+
+
+def test_concurrent_first_queries_build_the_keyword_index_once(store, monkeypatch):
+    directory, _, encoder = store
+    vector_store = VectorStore("fake", persist_directory=directory, embedding_model=encoder, hybrid=True)
+    builds = []
+    from_collection = BM25Index.from_collection
+
+    def slow_build(collection):
+        builds.append(collection)
+        time.sleep(0.1)
+        return from_collection(collection)
+
+    monkeypatch.setattr(BM25Index, "from_collection", staticmethod(slow_build))
+    threads = [threading.Thread(target=lambda: vector_store.lexical_index) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(builds) == 1
+    assert vector_store.lexical_index.search("furosemide", 1)[0].id == "c0"
+
+
+def test_warmup_builds_a_missing_keyword_index(store, monkeypatch):
+    directory, _, encoder = store
+    vector_store = VectorStore("fake", persist_directory=directory, embedding_model=encoder, hybrid=True)
+    service = RAGService()
+    monkeypatch.setattr(service, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(service, "reranker", None)
+
+    assert service.warmup()
+    assert os.path.exists(os.path.join(directory, BM25_FILENAME))
+    assert vector_store._lexical_index is not None
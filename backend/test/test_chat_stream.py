@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from starlette.requests import ClientDisconnect
+
+import server
+from agents.cache.llm_cache import llm_cache
+from agents.workflow_graph import nodes
+
+
+def fake_llm(text: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=text)))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(nodes.receptionist_agent, "llm", fake_llm("Your appointment is next week."))
+    monkeypatch.setattr(nodes.clinical_agent, "llm", fake_llm("Leg swelling can follow kidney disease."))
+    rag_results = [{"content": "Edema in CKD", "metadata": {}, "score": 0.2}]
+    monkeypatch.setattr(nodes.rag_service, "query", lambda query, top_k=3: rag_results)
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: rag_results)
+    monkeypatch.setattr(nodes.rag_service, "pack_context", lambda query, results: None)
+    monkeypatch.setattr(nodes.rag_service, "embed_query", lambda text: None)
+    # Identical prompts from earlier tests would otherwise be answered without streaming
+    llm_cache.clear()
+    return TestClient(server.app)
+
+
+def stream_events(client, message, session_id=None):
+    with client.stream("POST", "/chat/stream", json={"message": message, "session_id": session_id}) as response:
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_stream_identifies_patient(client):
+    events = stream_events(client, "John Smith")
+
+    assert events[0]["type"] == "session"
+    assert [e["node"] for e in events if e["type"] == "node"] == ["receptionist"]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["patient_name"] == "John Smith"
+
+
+def test_stream_general_query_tokens(client):
+    session_id = stream_events(client, "John Smith")[0]["session_id"]
+    events = stream_events(client, "When is my appointment?", session_id)
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert {e["node"] for e in tokens} == {"receptionist"}
+    assert "".join(e["content"] for e in tokens) == "Your appointment is next week."
+    assert events[-1]["message"] == "Your appointment is next week."
+
+
+def test_stream_clinical_query_node_transitions(client):
+    session_id = stream_events(client, "John Smith")[0]["session_id"]
+    events = stream_events(client, "I have swelling in my leg", session_id)
+
+    assert [e["node"] for e in events if e["type"] == "node"] == [
+        "receptionist", "clinical_router", "rag", "clinical_response"
+    ]
+    tokens = [e for e in events if e["type"] == "token"]
+    assert {e["node"] for e in tokens} == {"clinical_response"}
+    assert "".join(e["content"] for e in tokens) == "Leg swelling can follow kidney disease."
+
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["message"].startswith("Leg swelling can follow kidney disease.")
+    assert done["metadata"]["used_rag"] is True
+
+
+def test_stream_rejects_when_saturated(client, monkeypatch):
+    async def busy():
+        raise server.ServerBusyError("full")
+
+    monkeypatch.setattr(server.chat_limiter, "acquire", busy)
+    response = client.post("/chat/stream", json={"message": "John Smith"})
+    assert response.status_code == 429
+
+
+def abandoned_stream(monkeypatch, fail_on):
+    """Run /chat/stream to a client whose connection drops on the given ASGI message type"""
+    monkeypatch.setattr(server, "chat_limiter", server.ConcurrencyLimiter(max_in_flight=1, max_queue=0))
+
+    async def events(**kwargs):
+        yield {"type": "session", "session_id": "s1"}
+        await asyncio.sleep(10)
+        yield {"type": "done"}
+
+    monkeypatch.setattr(server.medical_system, "stream_message_async", events)
+
+    async def send(message):
+        if message["type"] == fail_on:
+            raise OSError("connection reset")
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        response = await server.chat_stream(server.ChatRequest(message="John Smith"))
+        assert server.chat_limiter.stats()["in_flight"] == 1
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(ClientDisconnect):
+            await asyncio.wait_for(response(scope, receive, send), 5)
+
+    asyncio.run(scenario())
+    return server.chat_limiter.stats()
+
+
+@pytest.mark.parametrize("fail_on", ["http.response.start", "http.response.body"])
+def test_abandoned_stream_releases_its_slot(monkeypatch, fail_on):
+    assert abandoned_stream(monkeypatch, fail_on)["in_flight"] == 0
@@ -0,0 +1,241 @@
+import asyncio
+import operator
+import sqlite3
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.constants import ERROR
+from langgraph.graph import END, StateGraph
+
+from agents.workflow_graph import checkpointer as checkpointer_module
+from agents.workflow_graph.checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver
+
+
+class CounterState(TypedDict):
+    count: int
+    log: Annotated[List[str], operator.add]
+
+
+def build_graph(saver):
+    """Two nodes per turn, so every turn writes several checkpoints, pending writes and blobs"""
+    graph = StateGraph(CounterState)
+    graph.add_node("increment", lambda state: {"count": state.get("count", 0) + 1, "log": ["increment"]})
+    graph.add_node("record", lambda state: {"log": [f"count={state['count']}"]})
+    graph.set_entry_point("increment")
+    graph.add_edge("increment", "record")
+    graph.add_edge("record", END)
+    return graph.compile(checkpointer=saver)
+
+
+def run_turns(graph, thread_id, turns):
+    config = {"configurable": {"thread_id": thread_id}}
+    for _ in range(turns):
+        graph.invoke({"log": []}, config)
+    return config
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def thread_keys(saver, thread_id):
+    """Entries MemorySaver keeps for a thread in its (private) storage, writes and blobs"""
+    return (
+        sum(len(checkpoints) for checkpoints in saver.storage.get(thread_id, {}).values()),
+        [key for key in saver.writes if key[0] == thread_id],
+        [key for key in saver.blobs if key[0] == thread_id],
+    )
+
+
+def test_pruning_keeps_the_latest_checkpoints_and_their_state():
+    saver = BoundedMemorySaver(max_checkpoints_per_thread=3)
+    graph = build_graph(saver)
+
+    config = run_turns(graph, "t1", 6)
+
+    history = list(saver.list(config))
+    assert len(history) == 3
+    assert [c.checkpoint["id"] for c in history] == sorted((c.checkpoint["id"] for c in history), reverse=True)
+    # The latest checkpoint still resolves every channel from the retained blobs
+    state = graph.get_state(config)
+    assert state.values["count"] == 6
+    assert state.values["log"][-2:] == ["increment", "count=6"]
+    assert saver.get_tuple(config).checkpoint["id"] == history[0].checkpoint["id"]
+
+    checkpoints, writes, blobs = thread_keys(saver, "t1")
+    retained = {c.checkpoint["id"] for c in history}
+    assert checkpoints == 3
+    assert {key[2] for key in writes} <= retained
+    referenced = {
+        ("t1", "", channel, version)
+        for c in history for channel, version in c.checkpoint["channel_versions"].items()
+    }
+    assert set(blobs) <= referenced
+
+    # The graph keeps working on top of a pruned history
+    run_turns(graph, "t1", 1)
+    assert graph.get_state(config).values["count"] == 7
+
+
+def test_delete_thread_removes_only_that_thread():
+    saver = BoundedMemorySaver()
+    graph = build_graph(saver)
+    run_turns(graph, "t1", 2)
+    other = run_turns(graph, "t2", 2)
+    checkpoints, writes, blobs = thread_keys(saver, "t1")
+    assert checkpoints and writes and blobs
+
+    saver.delete_thread("t1")
+
+    assert thread_keys(saver, "t1") == (0, [], [])
+    assert not saver.has_thread("t1")
+    assert saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+    assert list(saver.list({"configurable": {"thread_id": "t1"}})) == []
+    assert graph.get_state(other).values["count"] == 2
+
+
+def test_least_recently_used_thread_is_evicted(clock):
+    saver = BoundedMemorySaver(max_threads=2)
+    graph = build_graph(saver)
+    first = run_turns(graph, "t1", 1)
+    run_turns(graph, "t2", 1)
+
+    clock[0] += 1
+    # Reading t1 makes t2 the least recently used
+    assert saver.get_tuple(first) is not None
+    run_turns(graph, "t3", 1)
+
+    assert [saver.has_thread(t) for t in ("t1", "t2", "t3")] == [True, False, True]
+    assert thread_keys(saver, "t2") == (0, [], [])
+    assert saver.stats()["evictions"] == 1
+
+
+def test_idle_threads_expire(clock):
+    saver = BoundedMemorySaver(idle_ttl_seconds=60)
+    graph = build_graph(saver)
+    run_turns(graph, "t1", 1)
+    clock[0] += 30
+    run_turns(graph, "t2", 1)
+
+    clock[0] += 40
+    assert saver.evict_expired() == 1
+    assert [saver.has_thread(t) for t in ("t1", "t2")] == [False, True]
+
+    stats = saver.stats()
+    assert (stats["threads"], stats["evictions"]) == (1, 1)
+    assert stats["bytes_retained"] > 0
+
+
+def test_sqlite_sessions_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    config = run_turns(build_graph(SQLiteCheckpointSaver(db_path)), "t1", 2)
+
+    reopened = SQLiteCheckpointSaver(db_path)
+    graph = build_graph(reopened)
+    assert reopened.has_thread("t1")
+    assert graph.get_state(config).values["count"] == 2
+
+    run_turns(graph, "t1", 1)
+    assert graph.get_state(config).values["count"] == 3
+
+
+def test_sqlite_batches_writes_into_the_checkpoint_transaction(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "sessions.db"), max_checkpoints_per_thread=3)
+    graph = build_graph(saver)
+    config = run_turns(graph, "t1", 1)
+    transactions, puts = saver.stats()["transactions"], saver._puts
+
+    run_turns(graph, "t1", 4)
+
+    # One transaction per checkpoint; the task writes ride along with them
+    assert saver._puts - puts >= 4 * 3
+    assert saver.stats()["transactions"] - transactions == saver._puts - puts
+    assert len(list(saver.list(config))) == 3
+    assert graph.get_state(config).values["count"] == 5
+
+
+def test_sqlite_pending_writes_are_visible_before_the_next_put(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "sessions.db"))
+    config = run_turns(build_graph(saver), "t1", 1)
+    latest = saver.get_tuple(config).config
+
+    saver.put_writes(latest, [("log", "pending")], task_id="task-1")
+    saver.put_writes(latest, [(ERROR, "first failure")], task_id="task-2")
+    saver.put_writes(latest, [(ERROR, "second failure")], task_id="task-2")
+
+    # A fresh instance on the same file only sees what was committed by the flush in get_tuple
+    pending = saver.get_tuple(latest).pending_writes
+    assert ("task-1", "log", "pending") in pending
+    assert ("task-2", ERROR, "second failure") in pending
+    assert ("task-2", ERROR, "first failure") not in pending
+    assert SQLiteCheckpointSaver(saver.db_path).get_tuple(latest).pending_writes == pending
+
+
+def test_sqlite_failed_put_keeps_the_buffered_writes(tmp_path, monkeypatch):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "sessions.db"))
+    config = run_turns(build_graph(saver), "t1", 1)
+    latest = saver.get_tuple(config)
+    saver.put_writes(latest.config, [("log", "buffered")], task_id="task-1")
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(saver, "_prune_thread", locked)
+    with pytest.raises(sqlite3.OperationalError):
+        saver.put(latest.config, latest.checkpoint, latest.metadata, {})
+    monkeypatch.undo()
+
+    # Nothing was committed, and the retry still carries the writes
+    assert SQLiteCheckpointSaver(saver.db_path).get_tuple(latest.config).pending_writes == []
+    saver.put(latest.config, latest.checkpoint, latest.metadata, {})
+    assert ("task-1", "log", "buffered") in SQLiteCheckpointSaver(saver.db_path).get_tuple(latest.config).pending_writes
+
+
+def test_sqlite_delete_thread_and_idle_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer_module.time, "time", lambda: now[0])
+    saver = SQLiteCheckpointSaver(str(tmp_path / "sessions.db"), idle_ttl_seconds=60)
+    graph = build_graph(saver)
+    first = run_turns(graph, "t1", 1)
+    run_turns(graph, "t2", 1)
+    now[0] += 30
+    run_turns(graph, "t3", 1)
+
+    saver.put_writes(saver.get_tuple(first).config, [("log", "buffered")], task_id="task-1")
+    saver.delete_thread("t1")
+    assert not saver.has_thread("t1")
+    assert saver.get_tuple(first) is None
+    assert saver._conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 't1'").fetchone() == (0,)
+
+    now[0] += 40
+    assert saver.evict_expired() == 1
+    assert [saver.has_thread(t) for t in ("t2", "t3")] == [False, True]
+    stats = saver.stats()
+    assert (stats["threads"], stats["evictions"]) == (1, 1)
+
+
+def test_sqlite_async_api(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "sessions.db"))
+    graph = build_graph(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    async def scenario():
+        for _ in range(2):
+            await graph.ainvoke({"log": []}, config)
+        latest = await saver.aget_tuple(config)
+        history = [item async for item in saver.alist(config, limit=2)]
+        copy_config = await saver.aput(
+            {"configurable": {"thread_id": "copy", "checkpoint_ns": ""}},
+            latest.checkpoint, latest.metadata, {}
+        )
+        return latest, history, await saver.aget_tuple(copy_config)
+
+    latest, history, copied = asyncio.run(scenario())
+
+    assert graph.get_state(config).values["count"] == 2
+    assert [item.checkpoint["id"] for item in history][0] == latest.checkpoint["id"]
+    assert len(history) == 2
+    assert copied.checkpoint["id"] == latest.checkpoint["id"]
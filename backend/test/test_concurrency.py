@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import server
+from agents.cache.llm_cache import llm_cache
+from agents.workflow_graph import nodes
+from agents.workflow_graph.checkpointer import BoundedMemorySaver
+from agents.workflow_graph.main import MedicalAgentSystem
+from utils.concurrency import ConcurrencyLimiter, ServerBusyError
+
+
+def fake_llm(text: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=text)))
+
+
+def test_limiter_rejects_once_the_queue_is_full():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (limiter.stats()["in_flight"], limiter.stats()["queued"]) == (1, 1)
+
+        with pytest.raises(ServerBusyError):
+            await limiter.acquire()
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["queued"], stats["rejected"]) == (0, 0, 1)
+
+
+def test_limiter_releases_the_slot_on_exceptions():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=0)
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                async with limiter.slot():
+                    raise RuntimeError("node failed")
+        # A leaked slot would make this acquire raise ServerBusyError
+        await limiter.acquire()
+        limiter.release()
+        return limiter.stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
+
+
+def test_chat_returns_429_with_retry_after_when_saturated(monkeypatch):
+    monkeypatch.setattr(server, "chat_limiter", ConcurrencyLimiter(max_in_flight=1, max_queue=0))
+    # Take the only slot, as a long-running request would
+    asyncio.run(server.chat_limiter.acquire())
+
+    response = TestClient(server.app).post("/chat", json={"message": "John Smith"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert server.chat_limiter.stats()["rejected"] == 1
+
+
+def test_chat_releases_the_slot_when_the_workflow_raises(monkeypatch):
+    monkeypatch.setattr(server, "chat_limiter", ConcurrencyLimiter(max_in_flight=1, max_queue=0))
+
+    async def fail(**kwargs):
+        raise RuntimeError("workflow failed")
+
+    monkeypatch.setattr(server.medical_system, "process_message_async", fail)
+    client = TestClient(server.app)
+
+    assert client.post("/chat", json={"message": "John Smith"}).status_code == 500
+    assert client.post("/chat", json={"message": "John Smith"}).status_code == 500
+    assert server.chat_limiter.stats()["in_flight"] == 0
+
+
+def test_process_message_async_runs_the_async_nodes(monkeypatch):
+    def sync_called(*args, **kwargs):
+        raise AssertionError("synchronous LLM path used under ainvoke")
+
+    monkeypatch.setattr(nodes.receptionist_agent, "process", sync_called)
+    monkeypatch.setattr(nodes.clinical_agent, "generate_response", sync_called)
+    monkeypatch.setattr(nodes.receptionist_agent, "llm", fake_llm("Hello John."))
+    monkeypatch.setattr(nodes.clinical_agent, "llm", fake_llm("Rest and keep your leg raised."))
+    monkeypatch.setattr(nodes.rag_service, "query", lambda query, top_k=3: [])
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: [])
+    monkeypatch.setattr(nodes.rag_service, "pack_context", lambda query, results: None)
+    monkeypatch.setattr(nodes.rag_service, "embed_query", lambda text: None)
+    llm_cache.clear()
+    system = MedicalAgentSystem(BoundedMemorySaver())
+
+    async def conversation():
+        first = await system.process_message_async("John Smith")
+        return await system.process_message_async("I have swelling in my leg", first["session_id"])
+
+    result = asyncio.run(conversation())
+
+    assert result["success"] is True
+    assert result["agent"] == "clinical"
+    assert result["message"].startswith("Rest and keep your leg raised.")
@@ -0,0 +1,75 @@
+import numpy as np
+
+from agents.rag_setup.context_packer import ContextPacker, estimate_tokens, format_sources, split_sentences
+
+
+VOCABULARY = ["furosemide", "swelling", "dialysis", "diet", "potassium"]
+
+
+class KeywordEncoder:
+    """Embeds texts by which vocabulary words they mention"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        vectors = np.array([[word in text.lower() for word in VOCABULARY] + [0.1] for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def unit(*words):
+    vector = np.array([word in words for word in VOCABULARY] + [0.0], dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+FILLER = "Chronic kidney disease is staged by filtration rate and albuminuria."
+CHUNKS = [
+    " ".join([FILLER] * 6 + ["Furosemide reduces leg swelling.", "Take it in the morning."] + [FILLER] * 6),
+    " ".join(["Dialysis is started when symptoms appear."] + [FILLER] * 8),
+    " ".join(["A low potassium diet limits bananas.", FILLER, "Potassium binders help with swelling."] + [FILLER] * 6),
+]
+
+
+def test_split_sentences_normalizes_and_cuts_long_sentences():
+    assert split_sentences("First  line\nwraps here. Second!\n\nThird") == ["First line wraps here.", "Second!", "Third"]
+    pieces = split_sentences("word " * 300, max_chars=100)
+    assert all(len(piece) <= 100 for piece in pieces)
+    assert " ".join(pieces) == ("word " * 300).strip()
+
+
+def test_pack_keeps_relevant_windows_within_budget():
+    packer = ContextPacker(token_budget=60, window_sentences=2)
+    encoder = KeywordEncoder()
+
+    packed = packer.pack(unit("furosemide", "swelling"), CHUNKS, encoder)
+
+    assert packed.tokens <= 60
+    assert packed.original_tokens == estimate_tokens(format_sources(CHUNKS))
+    assert packed.tokens_saved == packed.original_tokens - packed.tokens > 0
+    assert packed.text.startswith("Source 1:\nFurosemide reduces leg swelling. Take it in the morning.")
+    assert "Potassium binders help with swelling." in packed.text
+    assert "Dialysis" not in packed.text
+    assert packer.stats()["tokens_saved"] == packed.tokens_saved
+
+
+def test_pack_reuses_cached_window_embeddings():
+    packer = ContextPacker(token_budget=60)
+    encoder = KeywordEncoder()
+
+    first = packer.pack(unit("dialysis"), CHUNKS, encoder)
+    encoded = len(encoder.encoded)
+    second = packer.pack(unit("dialysis"), CHUNKS, encoder)
+
+    assert len(encoder.encoded) == encoded
+    assert first == second
+    assert first.text.startswith("Source 1:\nDialysis is started")
+
+
+def test_pack_truncates_when_best_window_exceeds_budget():
+    packer = ContextPacker(token_budget=10, window_sentences=20)
+
+    packed = packer.pack(unit("furosemide"), CHUNKS[:1], KeywordEncoder())
+
+    assert packed.windows_used == 1
+    assert packed.tokens <= 10
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import pytest
+
+from agents.rag_setup.embedding_batcher import EmbeddingBatcher
+
+
+class SlowEncoder:
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+
+    def __call__(self, texts):
+        self.gate.wait(5)
+        self.batches.append(list(texts))
+        return np.stack([np.full(3, len(text), dtype=np.float32) for text in texts])
+
+
+def test_concurrent_requests_share_one_batch():
+    encoder = SlowEncoder()
+    encoder.gate.set()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=16, max_wait_ms=200)
+
+    futures = [batcher.submit(f"query {i}") for i in range(8)] + [batcher.submit("query 0")]
+    results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+
+    assert len(encoder.batches) == 1
+    assert len(encoder.batches[0]) == 8  # duplicate text encoded once
+    assert results[0][0] == len("query 0")
+    assert np.array_equal(results[0], results[-1])
+    assert batcher.stats()["batch_size_histogram"] == {9: 1}
+
+
+def test_batches_are_capped_and_queue_while_encoding():
+    encoder = SlowEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=4, max_wait_ms=1)
+
+    futures = [batcher.submit(f"q{i}") for i in range(10)]
+    encoder.gate.set()
+    matrix = np.stack([future.result(timeout=5) for future in futures])
+    batcher.close()
+
+    assert matrix.shape == (10, 3)
+    assert all(len(batch) <= 4 for batch in encoder.batches)
+    assert batcher.stats()["items"] == 10
+
+
+def test_encoder_errors_reach_every_caller():
+    def failing(texts):
+        raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=50)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_submit_after_close_encodes_directly():
+    encoder = SlowEncoder()
+    encoder.gate.set()
+    batcher = EmbeddingBatcher(encoder, max_wait_ms=1)
+    assert batcher.submit("ab").result(timeout=5)[0] == 2
+    batcher.close()
+
+    assert batcher.submit("abc").result(timeout=5)[0] == 3
+    assert batcher.encode(["a", "abcd"])[:, 0].tolist() == [1, 4]
+    assert encoder.batches[1:] == [["abc"], ["a"], ["abcd"]]
+    assert batcher.stats()["queued"] == 0
@@ -0,0 +1,84 @@
+import numpy as np
+
+from agents.cache.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.stack([np.full(4, len(text), dtype=np.float32) for text in texts])
+
+
+def test_get_or_compute_encodes_misses_once():
+    cache = EmbeddingCache(max_entries=10)
+    encode = CountingEncoder()
+
+    first = cache.get_or_compute(["Leg swelling", "  leg   SWELLING ", "fever"], encode)
+    second = cache.get_or_compute(["fever", "Leg swelling"], encode)
+
+    assert encode.batches == [["leg swelling", "fever"]]
+    assert np.array_equal(first[0], first[1])
+    assert np.array_equal(second[1], first[0])
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_reuses_slots():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", np.ones(3))
+    cache.put("b", np.ones(3) * 2)
+    cache.get("a")
+    cache.put("c", np.ones(3) * 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1
+    assert cache.get("c")[0] == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memmap_store_survives_restart(tmp_path):
+    path = str(tmp_path / "query_embeddings.f32")
+    cache = EmbeddingCache(max_entries=4, persist_path=path, model_name="m")
+    cache.put("chest pain", np.arange(3, dtype=np.float32))
+    cache.close()
+
+    restored = EmbeddingCache(max_entries=4, persist_path=path, model_name="m")
+    assert np.array_equal(restored.get("Chest pain"), np.arange(3, dtype=np.float32))
+
+    other_model = EmbeddingCache(max_entries=4, persist_path=path, model_name="other")
+    assert other_model.get("chest pain") is None
+
+
+def test_reload_drops_index_entries_whose_slot_was_reused(tmp_path):
+    path = str(tmp_path / "query_embeddings.f32")
+    cache = EmbeddingCache(max_entries=2, persist_path=path, model_name="m", flush_every=1000)
+    cache.put("a", np.ones(3))
+    cache.put("b", np.ones(3) * 2)
+    cache.flush()
+    # Evicts "a" and reuses its slot, then "crashes" before the index is flushed again
+    cache.put("c", np.ones(3) * 3)
+    cache._lock_file.close()
+
+    restored = EmbeddingCache(max_entries=2, persist_path=path, model_name="m")
+    assert restored.get("a") is None
+    assert restored.get("b")[0] == 2
+    assert restored.stats()["entries"] == 1
+    restored.put("d", np.ones(3) * 4)
+    assert restored.get("b")[0] == 2 and restored.get("d")[0] == 4
+
+
+def test_processes_sharing_a_path_use_separate_files(tmp_path):
+    path = str(tmp_path / "query_embeddings.f32")
+    first = EmbeddingCache(max_entries=2, persist_path=path, model_name="m")
+    second = EmbeddingCache(max_entries=2, persist_path=path, model_name="m")
+    assert (first.stats()["path"], second.stats()["path"]) == (path, path + ".1")
+
+    first.put("a", np.ones(3))
+    second.put("a", np.ones(3) * 2)
+    first.close()
+    second.close()
+
+    assert EmbeddingCache(max_entries=2, persist_path=path, model_name="m").get("a")[0] == 1
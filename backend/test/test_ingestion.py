@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.rag_setup.ingestion import ingest_files, list_corpus_files, sync_corpus
+
+
+class FakeEncoder:
+    """Deterministic stand-in for SentenceTransformer that records batch calls"""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True, show_progress_bar=None):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size, normalize_embeddings)[0]
+        self.calls.append(len(texts))
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(self.dim) for text in texts
+        ])
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def write_corpus(directory, count):
+    for i in range(count):
+        (directory / f"doc{i}.txt").write_text(f"Document {i}.\n\n" + "Kidney function and fluid balance. " * 40)
+    (directory / "notes.md").write_text("unsupported format")
+
+
+def test_ingest_files_embeds_in_batches(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    write_corpus(corpus, 3)
+    encoder = FakeEncoder()
+    store = VectorStore("fake", persist_directory=str(tmp_path / "store"), embedding_model=encoder)
+
+    files = list_corpus_files(str(corpus))
+    stats = ingest_files(store, files, workers=2, chunk_size=300, chunk_overlap=0)
+
+    assert len(files) == 3
+    assert stats.files == 3 and stats.documents == 3
+    assert stats.chunks == store.collection.count() > 3
+    # One encode call per file, not one per chunk
+    assert len(encoder.calls) == 3
+    assert stats.chunks_per_second > 0
+
+    stored = store.collection.get(limit=1, include=["embeddings"])["embeddings"][0]
+    assert np.isclose(np.linalg.norm(stored), 1.0, atol=1e-5)
+
+
+def test_sync_corpus_only_reindexes_changes(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    write_corpus(corpus, 3)
+    encoder = FakeEncoder()
+    store = VectorStore("fake", persist_directory=str(tmp_path / "store"), embedding_model=encoder)
+
+    def sync():
+        return sync_corpus(store, str(corpus), "fake", workers=1, chunk_size=300, chunk_overlap=0)
+
+    first = sync()
+    total = store.collection.count()
+    assert first.chunks_embedded == total
+    assert os.path.exists(store.lexical_index_path)
+
+    # Nothing changed: no loading, no embedding, no duplicates
+    os.remove(store.lexical_index_path)
+    second = sync()
+    assert second.files == 0 and second.files_unchanged == 3
+    assert store.collection.count() == total
+    # A missing keyword index is rebuilt here rather than on the first query
+    assert os.path.exists(store.lexical_index_path)
+
+    # Touched but identical file is not re-indexed
+    os.utime(corpus / "doc0.txt", ns=(0, 0))
+    assert sync().files == 0
+
+    # Edit one paragraph of one file, delete another
+    doc1 = corpus / "doc1.txt"
+    doc1.write_text(doc1.read_text().replace("Document 1.", "Document 1 (revised)."))
+    (corpus / "doc2.txt").unlink()
+    third = sync()
+
+    assert third.files == 1 and third.files_removed == 1
+    assert 0 < third.chunks_embedded < first.chunks_embedded / 3
+    assert store.get_ids({"source": str(corpus / "doc2.txt")}) == []
+    assert store.collection.count() == len(store.get_ids({"source": str(corpus / "doc0.txt")})) * 2
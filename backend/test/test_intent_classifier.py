@@ -0,0 +1,141 @@
+import asyncio
+import random
+import re
+import threading
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agents.clinical_agent import ClinicalAgent
+from agents.intent_classifier import INTENTS, IntentRouter, expected_calibration_error, softmax
+from agents.receptionist_agent import ReceptionistAgent
+from agents.routing_rules import routing_rules
+from agents.workflow_graph import nodes
+from utils import config
+from utils.patient_data_generation import MedicalDataGenerator
+
+
+def encode(texts, dim: int = 256):
+    """Hashed bag of words, unit length: a deterministic offline stand-in for MiniLM"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % dim] += 1.0
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def embed(text):
+    return encode([text])[0]
+
+
+@pytest.fixture(scope="module")
+def router():
+    router = IntentRouter(routing_rules, enabled=True, threshold=0.7, examples_per_intent=60)
+    router.train(encode, embed)
+    return router
+
+
+@pytest.fixture(scope="module")
+def unseen():
+    state = random.getstate()
+    random.seed(1)
+    examples = MedicalDataGenerator().generate_intent_examples(30)
+    random.setstate(state)
+    return [e["query"] for e in examples], np.array([INTENTS.index(e["intent"]) for e in examples])
+
+
+def test_generated_examples_are_balanced():
+    examples = MedicalDataGenerator().generate_intent_examples(12)
+    assert [sum(e["intent"] == intent for e in examples) for intent in INTENTS] == [12, 12, 12]
+
+
+def test_classifier_predicts_unseen_examples(router, unseen):
+    messages, labels = unseen
+    probabilities = router.classifier.predict_proba(encode(messages))
+
+    assert (probabilities.argmax(axis=1) == labels).mean() >= 0.9
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+
+    prediction = router.classify("What is the latest research on heart failure?")
+    assert prediction.intent == "web_search"
+    assert 0.0 <= prediction.confidence <= 1.0
+    assert prediction.confidence == max(prediction.probabilities.values())
+
+
+def test_temperature_scaling_calibrates_confidence(router, unseen):
+    messages, labels = unseen
+    embeddings = encode(messages)
+    raw = softmax(router.classifier.scores(embeddings))
+
+    assert router.classifier.temperature < 1.0
+    assert expected_calibration_error(router.classifier.predict_proba(embeddings), labels) < expected_calibration_error(raw, labels)
+    assert set(router.stats()["calibration"]) == {"temperature", "heldout_accuracy", "heldout_ece"}
+
+
+def test_low_confidence_falls_back_to_keywords(router):
+    message = "I missed a dose of insulin, what should I do?"
+
+    decision = router.route(message)
+    assert (decision.source, decision.intent, decision.needs_routing, decision.needs_rag) == ("classifier", "rag", True, True)
+
+    unsure = IntentRouter(routing_rules, enabled=True, threshold=1.01)
+    unsure.classifier, unsure._embed = router.classifier, embed
+    decision = unsure.route(message)
+    # No keyword matches, so the keyword rules answer it as a general question
+    assert (decision.source, decision.needs_routing, decision.needs_rag) == ("keywords", False, False)
+    assert decision.confidence == router.classify(message).confidence
+    assert unsure.stats()["decisions"] == {"keywords": 1}
+
+
+def test_untrained_or_disabled_router_uses_keywords(router):
+    assert IntentRouter(routing_rules, enabled=True).classify("My legs are swollen") is None
+
+    disabled = IntentRouter(routing_rules, enabled=False)
+    disabled.classifier, disabled._embed = router.classifier, embed
+    assert disabled.classify("My legs are swollen") is None
+    assert disabled.route("My legs are swollen").source == "keywords"
+    assert disabled.warmup() is False
+
+
+def test_agents_route_with_the_classifier(router, monkeypatch):
+    receptionist, clinical = ReceptionistAgent(), ClinicalAgent()
+    monkeypatch.setattr(receptionist, "intent_router", router)
+    monkeypatch.setattr(clinical, "intent_router", router)
+
+    assert receptionist._check_medical_routing("Is it safe to drink alcohol with metformin?") is True
+    assert receptionist._check_medical_routing("What time does the clinic open on Monday?") is False
+    assert clinical.assess_query_needs("Is it safe to drink alcohol with metformin?") == {
+        "needs_rag": True, "needs_web_search": False
+    }
+    # Keywords still add RAG to a web search in fan-out mode
+    assert clinical.assess_query_needs("What is the latest treatment for kidney disease?", allow_both=True) == {
+        "needs_rag": True, "needs_web_search": True
+    }
+
+
+def test_async_receptionist_classifies_off_the_event_loop(router, monkeypatch):
+    threads = []
+
+    def recording_embed(text):
+        threads.append(threading.current_thread())
+        return embed(text)
+
+    routed = IntentRouter(routing_rules, enabled=True, threshold=router.threshold)
+    routed.classifier, routed._embed = router.classifier, recording_embed
+    monkeypatch.setattr(nodes.receptionist_agent, "intent_router", routed)
+    monkeypatch.setattr(config, "RAG_PREFETCH_ENABLED", False)
+
+    async def turn():
+        state = {
+            "messages": [HumanMessage(content="Is it safe to drink alcohol with metformin?")],
+            "patient_name": "John Smith",
+            "patient_data": {"patient_name": "John Smith"},
+            "session_id": "s1",
+        }
+        return await nodes.areceptionist_node(state), threading.current_thread()
+
+    updates, loop_thread = asyncio.run(turn())
+    assert updates["needs_routing"] is True
+    assert threads and loop_thread not in threads
@@ -0,0 +1,200 @@
+import asyncio
+import importlib
+import threading
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agents.cache.llm_cache import LLMCache, fingerprint
+
+
+class CountingModel(GenericFakeChatModel):
+    calls: int = 0
+    release: threading.Event = None
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return super()._generate(*args, **kwargs)
+
+
+def counting_model(text="Hello!", **kwargs):
+    return CountingModel(messages=iter([AIMessage(content=text)] * 10), **kwargs)
+
+
+PROMPT = [SystemMessage(content="You are a receptionist."), HumanMessage(content="Hi")]
+
+
+def test_fingerprint_covers_messages_and_params():
+    llm = counting_model()
+    assert fingerprint(llm, PROMPT) == fingerprint(llm, list(PROMPT))
+    assert fingerprint(llm, PROMPT) != fingerprint(llm, PROMPT[:1] + [HumanMessage(content="Hi!")])
+    assert fingerprint(llm, PROMPT) != fingerprint(llm, [HumanMessage(content="Hi"), PROMPT[0]])
+
+    gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
+    assert fingerprint(gemini, PROMPT) != fingerprint(ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7), PROMPT)
+    assert fingerprint(gemini, PROMPT) != fingerprint(ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.3), PROMPT)
+
+
+def test_identical_prompt_is_served_from_cache():
+    cache = LLMCache()
+    llm = counting_model()
+
+    assert cache.invoke(llm, PROMPT).content == "Hello!"
+    assert cache.invoke(llm, PROMPT).content == "Hello!"
+    assert cache.invoke(llm, PROMPT, use_cache=False).content == "Hello!"
+
+    assert llm.calls == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_bound_and_disk_persistence(tmp_path):
+    db_path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(max_entries=1, disk_path=db_path)
+    llm = counting_model()
+    other = [HumanMessage(content="Other")]
+
+    cache.invoke(llm, PROMPT)
+    cache.invoke(llm, other)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+
+    restarted = LLMCache(max_entries=1, disk_path=db_path)
+    assert restarted.invoke(llm, PROMPT).content == "Hello!"
+    assert restarted.stats()["disk_hits"] == 1
+    assert llm.calls == 2
+
+
+def test_concurrent_identical_calls_share_one_request():
+    cache = LLMCache()
+    llm = counting_model(release=threading.Event())
+
+    async def run():
+        tasks = [asyncio.create_task(cache.ainvoke(llm, PROMPT)) for _ in range(5)]
+        while cache.stats()["deduplicated"] < 4:
+            await asyncio.sleep(0.01)
+        llm.release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+
+    assert [r.content for r in results] == ["Hello!"] * 5
+    assert llm.calls == 1
+
+
+def test_disk_reads_do_not_hold_the_cache_lock(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    llm = counting_model()
+    cache.invoke(llm, PROMPT)
+
+    reading, release = threading.Event(), threading.Event()
+    disk_get = cache._disk.get
+
+    def slow_get(key):
+        reading.set()
+        release.wait(5)
+        return disk_get(key)
+
+    cache._disk.get = slow_get
+    slow = threading.Thread(target=cache.invoke, args=(llm, [HumanMessage(content="Other")]))
+    slow.start()
+    assert reading.wait(5)
+
+    # A memory hit and the stats go ahead while another call waits on the disk
+    done = threading.Event()
+    threading.Thread(target=lambda: (cache.invoke(llm, PROMPT), cache.stats(), done.set())).start()
+    assert done.wait(1)
+
+    release.set()
+    slow.join(5)
+    assert cache.stats()["misses"] == 2
+
+
+def test_ainvoke_keeps_disk_io_off_the_event_loop(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    llm = counting_model()
+    disk_threads = []
+    for name in ("get", "put"):
+        method = getattr(cache._disk, name)
+        setattr(cache._disk, name, lambda *args, _method=method: (disk_threads.append(threading.current_thread()), _method(*args))[1])
+
+    async def run():
+        await cache.ainvoke(llm, PROMPT)
+        cache._entries.clear()
+        return await cache.ainvoke(llm, PROMPT)
+
+    assert asyncio.run(run()).content == "Hello!"
+    assert llm.calls == 1
+    assert cache.stats()["disk_hits"] == 1
+    assert disk_threads and threading.main_thread() not in disk_threads
+
+
+def test_cancelled_leader_hands_the_call_to_a_waiter(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    llm = counting_model()
+    reading, release = threading.Event(), threading.Event()
+    disk_get = cache._disk.get
+
+    def slow_get(key):
+        reading.set()
+        release.wait(5)
+        return disk_get(key)
+
+    cache._disk.get = slow_get
+
+    async def run():
+        leader = asyncio.create_task(cache.ainvoke(llm, PROMPT))
+        while not reading.is_set():
+            await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.ainvoke(llm, PROMPT))
+        while cache.stats()["deduplicated"] < 1:
+            await asyncio.sleep(0.01)
+        leader.cancel()
+        release.set()
+        answer = await asyncio.wait_for(waiter, 5)
+        assert leader.cancelled()
+        return answer, await asyncio.wait_for(cache.ainvoke(llm, PROMPT), 5)
+
+    answer, later = asyncio.run(run())
+    assert answer.content == later.content == "Hello!"
+    assert llm.calls == 1
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_unexpected_disk_errors_do_not_strand_waiters(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    llm = counting_model()
+
+    def broken_get(key):
+        raise OSError("disk unplugged")
+
+    cache._disk.get = broken_get
+    try:
+        cache.invoke(llm, PROMPT)
+    except OSError:
+        pass
+    assert cache.stats()["in_flight"] == 0
+
+    cache._disk.get = lambda key: None
+    assert cache.invoke(llm, PROMPT).content == "Hello!"
+
+
+def test_waiters_give_up_on_a_stuck_call(monkeypatch):
+    # Both models send the same prompt; only the stuck one holds the in-flight call
+    # The package re-exports the llm_cache singleton under the module's name
+    monkeypatch.setattr(importlib.import_module("agents.cache.llm_cache"), "fingerprint", lambda llm, messages: "prompt")
+    cache = LLMCache(wait_seconds=0.05)
+    llm = counting_model(release=threading.Event())
+    stuck = threading.Thread(target=cache.invoke, args=(llm, PROMPT))
+    stuck.start()
+    while llm.calls < 1:
+        pass
+
+    fast = counting_model("Direct")
+    assert cache.invoke(fast, PROMPT).content == "Direct"
+    assert asyncio.run(cache.ainvoke(fast, PROMPT)).content == "Direct"
+    assert cache.stats()["deduplicated"] == 2
+    llm.release.set()
+    stuck.join(5)
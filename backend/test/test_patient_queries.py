@@ -0,0 +1,60 @@
+import chromadb
+import numpy as np
+
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.rag_setup.patient_queries import build_retrieval_queries, medication_names
+
+
+PATIENT = {
+    "patient_name": "John Smith",
+    "primary_diagnosis": "Chronic Kidney Disease Stage 3",
+    "medications": ["Lisinopril 10mg daily", "Furosemide 20mg twice daily", "Ibuprofen PRN"],
+}
+
+
+def test_medication_names_drop_dose_and_schedule():
+    assert medication_names(PATIENT["medications"]) == ["Lisinopril", "Furosemide", "Ibuprofen"]
+    assert medication_names(["Oral rehydration solution"]) == ["Oral rehydration solution"]
+
+
+def test_build_retrieval_queries():
+    assert build_retrieval_queries("my legs feel heavy", None) == ["my legs feel heavy"]
+    assert build_retrieval_queries("my legs feel heavy", PATIENT, max_medications=2) == [
+        "my legs feel heavy Chronic Kidney Disease Stage 3",
+        "my legs feel heavy Lisinopril Furosemide",
+        "my legs feel heavy",
+    ]
+
+
+class DictEncoder:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts, **kwargs):
+        return np.stack([self.vectors[text] for text in texts])
+
+
+def test_similarity_search_multi_fuses_filters_and_dedupes(tmp_path):
+    basis = np.eye(8, dtype=np.float32)
+    collection = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection("documents_collection")
+    collection.add(
+        ids=["generic", "ckd", "ckd-copy", "ckd-other-book"],
+        embeddings=np.stack([basis[0], basis[1], basis[1] * 0.9 + basis[2] * 0.436, basis[3]]),
+        documents=["Heavy legs are common.", "Edema in CKD.", "Edema  in CKD.", "Edema in kidney disease."],
+        metadatas=[{"source": "a"}, {"source": "a"}, {"source": "a"}, {"source": "b"}]
+    )
+    encoder = DictEncoder({
+        "heavy legs": basis[0] * 0.95 + basis[1] * 0.312,
+        "heavy legs ckd": basis[1] * 0.8 + basis[3] * 0.6,
+    })
+    store = VectorStore("fake", persist_directory=str(tmp_path), embedding_model=encoder, hybrid=False)
+
+    results = store.similarity_search_multi(["heavy legs", "heavy legs ckd"], k=3)
+    # Ranked high by both phrasings, so first; the whitespace-only copy is dropped
+    assert [doc.page_content for doc, _ in results] == [
+        "Edema in CKD.", "Heavy legs are common.", "Edema in kidney disease."
+    ]
+
+    filtered = store.similarity_search_multi(["heavy legs", "heavy legs ckd"], k=3, where={"source": "b"})
+    assert [doc.page_content for doc, _ in filtered] == ["Edema in kidney disease."]
+    assert store.similarity_search_multi([], k=3) == []
@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+
+from agents.tools import patient_registry as registry_module
+from agents.tools.patient_registry import PatientRegistry
+
+
+def record(name, **fields):
+    return {"patient_name": name, "primary_diagnosis": "Heart Failure", "medications": ["Furosemide"], **fields}
+
+
+def write(path, patients):
+    path.write_text(json.dumps(patients))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(registry_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lookup_ignores_case_and_whitespace(tmp_path):
+    path = tmp_path / "patients.json"
+    write(path, [record("Noah Bennett"), record("Ava Li")])
+    registry = PatientRegistry(str(path))
+
+    assert [p["patient_name"] for p in registry.find("  noah   BENNETT ")] == ["Noah Bennett"]
+    assert registry.find("Noah") == []
+    assert registry.patient_count == 2
+
+
+def test_duplicate_names_return_every_record(tmp_path):
+    path = tmp_path / "patients.json"
+    write(path, [record("Ava Li", discharge_date="2024-01-01"), record("ava  li", discharge_date="2024-02-01")])
+    registry = PatientRegistry(str(path))
+
+    assert [p["discharge_date"] for p in registry.find("Ava Li")] == ["2024-01-01", "2024-02-01"]
+    assert registry.duplicate_names == ["ava li"]
+
+
+def test_returned_records_are_copies(tmp_path):
+    path = tmp_path / "patients.json"
+    write(path, [record("Noah Bennett")])
+    registry = PatientRegistry(str(path))
+
+    found = registry.find("Noah Bennett")[0]
+    found["primary_diagnosis"] = "changed"
+    found["medications"].append("changed")
+
+    assert registry.find("Noah Bennett")[0] == record("Noah Bennett")
+
+
+def test_reloads_when_the_file_changes_at_most_once_per_interval(tmp_path, clock):
+    path = tmp_path / "patients.json"
+    write(path, [record("Noah Bennett")])
+    registry = PatientRegistry(str(path), check_interval=1.0)
+    assert registry.patient_count == 1
+
+    write(path, [record("Noah Bennett"), record("Ava Li")])
+    clock[0] += 0.5
+    # Within the interval the file is not even stat'ed
+    assert registry.find("Ava Li") == []
+
+    clock[0] += 0.6
+    assert len(registry.find("Ava Li")) == 1
+    assert registry.patient_count == 2
+
+
+def test_reload_detects_same_size_rewrite_by_mtime(tmp_path, clock):
+    path = tmp_path / "patients.json"
+    write(path, [record("Noah Bennett")])
+    registry = PatientRegistry(str(path))
+    assert registry.find("Noah Bennett")
+
+    write(path, [record("Noah Bennetx")])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    clock[0] += 2
+
+    assert registry.find("Noah Bennett") == []
+    assert registry.find("Noah Bennetx")
+
+
+def test_half_written_file_keeps_serving_the_previous_records(tmp_path, clock):
+    path = tmp_path / "patients.json"
+    write(path, [record("Noah Bennett")])
+    registry = PatientRegistry(str(path))
+    assert registry.find("Noah Bennett")
+
+    path.write_text('[{"patient_name": "Noah Ben')
+    clock[0] += 2
+    assert [p["patient_name"] for p in registry.find("Noah Bennett")] == ["Noah Bennett"]
+
+    # The broken version is not re-parsed on every check
+    loads = []
+    registry._load = lambda *version: loads.append(version)
+    clock[0] += 2
+    assert registry.find("Noah Bennett") and loads == []
+    del registry._load
+
+    write(path, [record("Noah Bennett"), record("Ava Li")])
+    clock[0] += 2
+    assert registry.find("Ava Li") and registry.patient_count == 2
+
+
+def test_unreadable_file_on_first_load_raises(tmp_path):
+    path = tmp_path / "patients.json"
+    path.write_text("not json")
+
+    with pytest.raises(ValueError):
+        PatientRegistry(str(path)).find("Noah Bennett")
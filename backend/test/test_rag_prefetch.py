@@ -0,0 +1,103 @@
+import itertools
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents.cache.llm_cache import llm_cache
+from agents.workflow_graph import nodes
+from agents.workflow_graph.checkpointer import BoundedMemorySaver
+from agents.workflow_graph.main import MedicalAgentSystem
+from agents.workflow_graph.prefetch import SpeculativePrefetcher
+from utils import config
+
+
+def fake_llm(text: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=text)))
+
+
+def test_prefetch_is_taken_only_for_the_same_message():
+    prefetcher = SpeculativePrefetcher()
+    release = threading.Event()
+
+    prefetcher.start("s1", "my leg hurts", lambda: release.wait(5) and "context")
+    assert prefetcher.take("s1", "something else") is None
+    assert prefetcher.take("s1", "my leg hurts") is None
+
+    prefetch = prefetcher.start("s1", "my leg hurts", lambda: "context")
+    assert prefetcher.take("s1", "my leg hurts") is prefetch
+    assert prefetch.future.result(1) == "context"
+    release.set()
+
+    stats = prefetcher.stats()
+    assert (stats["started"], stats["consumed"], stats["discarded"], stats["pending"]) == (2, 1, 1, 0)
+
+
+def test_saved_time_is_the_overlap_with_the_earlier_steps():
+    prefetcher = SpeculativePrefetcher()
+    prefetch = prefetcher.start("s1", "q", time.sleep, 0.1)
+    prefetch.future.result(1)
+
+    # Needed long after it finished: the whole retrieval was saved
+    assert 90 <= prefetch.saved_ms(time.perf_counter() + 5) < 200
+    # Needed while it was running: only the part done so far
+    assert prefetch.saved_ms(prefetch.started + 0.05) == pytest.approx(50, abs=1)
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setattr(config, "RAG_PREFETCH_ENABLED", True)
+    monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(nodes, "rag_prefetcher", SpeculativePrefetcher())
+    monkeypatch.setattr(nodes.receptionist_agent, "llm", fake_llm("Your appointment is next week."))
+    monkeypatch.setattr(nodes.clinical_agent, "llm", fake_llm("Elevate your leg."))
+    monkeypatch.setattr(nodes.rag_service, "pack_context", lambda query, results: None)
+    monkeypatch.setattr(nodes.rag_service, "embed_query", lambda text: None)
+    llm_cache.clear()
+
+    calls = []
+
+    def slow_query(query, patient_data=None, top_k=3):
+        calls.append(query)
+        time.sleep(0.2)
+        return [{"content": "Edema in CKD", "metadata": {}, "score": 0.2}]
+
+    monkeypatch.setattr(nodes.rag_service, "query", slow_query)
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", slow_query)
+
+    # The receptionist step takes as long as retrieval, so a prefetch can hide it entirely
+    process = nodes.receptionist_agent.process
+    monkeypatch.setattr(
+        nodes.receptionist_agent, "process",
+        lambda *args, **kwargs: time.sleep(0.2) or process(*args, **kwargs)
+    )
+
+    system = MedicalAgentSystem(BoundedMemorySaver())
+    session_id = system.process_message("John Smith")["session_id"]
+    return system, session_id, calls
+
+
+def test_rag_node_consumes_the_prefetch(system):
+    system, session_id, calls = system
+
+    result = system.process_message("I have swelling in my leg", session_id)
+
+    assert result["metadata"]["used_rag"]
+    timing = result["metadata"]["retrieval_timings"]["rag"]
+    assert timing["status"] == "prefetched"
+    assert timing["saved_ms"] >= 150
+    assert timing["ms"] < 100
+    assert calls == ["I have swelling in my leg"]
+    assert nodes.rag_prefetcher.stats()["consumed"] == 1
+
+
+def test_prefetch_is_discarded_when_routing_skips_rag(system):
+    system, session_id, calls = system
+
+    result = system.process_message("When is my appointment?", session_id)
+
+    assert not result["metadata"]["used_rag"]
+    stats = nodes.rag_prefetcher.stats()
+    assert (stats["started"], stats["consumed"], stats["discarded"], stats["pending"]) == (1, 0, 1, 0)
@@ -0,0 +1,101 @@
+import time
+
+from langchain_core.documents import Document
+
+from agents.rag_setup.reranker import CrossEncoderReranker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class OverlapModel:
+    """Scores a pair by how many query words the chunk contains; each batch advances the clock by delay"""
+
+    def __init__(self, delay=0.0, clock=None):
+        self.delay = delay
+        self.clock = clock
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=32):
+        if self.clock is not None:
+            self.clock.now += self.delay
+        self.pairs += len(pairs)
+        return [sum(word in text.lower() for word in query.lower().split()) for query, text in pairs]
+
+
+def candidates(*texts):
+    return [(Document(page_content=text), float(distance)) for distance, text in enumerate(texts)]
+
+
+CANDIDATES = candidates(
+    "Kidney disease is staged by filtration rate.",
+    "Dialysis is started when symptoms appear.",
+    "Furosemide reduces leg swelling.",
+    "Furosemide dose is taken in the morning for swelling.",
+)
+
+
+def texts(results):
+    return [doc.page_content for doc, _ in results]
+
+
+def test_rerank_orders_candidates_by_cross_encoder_score():
+    reranker = CrossEncoderReranker(model=OverlapModel(), batch_size=2)
+
+    results = reranker.rerank("furosemide morning swelling", CANDIDATES, k=2)
+
+    assert texts(results) == [texts(CANDIDATES)[3], texts(CANDIDATES)[2]]
+    # Dense distances travel with their documents
+    assert [distance for _, distance in results] == [3.0, 2.0]
+    stats = reranker.stats()
+    assert stats["outcomes"] == {"reranked": 1}
+    assert stats["pairs_scored"] == 4
+    assert stats["top_k_changed_rate"] == 1.0
+
+
+def test_over_budget_keeps_dense_order():
+    clock = FakeClock()
+    model = OverlapModel(delay=0.03, clock=clock)
+    reranker = CrossEncoderReranker(model=model, budget_ms=40, batch_size=1, clock=clock)
+
+    results = reranker.rerank("furosemide morning swelling", CANDIDATES, k=3)
+
+    # One 30ms batch predicts that a second would overrun the 40ms budget
+    assert model.pairs == 1
+    assert texts(results) == texts(CANDIDATES)[:3]
+    assert reranker.stats()["outcomes"] == {"over_budget": 1}
+    assert reranker.stats()["fallback_rate"] == 1.0
+
+
+def test_partial_scoring_reranks_the_scored_prefix():
+    clock = FakeClock()
+    model = OverlapModel(delay=0.03, clock=clock)
+    reranker = CrossEncoderReranker(model=model, budget_ms=110, batch_size=1, clock=clock)
+
+    results = reranker.rerank("furosemide swelling", CANDIDATES, k=2)
+
+    # After three 30ms batches a fourth would end at 120ms, past the 110ms budget
+    assert model.pairs == 3
+    assert texts(results)[0] == texts(CANDIDATES)[2]
+    assert reranker.stats()["outcomes"] == {"partial": 1}
+
+
+def test_unloaded_model_keeps_dense_order_and_loads_in_background(monkeypatch):
+    reranker = CrossEncoderReranker()
+    loads = []
+    monkeypatch.setattr(reranker, "load", lambda: loads.append(True))
+
+    results = reranker.rerank("furosemide", CANDIDATES, k=3)
+
+    assert texts(results) == texts(CANDIDATES)[:3]
+    assert reranker.stats()["outcomes"] == {"not_loaded": 1}
+    for _ in range(100):
+        if loads:
+            break
+        time.sleep(0.01)
+    assert loads == [True]
@@ -0,0 +1,97 @@
+import chromadb
+import numpy as np
+import pytest
+
+from agents.rag_setup.create_vector_store import VectorStore
+from agents.rag_setup.quantized_backend import QuantizedBackend
+from agents.rag_setup.retrieval_backends import ChromaBackend, create_backend
+
+
+class DictEncoder:
+    """Encodes known texts to fixed vectors"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts, **kwargs):
+        return np.stack([self.vectors[text] for text in texts])
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection("documents_collection")
+    collection.add(
+        ids=[f"c{i}" for i in range(300)],
+        embeddings=vectors,
+        documents=[f"chunk {i}" for i in range(300)],
+        metadatas=[{"page": i} for i in range(300)]
+    )
+    return str(tmp_path), collection, vectors
+
+
+@pytest.mark.parametrize("name", ["numpy", "faiss-flat", "faiss-hnsw", "faiss-ivf", "int8", "binary"])
+def test_backends_agree_with_chroma(corpus, name):
+    directory, collection, vectors = corpus
+    queries = vectors[:10] + 0.05
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    expected = ChromaBackend(collection).search(queries, 3)
+    # Rescoring every candidate makes the quantized backends exact
+    actual = create_backend(name, collection, directory, rescore_factor=100).search(queries, 3)
+
+    for want, got in zip(expected, actual):
+        assert got[0].id == want[0].id
+        assert got[0].content == want[0].content
+        assert got[0].metadata == want[0].metadata
+        assert got[0].distance == pytest.approx(want[0].distance, abs=1e-4)
+
+
+def test_vector_store_refreshes_snapshot_after_writes(corpus):
+    directory, _, vectors = corpus
+    encoder = DictEncoder({"new chunk": vectors[0], "query": vectors[0]})
+    store = VectorStore("fake", persist_directory=directory, embedding_model=encoder, backend="numpy")
+
+    assert store.similarity_search_with_score("query", k=1)[0][0].page_content == "chunk 0"
+
+    store.delete(["c0"])
+    store.add_documents([{"text": "new chunk", "metadata": {"page": 0}}], ids=["n0"])
+
+    doc, distance = store.similarity_search_with_score("query", k=1)[0]
+    assert doc.page_content == "new chunk"
+    assert distance == pytest.approx(0.0, abs=1e-5)
+
+
+class CountingEncoder(DictEncoder):
+    calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return super().encode(texts, **kwargs)
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_similarity_search_batch_matches_single_queries(corpus, backend):
+    directory, _, vectors = corpus
+    encoder = CountingEncoder({f"q{i}": vectors[i] for i in range(5)})
+    store = VectorStore("fake", persist_directory=directory, embedding_model=encoder, backend=backend)
+
+    batch = store.similarity_search_batch([f"q{i}" for i in range(5)], k=2)
+
+    assert encoder.calls == 1
+    assert [results[0][0].page_content for results in batch] == [f"chunk {i}" for i in range(5)]
+    single = store.similarity_search_with_score("q3", k=2)
+    assert [doc.page_content for doc, _ in single] == [doc.page_content for doc, _ in batch[3]]
+    assert store.similarity_search_batch([], k=2) == []
+
+
+@pytest.mark.parametrize("scheme,ratio", [("int8", 4), ("binary", 32)])
+def test_quantized_codes_shrink_resident_memory(corpus, scheme, ratio):
+    directory, collection, vectors = corpus
+    backend = create_backend(scheme, collection, directory)
+
+    assert isinstance(backend, QuantizedBackend)
+    assert backend.memory_bytes * ratio == vectors.nbytes
+    assert len(backend.search(vectors[:2], 5)[0]) == 5
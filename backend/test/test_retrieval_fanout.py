@@ -0,0 +1,143 @@
+import itertools
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents.cache.llm_cache import llm_cache
+from agents.web_search.providers import FixtureProvider
+from agents.web_search.search_service import WebSearchService
+from agents.workflow_graph import nodes
+from agents.workflow_graph.checkpointer import BoundedMemorySaver
+from agents.workflow_graph.main import MedicalAgentSystem
+from utils import config
+
+
+QUESTION = "Is there new research on treatment for leg swelling?"
+FIXTURES = {
+    "research swelling": [
+        {"title": "Edema guideline 2025", "snippet": "Compression helps.", "url": "https://example.org/edema"},
+    ],
+}
+
+
+class SlowFixtureProvider(FixtureProvider):
+    def __init__(self, delay):
+        super().__init__(FIXTURES)
+        self.delay = delay
+
+    def search(self, query, max_results):
+        time.sleep(self.delay)
+        return super().search(query, max_results)
+
+
+class FailingProvider(FixtureProvider):
+    def __init__(self):
+        super().__init__(FIXTURES)
+
+    def search(self, query, max_results):
+        raise ConnectionError("offline")
+
+
+def fake_llm(text: str) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=text)))
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setattr(config, "RETRIEVAL_FANOUT_ENABLED", True)
+    monkeypatch.setattr(config, "RETRIEVAL_DEADLINE_SECONDS", 0.5)
+    monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(nodes.receptionist_agent, "llm", fake_llm("Let me check that."))
+    monkeypatch.setattr(nodes.clinical_agent, "llm", fake_llm("Compression and elevation help."))
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(FixtureProvider(FIXTURES)))
+    monkeypatch.setattr(nodes.rag_service, "pack_context", lambda query, results: None)
+    monkeypatch.setattr(nodes.rag_service, "embed_query", lambda text: None)
+    llm_cache.clear()
+
+    system = MedicalAgentSystem(BoundedMemorySaver())
+    session_id = system.process_message("John Smith")["session_id"]
+    return system, session_id
+
+
+def retrieve(delay):
+    def query(query, top_k=3, patient_data=None):
+        time.sleep(delay)
+        return [{"content": "Edema in CKD", "metadata": {}, "score": 0.2}]
+    return query
+
+
+def test_both_branches_run_in_parallel_and_are_timed(system, monkeypatch):
+    system, session_id = system
+    monkeypatch.setattr(nodes.rag_service, "query", retrieve(0.2))
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: retrieve(0.2)(query))
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(SlowFixtureProvider(0.2)))
+
+    started = time.perf_counter()
+    result = system.process_message(QUESTION, session_id)
+    elapsed = time.perf_counter() - started
+
+    metadata = result["metadata"]
+    assert metadata["used_rag"] and metadata["used_web_search"]
+    assert {branch: timing["status"] for branch, timing in metadata["retrieval_timings"].items()} == {
+        "rag": "ok", "web_search": "ok"
+    }
+    assert all(timing["ms"] >= 150 for timing in metadata["retrieval_timings"].values())
+    # Two 200ms branches overlap instead of adding up
+    assert elapsed < 0.4
+    state = system.workflow.get_state({"configurable": {"thread_id": session_id}}).values
+    assert "Edema in CKD" in state["rag_context"]
+    assert "Compression helps." in state["web_search_results"]
+
+
+def test_clinical_response_proceeds_at_the_deadline(system, monkeypatch):
+    system, session_id = system
+    monkeypatch.setattr(nodes.rag_service, "query", retrieve(1))
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: retrieve(1)(query))
+    finished = threading.Event()
+    monkeypatch.setattr(nodes.rag_service, "pack_context", lambda query, results: finished.set())
+
+    started = time.perf_counter()
+    result = system.process_message(QUESTION, session_id)
+
+    assert time.perf_counter() - started < 0.9
+    assert result["message"].startswith("Compression and elevation help.")
+    timings = result["metadata"]["retrieval_timings"]
+    assert timings["rag"]["status"] == "timed_out"
+    assert timings["web_search"]["status"] == "ok"
+    assert not result["metadata"]["used_rag"] and result["metadata"]["used_web_search"]
+    # The abandoned retrieval still completes in the background
+    assert finished.wait(2)
+
+
+def test_serial_mode_prefers_web_search(system, monkeypatch):
+    system, session_id = system
+    monkeypatch.setattr(config, "RETRIEVAL_FANOUT_ENABLED", False)
+
+    result = system.process_message(QUESTION, session_id)
+
+    assert set(result["metadata"]["retrieval_timings"]) == {"web_search"}
+    assert not result["metadata"]["used_rag"]
+
+
+def test_branch_errors_are_cleared_by_the_next_turn(system, monkeypatch):
+    system, session_id = system
+    config_ = {"configurable": {"thread_id": session_id}}
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("index unavailable")
+
+    monkeypatch.setattr(nodes.rag_service, "query", broken)
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", broken)
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(FailingProvider()))
+    system.process_message(QUESTION, session_id)
+    # Both branches failed in the same step
+    assert system.workflow.get_state(config_).values["error"] in ("RAG error: index unavailable", "Web search error: offline")
+
+    monkeypatch.setattr(nodes.rag_service, "query", retrieve(0))
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: retrieve(0)(query))
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(FixtureProvider(FIXTURES)))
+    system.process_message(QUESTION, session_id)
+    assert system.workflow.get_state(config_).values["error"] is None
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from agents.clinical_agent import ClinicalAgent
+from agents.receptionist_agent import ReceptionistAgent
+from agents.routing_rules import RoutingRules, routing_rules
+
+
+@pytest.fixture(scope="module")
+def receptionist():
+    return ReceptionistAgent()
+
+
+@pytest.fixture(scope="module")
+def clinical():
+    return ClinicalAgent()
+
+
+# message -> (routes to clinical agent, needs RAG, needs web search)
+ROUTING_DECISIONS = {
+    # Substrings of unrelated words no longer match
+    "Can I renew my prescription online?": (False, False, False),
+    "I have an allergy to penicillin": (False, False, False),
+    "I knew that already, thanks": (False, False, False),
+    "Is the pharmacy near the college open?": (False, False, False),
+    "Are you in Spain or in Manchester?": (False, False, False),
+    "My car had a crash last week": (False, False, False),
+    "When is my follow-up appointment?": (False, False, False),
+    # Inflections the keyword lists relied on substrings for
+    "My legs are swollen": (True, False, False),
+    "I'm experiencing dizziness in my chest": (True, True, False),
+    "Are there new studies on dialysis?": (True, False, True),
+    "My symptoms are worsening": (True, True, False),
+    "I keep coughing at night": (False, True, False),
+    "I have been vomiting since yesterday": (False, True, False),
+    "What are the side-effects of my medications?": (True, True, False),
+    # Phrases, spacing and case
+    "Sudden CHEST PAIN when climbing stairs": (True, True, False),
+    "shortness   of breath at night": (True, True, False),
+    "My blood pressure readings are high": (True, False, False),
+    "Is my BP ok?": (True, False, False),
+    # Web search takes priority over RAG
+    "What is the latest treatment for kidney disease?": (True, False, True),
+    "Any recent guideline on fever management?": (True, False, True),
+}
+
+
+@pytest.mark.parametrize("message", list(ROUTING_DECISIONS))
+def test_routing_decisions(message, receptionist, clinical):
+    routes, needs_rag, needs_web = ROUTING_DECISIONS[message]
+
+    assert receptionist._check_medical_routing(message) is routes
+    assert clinical.assess_query_needs(message) == {"needs_rag": needs_rag, "needs_web_search": needs_web}
+
+
+def test_fan_out_mode_reports_both_needs(clinical):
+    assert clinical.assess_query_needs("What is the latest treatment for kidney disease?", allow_both=True) == {
+        "needs_rag": True, "needs_web_search": True
+    }
+
+
+def test_overlapping_keywords_all_match():
+    assert routing_rules.match("Sudden chest pain") == {
+        "clinical": ["chest", "pain"],
+        "rag": ["chest pain", "pain"],
+    }
+    assert routing_rules.categories("") == frozenset()
+
+
+def test_rules_load_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({
+        "suffixes": ["s", "ing"],
+        "categories": {"billing": ["invoice", "pay"], "urgent": ["chest pain"]},
+    }))
+
+    rules = RoutingRules.from_file(str(path))
+
+    assert rules.categories("Paying my invoices") == {"billing"}
+    assert rules.categories("chest pains today") == {"urgent"}
+    assert rules.categories("payroll") == frozenset()
@@ -0,0 +1,150 @@
+import importlib
+import itertools
+
+import numpy as np
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents import receptionist_agent as receptionist_module
+from agents.cache.semantic_cache import SemanticCache, scope_key
+from agents.workflow_graph import nodes
+from agents.workflow_graph.main import MedicalAgentSystem
+from agents.workflow_graph.checkpointer import BoundedMemorySaver
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+PATIENT = {
+    "patient_name": "John Smith",
+    "primary_diagnosis": "CKD Stage 3",
+    "medications": ["Lisinopril", "Furosemide"],
+    "discharge_date": "2024-01-10",
+    "follow_up": "Nephrology in 2 weeks",
+}
+
+
+def test_scope_key_separates_patients_with_the_same_diagnosis_and_medications():
+    assert scope_key(PATIENT) == scope_key(dict(reversed(list(PATIENT.items()))))
+    for field, value in [
+        ("patient_name", "Jane Doe"),
+        ("follow_up", "Nephrology in 1 month"),
+        ("discharge_date", "2024-02-01"),
+        ("dietary_restrictions", "Low sodium"),
+    ]:
+        assert scope_key({**PATIENT, field: value}) != scope_key(PATIENT)
+
+
+def test_lookup_respects_threshold_and_scope():
+    cache = SemanticCache(threshold=0.9)
+    cache.store(unit(1, 0), "ckd", "q", "answer")
+
+    assert cache.lookup(unit(1, 0.1), "ckd") == "answer"
+    assert cache.lookup(unit(1, 1), "ckd") is None
+    assert cache.lookup(unit(1, 0), "aki") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_expired_and_evicted_entries_are_not_served():
+    cache = SemanticCache(ttl_seconds=0)
+    cache.store(unit(1, 0), "ckd", "q", "answer")
+    assert cache.lookup(unit(1, 0), "ckd") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache = SemanticCache(max_entries=1)
+    cache.store(unit(1, 0), "ckd", "q1", "first")
+    cache.store(unit(0, 1), "ckd", "q2", "second")
+    assert cache.lookup(unit(1, 0), "ckd") is None
+    assert cache.lookup(unit(0, 1), "ckd") == "second"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_best_match_does_not_hide_a_valid_one(monkeypatch):
+    now = [1000.0]
+    # The package re-exports the semantic_cache singleton under the module's name
+    monkeypatch.setattr(importlib.import_module("agents.cache.semantic_cache").time, "monotonic", lambda: now[0])
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60)
+    cache.store(unit(1, 0), "ckd", "old", "stale answer")
+    cache.store(unit(1, 1), "other", "old", "other patient")
+    now[0] += 50
+    cache.store(unit(1, 0.2), "ckd", "new", "fresh answer")
+    now[0] += 20
+
+    assert cache.lookup(unit(1, 0), "ckd") == "fresh answer"
+    # Only the looked-up scope is purged
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.fixture
+def system(monkeypatch):
+    calls = []
+
+    def fake_generate(query, context, chat_history=None, use_cache=True):
+        calls.append(query)
+        return "Elevate your legs."
+
+    monkeypatch.setattr(nodes.receptionist_agent, "llm", GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="ok"))))
+    monkeypatch.setattr(nodes.clinical_agent, "generate_response", fake_generate)
+    monkeypatch.setattr(nodes.rag_service, "query", lambda query, top_k=3: [])
+    monkeypatch.setattr(nodes.rag_service, "query_for_patient", lambda query, patient_data, top_k=3: [])
+    monkeypatch.setattr(nodes.rag_service, "embed_query", lambda text: unit(1, 0) if "swelling" in text else unit(0, 1))
+    monkeypatch.setattr(nodes, "semantic_cache", SemanticCache())
+    patients = {"John Smith": PATIENT, "Jane Doe": {**PATIENT, "patient_name": "Jane Doe", "follow_up": "Clinic in 1 month"}}
+    monkeypatch.setattr(receptionist_module, "get_patient_data", lambda name: dict(patients[name]))
+    return MedicalAgentSystem(checkpointer=BoundedMemorySaver()), calls
+
+
+def test_workflow_serves_similar_query_from_cache(system):
+    medical_system, calls = system
+    first = medical_system.process_message("John Smith")["session_id"]
+    second = medical_system.process_message("John Smith")["session_id"]
+
+    medical_system.process_message("I have swelling in my legs", first)
+    result = medical_system.process_message("My leg swelling got worse", second)
+
+    assert calls == ["I have swelling in my legs"]
+    assert result["message"] == "Elevate your legs."
+    assert result["metadata"]["from_cache"] is True
+
+
+def test_workflow_cache_opt_out(system):
+    medical_system, calls = system
+    session_id = medical_system.process_message("John Smith")["session_id"]
+
+    medical_system.process_message("I have swelling in my legs", session_id)
+    result = medical_system.process_message("I have swelling in my legs", session_id, use_cache=False)
+
+    assert len(calls) == 2
+    assert result["metadata"]["from_cache"] is False
+
+
+def test_workflow_never_shares_answers_between_patients(system):
+    medical_system, calls = system
+    john = medical_system.process_message("John Smith")["session_id"]
+    jane = medical_system.process_message("Jane Doe")["session_id"]
+
+    medical_system.process_message("I have swelling in my legs", john)
+    result = medical_system.process_message("I have swelling in my legs", jane)
+
+    assert len(calls) == 2
+    assert result["metadata"]["from_cache"] is False
+
+
+def test_workflow_skips_cache_after_a_clinical_answer(system):
+    medical_system, calls = system
+    first = medical_system.process_message("John Smith")["session_id"]
+    second = medical_system.process_message("John Smith")["session_id"]
+    medical_system.process_message("I have swelling in my legs", first)
+
+    # A follow-up in a conversation with clinical history is neither served from nor stored in the cache
+    medical_system.process_message("I have a headache", second)
+    follow_up = medical_system.process_message("Is the swelling worse at night?", second)
+    medical_system.process_message("I have a headache", first)
+
+    assert follow_up["metadata"]["from_cache"] is False
+    assert calls == ["I have swelling in my legs", "I have a headache", "Is the swelling worse at night?", "I have a headache"]
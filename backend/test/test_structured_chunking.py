@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pymupdf
+import pytest
+
+from agents.rag_setup.structured_chunking import (
+    Block, ChunkStream, iter_file_blocks, iter_sections, ordered_results, page_ranges, parse_pdf_range
+)
+
+
+BODY = "Potassium above 6 mmol/L needs urgent treatment. " * 12
+
+
+@pytest.fixture(scope="module")
+def textbook(tmp_path_factory):
+    """20-page PDF with 18pt section headings on pages 0 and 10 over 11pt body text"""
+    path = tmp_path_factory.mktemp("pdf") / "textbook.pdf"
+    document = pymupdf.open()
+    for number in range(20):
+        page = document.new_page()
+        top = 72
+        if number in (0, 10):
+            page.insert_text((72, top), "Hyperkalemia" if number == 0 else "Dialysis Access", fontsize=18)
+            top += 30
+        page.insert_textbox(pymupdf.Rect(72, top, 520, 700), f"Page {number}. {BODY}", fontsize=11)
+    document.save(str(path))
+    return str(path)
+
+
+def test_page_ranges_cover_every_page_once():
+    ranges = page_ranges(100, workers=4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 100
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert page_ranges(5, workers=4) == [(0, 5)]
+
+
+def test_parse_pdf_range_flags_larger_font_as_heading(textbook):
+    blocks = parse_pdf_range(textbook, 0, 2)
+
+    assert blocks[0] == Block(0, "Hyperkalemia", True)
+    assert not blocks[1].is_heading and blocks[1].text.startswith("Page 0.")
+    assert {block.page for block in blocks} == {0, 1}
+
+
+def test_sections_track_pages_and_merge_heading_lines():
+    blocks = [
+        Block(0, "Intro text", False),
+        Block(1, "Chapter 3", True),
+        Block(1, "Hyperkalemia", True),
+        Block(1, "First page.", False),
+        Block(2, "Second page.", False),
+    ]
+    sections = list(iter_sections(blocks))
+
+    assert [(s.title, s.page_start, s.page_end) for s in sections] == [("", 0, 0), ("Chapter 3 Hyperkalemia", 1, 2)]
+    assert sections[1].text == "First page.\n\nSecond page."
+    assert sections[1].page_offsets == [(0, 1), (13, 2)]
+
+
+def test_chunks_keep_section_and_page_metadata(textbook):
+    stream = ChunkStream(textbook, workers=1, chunk_size=400, chunk_overlap=50)
+    chunks = list(stream)
+
+    assert stream.pages == 20
+    assert all(len(chunk.page_content) <= 400 + len("Dialysis Access\n") for chunk in chunks)
+    sections = {chunk.metadata["section"] for chunk in chunks}
+    assert sections == {"Hyperkalemia", "Dialysis Access"}
+    for chunk in chunks:
+        meta = chunk.metadata
+        assert chunk.page_content.startswith(meta["section"] + "\n")
+        assert (meta["section"] == "Hyperkalemia") == (meta["page"] < 10)
+        assert f"Page {meta['page']}." in chunk.page_content or meta["chunk_index"] > 0
+    # Every chunk links back to one parent section
+    assert len({chunk.metadata["section_id"] for chunk in chunks}) == 2
+
+    spanning = list(ChunkStream(textbook, workers=1, chunk_size=1500, chunk_overlap=0))
+    assert any(chunk.metadata["page_end"] > chunk.metadata["page"] for chunk in spanning)
+
+
+def test_parallel_parsing_matches_serial(textbook):
+    serial = list(ChunkStream(textbook, workers=1, chunk_size=400, chunk_overlap=50))
+    parallel = list(ChunkStream(textbook, workers=2, chunk_size=400, chunk_overlap=50))
+
+    assert [(c.page_content, c.metadata) for c in parallel] == [(c.page_content, c.metadata) for c in serial]
+
+
+def test_sections_without_headings_are_cut_every_max_pages():
+    blocks = [Block(page, f"Page {page}.", False) for page in range(7)] + [Block(7, "Heading", True), Block(7, "Body.", False)]
+    sections = list(iter_sections(blocks, max_pages=3))
+
+    assert [(s.title, s.page_start, s.page_end) for s in sections] == [
+        ("", 0, 2), ("", 3, 5), ("", 6, 6), ("Heading", 7, 7)
+    ]
+    assert sections[1].text == "Page 3.\n\nPage 4.\n\nPage 5."
+
+
+def test_ordered_results_keep_a_bounded_window():
+    outstanding, peak = [0], [0]
+    lock = threading.Lock()
+
+    def task(i):
+        with lock:
+            outstanding[0] += 1
+            peak[0] = max(peak[0], outstanding[0])
+        return i
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = []
+        for key, value in ordered_results(((i, task, (i,)) for i in range(50)), executor, window=3):
+            with lock:
+                outstanding[0] -= 1
+            results.append((key, value))
+
+    assert results == [(i, i) for i in range(50)]
+    # The window, plus the result being handed to the consumer
+    assert peak[0] <= 3 + 1
+
+
+def test_files_are_parsed_alongside_each_other(tmp_path, textbook):
+    notes = []
+    for i in range(3):
+        notes.append(str(tmp_path / f"notes{i}.txt"))
+        (tmp_path / f"notes{i}.txt").write_text(f"# Note {i}\n\nDrink less fluid.")
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, function, *args):
+            submitted.append(args[0])
+            return super().submit(function, *args)
+
+    with RecordingExecutor(max_workers=2) as executor:
+        parsed = iter_file_blocks(notes + [textbook], workers=2, executor=executor)
+        first = next(parsed)
+        # The window already covers the next files before the first is consumed
+        assert submitted[:3] == notes
+        rest = list(parsed)
+
+    keys = [key for key, _ in [first] + rest]
+    assert [path for _, path in dict.fromkeys(keys)] == notes + [textbook]
+    assert keys == sorted(keys)
+    assert sum(len(blocks) for (_, path), blocks in rest if path == textbook) == len(parse_pdf_range(textbook, 0, 20))
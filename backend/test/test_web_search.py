@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agents.web_search.providers import FixtureProvider, SearchProvider, SearchResult
+from agents.web_search.search_service import WebSearchService
+from agents.workflow_graph import nodes
+
+
+FIXTURES = {
+    "SGLT2 inhibitors kidney": [
+        {"title": "SGLT2 inhibitors in CKD", "snippet": "They slow eGFR decline.", "url": "https://example.org/sglt2"},
+        {"title": "Dapagliflozin trial", "snippet": "Fewer kidney failures.", "url": "https://example.org/dapa"},
+    ],
+    "kidney": [
+        {"title": "Kidney basics", "snippet": "Kidneys filter blood.", "url": "https://example.org/kidney"},
+    ],
+}
+
+
+class CountingProvider(SearchProvider):
+    """Fixture results that count calls and can be held back until released"""
+
+    name = "counting"
+
+    def __init__(self, delay=0.0):
+        self.fixture = FixtureProvider(FIXTURES)
+        self.delay = delay
+        self.calls = 0
+        self.release = threading.Event()
+        if not delay:
+            self.release.set()
+
+    def search(self, query, max_results):
+        self.calls += 1
+        self.release.wait(self.delay or None)
+        return self.fixture.search(query, max_results)
+
+
+class FailingProvider(SearchProvider):
+    def search(self, query, max_results):
+        raise ConnectionError("network unreachable")
+
+
+def test_fixture_provider_matches_normalized_and_contained_queries(tmp_path):
+    path = tmp_path / "fixtures.json"
+    path.write_text(json.dumps(FIXTURES))
+    provider = FixtureProvider(str(path))
+
+    assert [r.title for r in provider.search("  sglt2 INHIBITORS   kidney", 5)] == ["SGLT2 inhibitors in CKD", "Dapagliflozin trial"]
+    # The longest fixture whose words all appear in the query wins
+    assert provider.search("are sglt2 inhibitors safe for my kidney", 1) == [
+        SearchResult("SGLT2 inhibitors in CKD", "They slow eGFR decline.", "https://example.org/sglt2")
+    ]
+    assert provider.search("my kidney hurts", 3)[0].title == "Kidney basics"
+    assert provider.search("dialysis diet", 3) == []
+
+
+def test_results_are_cached_by_normalized_query_until_ttl():
+    provider = CountingProvider()
+    service = WebSearchService(provider, cache_ttl_seconds=0.2)
+
+    first = service.search("SGLT2 inhibitors kidney", max_results=2)
+    second = service.search("sglt2  inhibitors KIDNEY", max_results=2)
+
+    assert not first.from_cache and second.from_cache
+    assert second.results == first.results
+    assert "URL: https://example.org/dapa" in second.format()
+    assert provider.calls == 1
+
+    time.sleep(0.25)
+    assert not service.search("SGLT2 inhibitors kidney", max_results=2).from_cache
+    assert provider.calls == 2
+    assert service.stats()["hits"] == 1
+
+
+def test_deadline_returns_promptly_and_late_results_warm_the_cache():
+    provider = CountingProvider(delay=5)
+    service = WebSearchService(provider, timeout_seconds=0.05)
+
+    started = time.perf_counter()
+    response = service.search("kidney")
+    assert time.perf_counter() - started < 1
+    assert response.timed_out and response.results == []
+
+    # A retry while the slow search is still running joins it instead of starting another
+    assert service.search("kidney").timed_out
+    assert provider.calls == 1
+
+    provider.release.set()
+    for _ in range(100):
+        if service.stats()["entries"]:
+            break
+        time.sleep(0.01)
+    cached = service.search("kidney")
+    assert cached.from_cache and cached.results[0].title == "Kidney basics"
+    stats = service.stats()
+    assert stats["timeouts"] == 2
+    assert stats["late_completions"] == 1
+
+
+def test_queued_search_is_cancelled_at_its_deadline():
+    provider = CountingProvider(delay=5)
+    service = WebSearchService(provider, timeout_seconds=0.05, max_workers=1)
+
+    service.search("kidney")
+    # The only worker is busy, so this search never starts
+    assert service.search("SGLT2 inhibitors kidney").timed_out
+    provider.release.set()
+    time.sleep(0.1)
+
+    assert provider.calls == 1
+    assert service.stats()["in_flight"] == 0
+
+
+def test_short_deadline_does_not_cancel_a_search_others_wait_on():
+    provider = CountingProvider(delay=5)
+    service = WebSearchService(provider, timeout_seconds=0.05, max_workers=1)
+    service.search("kidney")
+
+    # Queued behind "kidney", so a cancel from either short deadline would succeed
+    patient = threading.Thread(target=lambda: results.append(service.search("SGLT2 inhibitors kidney", timeout=5)))
+    results = []
+    patient.start()
+    for _ in range(100):
+        if service.stats()["misses"] == 2:
+            break
+        time.sleep(0.01)
+    assert service.search("SGLT2 inhibitors kidney", timeout=0.01).timed_out
+
+    async def impatient():
+        return await service.asearch("SGLT2 inhibitors kidney", timeout=0.01)
+    assert asyncio.run(impatient()).timed_out
+
+    provider.release.set()
+    patient.join(5)
+    assert not results[0].timed_out and results[0].results[0].title == "SGLT2 inhibitors in CKD"
+    assert provider.calls == 2
+    assert service.stats()["joined"] == 2
+
+
+def test_async_search_returns_timed_out_when_the_shared_search_is_cancelled():
+    provider = CountingProvider(delay=5)
+    service = WebSearchService(provider, timeout_seconds=5, max_workers=1)
+    service.search("kidney", timeout=0.01)
+
+    async def cancelled_by_shutdown():
+        waiting = asyncio.create_task(service.asearch("SGLT2 inhibitors kidney"))
+        await asyncio.sleep(0.05)
+        service.shutdown()
+        return await waiting
+
+    response = asyncio.run(cancelled_by_shutdown())
+    provider.release.set()
+    assert response.timed_out and response.results == []
+
+
+def test_async_search_and_errors_are_not_cached():
+    provider = CountingProvider(delay=5)
+    service = WebSearchService(provider, timeout_seconds=0.05)
+    assert asyncio.run(service.asearch("kidney")).timed_out
+    provider.release.set()
+
+    failing = WebSearchService(FailingProvider())
+    response = failing.search("kidney")
+    assert response.error == "network unreachable" and response.results == []
+    assert not failing.search("kidney").from_cache
+    assert failing.stats()["errors"] == 2
+
+
+def test_web_search_node_answers_without_results_after_a_timeout(monkeypatch):
+    provider = CountingProvider(delay=5)
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(provider, timeout_seconds=0.05))
+
+    updates = nodes.web_search_node({"messages": [HumanMessage(content="latest kidney research")]})
+
+    assert updates["web_search_results"] is None
+    assert updates["retrieval_timings"]["web_search"]["status"] == "timed_out"
+    provider.release.set()
+
+    monkeypatch.setattr(nodes, "web_search_service", WebSearchService(FixtureProvider(FIXTURES)))
+    updates = asyncio.run(nodes.aweb_search_node({"messages": [HumanMessage(content="latest kidney research")]}))
+    assert updates["web_search_results"].startswith("Source: Kidney basics")
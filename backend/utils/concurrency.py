@@ -0,0 +1,78 @@
+"""
+Concurrency helpers for the async API layer
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+def cancel_requested() -> bool:
+    """Whether the current task has a pending cancellation request (Python 3.11+)"""
+    task = asyncio.current_task()
+    return bool(getattr(task, "cancelling", lambda: 0)())
+
+
+class ServerBusyError(Exception):
+    """Raised when the request queue is full"""
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds in-flight work and rejects callers once the wait queue is full
+
+    Up to max_in_flight callers run at once; up to max_queue more wait for a
+    slot. Anyone beyond that gets ServerBusyError immediately instead of
+    piling up behind slow requests.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    async def acquire(self):
+        """
+        Wait for an execution slot
+
+        Raises:
+            ServerBusyError: If the wait queue is already full
+        """
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise ServerBusyError(
+                f"{self._in_flight} requests in flight and {self._waiting} queued"
+            )
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def release(self):
+        """Return a slot taken with acquire()"""
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one execution slot for the duration of the block"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "rejected": self._rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,149 @@
+"""
+Runtime configuration for the medical system, read from environment variables
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Chat concurrency
+# Maximum number of chat requests processed at the same time
+MAX_INFLIGHT_CHATS = _env_int("MAX_INFLIGHT_CHATS", 8)
+# Maximum number of chat requests waiting for a slot before returning 429
+MAX_QUEUED_CHATS = _env_int("MAX_QUEUED_CHATS", 32)
+# Worker threads used to run synchronous workflow nodes (RAG, web search, routing)
+WORKFLOW_WORKER_THREADS = _env_int("WORKFLOW_WORKER_THREADS", 16)
+
+# Session memory (workflow checkpointer)
+# "memory" keeps sessions in-process; "sqlite" persists them so they survive
+# restarts and are shared by all uvicorn workers on the node
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory").lower()
+# Database file for the sqlite backend
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "data/sessions/checkpoints.db")
+# Maximum number of sessions kept in memory; least recently used are evicted first (memory backend)
+SESSION_MAX_THREADS = _env_int("SESSION_MAX_THREADS", 1000)
+# Seconds of inactivity after which a session is evicted
+SESSION_IDLE_TTL_SECONDS = _env_int("SESSION_IDLE_TTL_SECONDS", 3600)
+# Checkpoints (workflow steps) retained per session; only the latest is needed to continue
+SESSION_MAX_CHECKPOINTS = _env_int("SESSION_MAX_CHECKPOINTS", 5)
+
+# Semantic response cache for clinical answers
+SEMANTIC_CACHE_ENABLED = _env_bool("SEMANTIC_CACHE_ENABLED", True)
+# Minimum cosine similarity between query embeddings to reuse an answer
+SEMANTIC_CACHE_THRESHOLD = _env_float("SEMANTIC_CACHE_THRESHOLD", 0.92)
+# Seconds a cached answer stays valid
+SEMANTIC_CACHE_TTL_SECONDS = _env_int("SEMANTIC_CACHE_TTL_SECONDS", 3600)
+# Maximum number of cached answers; least recently used are evicted first
+SEMANTIC_CACHE_MAX_ENTRIES = _env_int("SEMANTIC_CACHE_MAX_ENTRIES", 2000)
+
+# Exact-match LLM call cache shared by both agents
+LLM_CACHE_ENABLED = _env_bool("LLM_CACHE_ENABLED", True)
+# Maximum number of cached responses kept in memory
+LLM_CACHE_MAX_ENTRIES = _env_int("LLM_CACHE_MAX_ENTRIES", 512)
+# Seconds a cached response stays valid
+LLM_CACHE_TTL_SECONDS = _env_int("LLM_CACHE_TTL_SECONDS", 3600)
+# SQLite file that persists the cache across restarts and workers; empty keeps it in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+# Seconds a caller waits for an identical in-flight call before calling the model itself
+LLM_CACHE_WAIT_SECONDS = _env_float("LLM_CACHE_WAIT_SECONDS", 60.0)
+
+# Query embedding cache used by every RAG query path
+# Maximum number of cached query embeddings; least recently used are evicted first
+QUERY_EMBEDDING_CACHE_SIZE = _env_int("QUERY_EMBEDDING_CACHE_SIZE", 10000)
+# Memory-mapped file that persists the cache across restarts; empty keeps it in memory only.
+# Each worker process locks its own copy (path, path.1, ...)
+QUERY_EMBEDDING_CACHE_PATH = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")
+
+# Nearest-neighbour backend for RAG queries: "chroma", or an in-process index over a
+# memory-mapped snapshot of the embeddings: "numpy", "faiss-flat", "faiss-hnsw", "faiss-ivf",
+# or quantized codes rescored from the snapshot: "int8", "binary"
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma").lower()
+# Candidates per result that quantized backends rescore with full-precision vectors
+QUANTIZED_RESCORE_FACTOR = _env_int("QUANTIZED_RESCORE_FACTOR", 4)
+
+# Hybrid retrieval: dense results fused with a BM25 keyword index by reciprocal rank
+HYBRID_RETRIEVAL_ENABLED = _env_bool("HYBRID_RETRIEVAL_ENABLED", True)
+# Candidates taken from each ranking before fusion
+HYBRID_CANDIDATES = _env_int("HYBRID_CANDIDATES", 20)
+# Rank offset in 1 / (k + rank); larger values flatten the contribution of top ranks
+HYBRID_RRF_K = _env_int("HYBRID_RRF_K", 60)
+
+# Cross-encoder re-ranking of a wider dense candidate set (CPU, off by default)
+RERANK_ENABLED = _env_bool("RERANK_ENABLED", False)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates retrieved for re-ranking; the top RAG results are chosen among them
+RERANK_CANDIDATES = _env_int("RERANK_CANDIDATES", 20)
+# Milliseconds the cross-encoder may spend per query before the dense order is kept
+RERANK_BUDGET_MS = _env_float("RERANK_BUDGET_MS", 150.0)
+# Query-chunk pairs scored per forward pass; smaller batches let the budget stop earlier
+RERANK_BATCH_SIZE = _env_int("RERANK_BATCH_SIZE", 4)
+
+# Add phrasings with the identified patient's diagnosis and medications to RAG queries
+RAG_PATIENT_CONTEXT_ENABLED = _env_bool("RAG_PATIENT_CONTEXT_ENABLED", True)
+
+# Token budget for retrieved text in the clinical prompt: the most query-relevant
+# sentence windows of the retrieved chunks are kept; 0 sends the chunks in full
+RAG_CONTEXT_TOKEN_BUDGET = _env_int("RAG_CONTEXT_TOKEN_BUDGET", 1500)
+# Sentences per window scored against the query
+RAG_CONTEXT_WINDOW_SENTENCES = _env_int("RAG_CONTEXT_WINDOW_SENTENCES", 3)
+
+# Web search: "duckduckgo", or "fixture" to serve canned results from WEB_SEARCH_FIXTURE_PATH
+WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo").lower()
+# JSON file mapping queries to result lists, for the fixture provider
+WEB_SEARCH_FIXTURE_PATH = os.getenv("WEB_SEARCH_FIXTURE_PATH") or None
+# Seconds a turn waits for search results before answering without them
+WEB_SEARCH_TIMEOUT_SECONDS = _env_float("WEB_SEARCH_TIMEOUT_SECONDS", 4.0)
+# Seconds search results are reused for the same normalized query
+WEB_SEARCH_CACHE_TTL_SECONDS = _env_int("WEB_SEARCH_CACHE_TTL_SECONDS", 3600)
+WEB_SEARCH_CACHE_SIZE = _env_int("WEB_SEARCH_CACHE_SIZE", 256)
+# Searches running at once; a timed-out search keeps its thread until it returns
+WEB_SEARCH_MAX_WORKERS = _env_int("WEB_SEARCH_MAX_WORKERS", 4)
+
+# Keyword routing rules (JSON); defaults to agents/routing_rules.json
+ROUTING_RULES_PATH = os.getenv("ROUTING_RULES_PATH") or None
+# Route with a nearest-centroid intent classifier over the RAG embeddings,
+# trained at startup; keyword rules decide when it is unsure or unavailable
+INTENT_CLASSIFIER_ENABLED = _env_bool("INTENT_CLASSIFIER_ENABLED", False)
+# Calibrated confidence below which the keyword rules decide instead
+INTENT_CONFIDENCE_THRESHOLD = _env_float("INTENT_CONFIDENCE_THRESHOLD", 0.7)
+# Generated training examples per intent (general, rag, web_search)
+INTENT_TRAINING_EXAMPLES = _env_int("INTENT_TRAINING_EXAMPLES", 150)
+
+# Run RAG and web search as parallel graph branches when a query wants both
+# (otherwise web search takes priority and RAG is skipped)
+RETRIEVAL_FANOUT_ENABLED = _env_bool("RETRIEVAL_FANOUT_ENABLED", False)
+# Seconds from routing after which the clinical response uses whichever branches finished
+RETRIEVAL_DEADLINE_SECONDS = _env_float("RETRIEVAL_DEADLINE_SECONDS", 3.0)
+# Threads that run RAG retrieval under the shared deadline
+RETRIEVAL_WORKER_THREADS = _env_int("RETRIEVAL_WORKER_THREADS", 4)
+
+# Start RAG retrieval for an identified patient's message while the receptionist
+# runs; the RAG node uses it, and it is dropped if routing does not need RAG
+RAG_PREFETCH_ENABLED = _env_bool("RAG_PREFETCH_ENABLED", False)
+RAG_PREFETCH_WORKERS = _env_int("RAG_PREFETCH_WORKERS", 2)
+
+# Micro-batching of concurrent query embeddings
+EMBEDDING_BATCHER_ENABLED = _env_bool("EMBEDDING_BATCHER_ENABLED", True)
+# Maximum texts encoded in one forward pass
+EMBEDDING_BATCH_MAX_SIZE = _env_int("EMBEDDING_BATCH_MAX_SIZE", 32)
+# Milliseconds the first request in a batch waits for others to join
+EMBEDDING_BATCH_MAX_WAIT_MS = _env_float("EMBEDDING_BATCH_MAX_WAIT_MS", 3.0)
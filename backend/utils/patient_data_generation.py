@@ -307,6 +307,67 @@ class MedicalDataGenerator:
         
         return queries
 
+    def generate_intent_examples(self, n: int = 100) -> List[Dict[str, Any]]:
+        """Generate n labelled routing examples per intent: general, rag and web_search"""
+        medication_names = ["lisinopril", "furosemide", "metformin", "insulin", "aspirin",
+                            "atorvastatin", "metoprolol", "prednisone", "my water pill", "my blood thinner"]
+        conditions = ["kidney disease", "heart failure", "diabetes", "COPD", "pneumonia",
+                      "a stroke", "high blood pressure", "DVT", "arthritis"]
+        
+        medication_patterns = [
+            "Can I take {medication} with food?",
+            "What are the side effects of {medication}?",
+            "I missed a dose of {medication}, what should I do?",
+            "Is it safe to drink alcohol with {medication}?",
+            "Why was I prescribed {medication}?",
+            "How long do I need to stay on {medication}?"
+        ]
+        web_patterns = [
+            "What is the latest research on {condition}?",
+            "Are there any new treatments for {condition}?",
+            "What do current guidelines recommend for {condition}?",
+            "Has there been a recent study about {medication}?",
+            "Any updates on clinical trials for {condition}?",
+            "What are the newest recommendations for managing {condition}?",
+            "Is there recent news about {medication} safety?",
+            "What does the latest evidence say about {condition} and diet?"
+        ]
+        general_patterns = [
+            "When is my follow-up appointment?",
+            "Can I reschedule my appointment to {day}?",
+            "What time does the clinic open on {day}?",
+            "How do I get a refill for {medication}?",
+            "Can you remind me of my discharge date?",
+            "Who is my doctor?",
+            "What is the phone number for the pharmacy?",
+            "Thank you for your help",
+            "Hi, how are you today?",
+            "Can you send my discharge summary to my email?",
+            "Where do I park for my appointment on {day}?",
+            "How do I pay my hospital bill?",
+            "Can my daughter pick up my prescription?",
+            "What were my dietary restrictions again?"
+        ]
+        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "next week"]
+        
+        def fill(pattern: str) -> str:
+            return pattern.format(
+                medication=random.choice(medication_names),
+                condition=random.choice(conditions),
+                day=random.choice(days)
+            )
+        
+        symptom_queries = [q["query"] for q in self.generate_symptom_queries(n - n // 3)]
+        rag = symptom_queries + [fill(random.choice(medication_patterns)) for _ in range(n // 3)]
+        web = [fill(random.choice(web_patterns)) for _ in range(n)]
+        general = [fill(random.choice(general_patterns)) for _ in range(n)]
+        
+        return [
+            {"query": query, "intent": intent}
+            for intent, queries in (("general", general), ("rag", rag), ("web_search", web))
+            for query in queries
+        ]
+
     def generate_medication_data(self, n: int = 50) -> List[Dict[str, Any]]:
         """Generate medication database for drug interactions and information"""
         medication_names = [
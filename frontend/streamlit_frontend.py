@@ -3,7 +3,7 @@ import requests
 import json
 from datetime import datetime
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator
 
 # Configure the page
 st.set_page_config(
@@ -37,6 +37,27 @@ class MedicalChatbotAPI:
         except requests.exceptions.RequestException as e:
             return {"error": f"API Error: {str(e)}"}
     
+    def stream_message(self, message: str, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Send a message and yield streamed events (session, node, token, done, error)"""
+        try:
+            with requests.post(
+                f"{self.base_url}/chat/stream",
+                json={
+                    "message": message,
+                    "session_id": session_id
+                },
+                stream=True,
+                timeout=(5, 60)
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield json.loads(line)
+        except requests.exceptions.ConnectionError:
+            yield {"type": "error", "error": "Cannot connect to API. Please ensure the backend server is running."}
+        except requests.exceptions.RequestException as e:
+            yield {"type": "error", "error": f"API Error: {str(e)}"}
+    
     def get_patient(self, patient_name: str) -> Dict[str, Any]:
         """Get patient information"""
         try:
@@ -63,6 +84,51 @@ class MedicalChatbotAPI:
 def get_api_client():
     return MedicalChatbotAPI()
 
+NODE_STATUS = {
+    "receptionist": "🧑‍💼 Receptionist is reviewing your message...",
+    "clinical_router": "🩺 Connecting you with the clinical specialist...",
+    "rag": "📚 Searching the medical knowledge base...",
+    "web_search": "🌐 Searching recent medical information...",
+    "clinical_response": "✍️ Preparing clinical guidance..."
+}
+
+def render_bot_message(content: str, timestamp: str) -> str:
+    return f"""
+    <div class="bot-message">
+        <strong>🤖 Medical Assistant:</strong><br>
+        {content.replace(chr(10), '<br>')}<br>
+        <small>🕐 {timestamp}</small>
+    </div>
+    """
+
+def stream_bot_response(api: MedicalChatbotAPI, message: str) -> Dict[str, Any]:
+    """Render the assistant reply as it streams in and return the final result"""
+    status = st.empty()
+    placeholder = st.empty()
+    text = ""
+    
+    for event in api.stream_message(message, st.session_state.session_id):
+        event_type = event.get("type")
+        if event_type == "session":
+            st.session_state.session_id = event["session_id"]
+        elif event_type == "node":
+            status.caption(NODE_STATUS.get(event["node"], "🤖 Processing your message..."))
+        elif event_type == "token":
+            text += event["content"]
+            placeholder.markdown(render_bot_message(text + " ▌", datetime.now().strftime("%H:%M:%S")), unsafe_allow_html=True)
+        elif event_type == "done":
+            status.empty()
+            placeholder.empty()
+            return event
+        elif event_type == "error":
+            status.empty()
+            placeholder.empty()
+            return {"error": event.get("error", "Processing error")}
+    
+    status.empty()
+    placeholder.empty()
+    return {"error": "Stream ended before a response was received"}
+
 # Initialize session state
 def initialize_session_state():
     if "messages" not in st.session_state:
@@ -189,13 +255,7 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                <div class="bot-message">
-                    <strong>🤖 Medical Assistant:</strong><br>
-                    {message["content"].replace('\n', '<br>')}<br>
-                    <small>🕐 {message["timestamp"]}</small>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(render_bot_message(message["content"], message["timestamp"]), unsafe_allow_html=True)
     else:
         st.info("👋 Welcome! Start by entering your name or ask a medical question.")
     
@@ -229,30 +289,29 @@ def main():
             "timestamp": timestamp
         })
         
-        # Send to API
-        with st.spinner("🤖 Processing your message..."):
-            response = api.send_message(user_input, st.session_state.session_id)
+        # Stream from API, rendering tokens as they arrive
+        response = stream_bot_response(api, user_input)
+        
+        if "error" not in response:
+            # Update session ID
+            if response.get("session_id"):
+                st.session_state.session_id = response["session_id"]
             
-            if "error" not in response:
-                # Update session ID
-                if response.get("session_id"):
-                    st.session_state.session_id = response["session_id"]
-                
-                # Add bot response
-                bot_timestamp = datetime.now().strftime("%H:%M:%S")
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": response.get("response", "Sorry, I couldn't process your request."),
-                    "timestamp": bot_timestamp
-                })
-                
-                # Update patient data
-                if response.get("patient_name") and not st.session_state.patient_data:
-                    patient_info = api.get_patient(response["patient_name"])
-                    if patient_info.get("success"):
-                        st.session_state.patient_data = patient_info["data"]
-            else:
-                st.error(f"❌ Error: {response['error']}")
+            # Add bot response
+            bot_timestamp = datetime.now().strftime("%H:%M:%S")
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": response.get("message", "Sorry, I couldn't process your request."),
+                "timestamp": bot_timestamp
+            })
+            
+            # Update patient data
+            if response.get("patient_name") and not st.session_state.patient_data:
+                patient_info = api.get_patient(response["patient_name"])
+                if patient_info.get("success"):
+                    st.session_state.patient_data = patient_info["data"]
+        else:
+            st.error(f"❌ Error: {response['error']}")
         
         st.rerun()
     